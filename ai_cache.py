@@ -0,0 +1,205 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Tuple
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+CLEANUP_INTERVAL = 3600
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Приведение промпта к каноническому виду для ключа кэша.
+
+    Различия, не влияющие на смысл запроса (Unicode-нормализация, пробелы
+    в конце строк, повторы пробелов, лишние пустые строки), не дают
+    разных ключей. Регистр сохраняется.
+    """
+    text = unicodedata.normalize('NFC', prompt).replace('\r\n', '\n')
+    lines = [re.sub(r'[ \t]+', ' ', line).strip() for line in text.split('\n')]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+
+def make_key(provider: str, model: str, prompt: str, temperature: float, max_tokens: int) -> str:
+    """Ключ кэша: sha256 от провайдера, модели, промпта и параметров генерации"""
+    payload = json.dumps(
+        [provider, model, normalize_prompt(prompt), round(float(temperature), 3), int(max_tokens)],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class CacheStats:
+    """Счетчики кэша ответов AI"""
+
+    def __init__(self):
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0           # запрос не кэшируется (temperature > 0 при включенном обходе)
+        self.stores = 0
+        self.saved_time = 0.0       # сумма задержек исходных запросов, отданных из кэша
+
+    def as_dict(self) -> dict:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'bypassed': self.bypassed,
+            'stores': self.stores,
+            'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+            'saved_seconds': round(self.saved_time, 2),
+        }
+
+
+class AICache:
+    """Двухуровневый кэш ответов AI-моделей.
+
+    Первый уровень - LRU в памяти на ``memory_size`` записей, второй -
+    таблица SQLite (WAL) с TTL, переживающая перезапуск бота. Запрос в
+    базу выполняется в отдельном потоке, поэтому не блокирует event loop.
+    Вместе с ответом хранится время его генерации: по нему считается,
+    сколько ожидания сэкономил кэш. Ответы с ошибкой не кэшируются.
+    При ``bypass_creative`` запросы с temperature > 0 идут мимо кэша.
+    """
+
+    def __init__(self, path: str, memory_size: int = 256, ttl: int = 7 * 86400, bypass_creative: bool = False):
+        self.path = Path(path)
+        self.memory_size = memory_size
+        self.ttl = ttl
+        self.bypass_creative = bypass_creative
+        self.stats = CacheStats()
+        self._memory: "OrderedDict[str, Tuple[str, float, float]]" = OrderedDict()
+        # Кэш может использоваться из loop бота и из потока синхронного AIService
+        self._lock = threading.Lock()
+        self._io: Optional[ThreadPoolExecutor] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._last_cleanup = 0.0
+
+    def should_cache(self, temperature: float) -> bool:
+        if self.bypass_creative and temperature > 0:
+            self.stats.bypassed += 1
+            return False
+        return True
+
+    async def _run(self, func, *args):
+        if self._io is None:
+            self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai-cache")
+        return await asyncio.get_running_loop().run_in_executor(self._io, func, *args)
+
+    def _connect(self) -> sqlite3.Connection:
+        # База открывается при первом обращении, а не при импорте модуля
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS ai_cache ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, latency REAL NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ai_cache_created_at ON ai_cache(created_at)")
+            self._conn.commit()
+        return self._conn
+
+    def _load(self, key: str):
+        return self._connect().execute(
+            "SELECT response, latency, created_at FROM ai_cache WHERE key = ?", (key,)
+        ).fetchone()
+
+    def _store(self, key: str, response: str, latency: float, created_at: float, expire_before: Optional[float]):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO ai_cache (key, response, latency, created_at) VALUES (?, ?, ?, ?)",
+                (key, response, latency, created_at)
+            )
+            if expire_before is not None:
+                conn.execute("DELETE FROM ai_cache WHERE created_at < ?", (expire_before,))
+
+    def _remember(self, key: str, entry: Tuple[str, float, float]):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[str]:
+        """Ответ из кэша или None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[2] < self.ttl:
+                    self._memory.move_to_end(key)
+                else:
+                    del self._memory[key]
+                    entry = None
+        if entry is not None:
+            self.stats.memory_hits += 1
+            self.stats.saved_time += entry[1]
+            return entry[0]
+
+        try:
+            row = await self._run(self._load, key)
+        except Exception as e:
+            logger.error(f"Ошибка чтения кэша AI: {e}", exc_info=True)
+            row = None
+        if row and now - row[2] < self.ttl:
+            self._remember(key, row)
+            self.stats.disk_hits += 1
+            self.stats.saved_time += row[1]
+            return row[0]
+
+        self.stats.misses += 1
+        return None
+
+    async def set(self, key: str, response: str, latency: float):
+        """Сохранение ответа на обоих уровнях"""
+        now = time.time()
+        self._remember(key, (response, latency, now))
+        self.stats.stores += 1
+
+        expire_before = None
+        if now - self._last_cleanup >= CLEANUP_INTERVAL:
+            expire_before = now - self.ttl
+            self._last_cleanup = now
+        try:
+            await self._run(self._store, key, response, latency, now, expire_before)
+        except Exception as e:
+            logger.error(f"Ошибка записи кэша AI: {e}", exc_info=True)
+
+    def get_metrics(self) -> dict:
+        metrics = self.stats.as_dict()
+        metrics['memory_entries'] = len(self._memory)
+        return metrics
+
+    async def close(self):
+        if self._io is None:
+            return
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        self._io.shutdown(wait=True)
+        self._io = None
+
+
+# Глобальный кэш ответов AI
+ai_cache = AICache(
+    Config.AI_CACHE_PATH,
+    memory_size=Config.AI_CACHE_MEMORY_SIZE,
+    ttl=Config.AI_CACHE_TTL,
+    bypass_creative=Config.AI_CACHE_BYPASS_CREATIVE
+)
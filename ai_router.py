@@ -0,0 +1,278 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+MIN_SAMPLES = 10            # меньше успешных ответов - p95 считается неизвестным
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Ошибка провайдера, при которой имеет смысл обратиться к другому.
+
+    Сетевые ошибки и таймауты SDK, 408/409/429, 5xx и ошибки ключа 401/403
+    (ключ у каждого провайдера свой) - да; остальные 4xx (некорректный
+    запрос) повторятся и у другого провайдера.
+    """
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in ('APIConnectionError', 'APITimeoutError'):
+        return True
+    status = getattr(error, 'status_code', None)
+    if status is not None:
+        return status in (401, 403, 408, 409, 429) or status >= 500
+    return False
+
+
+class ProviderHealth:
+    """Скользящая статистика и автомат circuit breaker одного провайдера.
+
+    Хранит задержки успешных ответов (время работы провайдера без ожидания
+    в очереди своего лимита) и исходы последних ``window`` запросов.
+    После ``failure_threshold`` ошибок подряд breaker открывается, и
+    провайдер пропускается ``cooldown`` секунд; затем пропускается один
+    пробный запрос (half-open): успех закрывает breaker, ошибка снова
+    открывает.
+    """
+
+    def __init__(self, window: int = 100, failure_threshold: int = 3, cooldown: float = 30.0):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.opened = 0
+
+    def allow(self, now: float) -> bool:
+        if self.state == OPEN and now - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            self.trial_in_flight = False
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_latency(self, latency: float):
+        self.latencies.append(latency)
+
+    def record_success(self):
+        self.outcomes.append(True)
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.trial_in_flight = False
+
+    def record_failure(self, now: float):
+        self.outcomes.append(False)
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.opened += 1
+            self.state = OPEN
+            self.opened_at = now
+            self.trial_in_flight = False
+
+    def release(self):
+        """Запрос отменен без результата - пробный слот half-open освобождается"""
+        self.trial_in_flight = False
+
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self.latencies) < MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+    def as_dict(self) -> dict:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            'state': self.state,
+            'samples': len(self.outcomes),
+            'error_rate': round(self.error_rate(), 3),
+            'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+            'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+            'breaker_opened': self.opened,
+        }
+
+
+class AIRouter:
+    """Выбор провайдера AI с переключением при сбоях и хеджированием.
+
+    Сначала запрос уходит запрошенному провайдеру, при сетевой ошибке,
+    таймауте, 429, 5xx или ошибке ключа - следующему по ``providers``,
+    минуя провайдеров с открытым breaker. При ``hedge`` второй провайдер
+    запускается параллельно, если первый не ответил за свой p95 (в пределах
+    ``hedge_min_delay``..``hedge_max_delay``; пока статистики мало -
+    ``hedge_max_delay``): побеждает первый успешный ответ, второй запрос
+    отменяется, а ошибка одного из запросов не прерывает другой. Так хвост
+    задержек ограничен, даже если один провайдер деградировал.
+    """
+
+    def __init__(self, providers: Sequence[str], failover: bool = True, hedge: bool = False,
+                 hedge_min_delay: float = 1.0, hedge_max_delay: float = 15.0,
+                 window: int = 100, failure_threshold: int = 3, cooldown: float = 30.0):
+        self.providers = list(providers)
+        self.failover = failover
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_delay = hedge_max_delay
+        self._health_args = (window, failure_threshold, cooldown)
+        self.health: Dict[str, ProviderHealth] = {
+            provider: ProviderHealth(*self._health_args) for provider in self.providers
+        }
+        self.failovers = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.rejected = 0
+
+    def _health(self, provider: str) -> ProviderHealth:
+        if provider not in self.health:
+            self.health[provider] = ProviderHealth(*self._health_args)
+        return self.health[provider]
+
+    def _order(self, model: str, available: Sequence[str]) -> List[str]:
+        order = [model] + ([p for p in self.providers if p != model] if self.failover or self.hedge else [])
+        return [provider for provider in order if provider in available]
+
+    def _next(self, queue: List[str]) -> Optional[str]:
+        now = time.monotonic()
+        while queue:
+            provider = queue.pop(0)
+            if self._health(provider).allow(now):
+                return provider
+            self.rejected += 1
+        return None
+
+    def hedge_delay(self, provider: str) -> float:
+        p95 = self._health(provider).percentile(95)
+        if p95 is None:
+            return self.hedge_max_delay
+        return min(self.hedge_max_delay, max(self.hedge_min_delay, p95))
+
+    def pick(self, model: str, available: Sequence[str]) -> Optional[str]:
+        """Провайдер для запроса без хеджирования (потоковый ответ)"""
+        return self._next(self._order(model, available))
+
+    def observe(self, provider: str, latency: float):
+        """Время ответа провайдера (без ожидания в очереди) для p95"""
+        self._health(provider).record_latency(latency)
+
+    def release(self, provider: str):
+        """Запрос к провайдеру из pick() завершился без результата (отмена, закрытие потока)"""
+        self._health(provider).release()
+
+    def record(self, provider: str, error: Optional[BaseException] = None):
+        health = self._health(provider)
+        if error is None:
+            health.record_success()
+        elif is_retryable(error):
+            health.record_failure(time.monotonic())
+        else:
+            health.release()
+
+    async def route(self, model: str, available: Sequence[str],
+                    call: Callable[[str], Awaitable[str]]) -> str:
+        """Выполнить ``call(provider)`` с переключением и хеджированием"""
+        queue = self._order(model, available)
+        running: Dict[asyncio.Task, tuple] = {}
+        last_error: Optional[BaseException] = None
+
+        def launch(provider: str, hedged: bool):
+            task = asyncio.ensure_future(call(provider))
+            running[task] = (provider, time.perf_counter(), hedged)
+
+        try:
+            while True:
+                if not running:
+                    # Без failover другие провайдеры используются только для хеджирования
+                    provider = self._next(queue) if self.failover or last_error is None else None
+                    if provider is None:
+                        break
+                    if provider != model:
+                        self.failovers += 1
+                        logger.warning(f"AI: переключение на {provider} (запрошен {model})")
+                    launch(provider, hedged=False)
+
+                timeout = None
+                if self.hedge and len(running) == 1 and queue:
+                    provider, started_at, _ = next(iter(running.values()))
+                    timeout = max(0.0, self.hedge_delay(provider) - (time.perf_counter() - started_at))
+
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    provider = self._next(queue)
+                    if provider is not None:
+                        self.hedges += 1
+                        launch(provider, hedged=True)
+                    continue
+
+                for task in done:
+                    provider, started_at, hedged = running.pop(task)
+                    health = self._health(provider)
+                    error = task.exception()
+                    if error is None:
+                        health.record_success()
+                        if hedged:
+                            self.hedge_wins += 1
+                        return task.result()
+                    if not is_retryable(error):
+                        health.release()
+                        if not running:
+                            raise error
+                        # Ошибка одного из параллельных запросов (хеджа) не отменяет остальные:
+                        # ответ или ошибку даст последний из них
+                        last_error = error
+                        logger.warning(f"AI: ошибка {provider}: {error}")
+                        continue
+                    health.record_failure(time.monotonic())
+                    last_error = error
+                    logger.warning(f"AI: ошибка {provider}: {error}")
+        finally:
+            for task, (provider, _, _) in running.items():
+                task.cancel()
+                self._health(provider).release()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+        if last_error is not None:
+            raise last_error
+        raise RuntimeError("All AI providers are temporarily unavailable (circuit breaker open)")
+
+    def get_metrics(self) -> dict:
+        return {
+            'failovers': self.failovers,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'rejected_by_breaker': self.rejected,
+            'providers': {provider: health.as_dict() for provider, health in self.health.items()},
+        }
+
+
+def create_router() -> Optional[AIRouter]:
+    """Маршрутизатор по настройкам AI_FAILOVER/AI_HEDGE (None, если оба выключены)"""
+    if not (Config.AI_FAILOVER or Config.AI_HEDGE):
+        return None
+    providers = [p.strip() for p in Config.AI_ROUTER_PROVIDERS.split(',') if p.strip()]
+    return AIRouter(
+        providers,
+        failover=Config.AI_FAILOVER,
+        hedge=Config.AI_HEDGE,
+        hedge_min_delay=Config.AI_HEDGE_MIN_DELAY,
+        hedge_max_delay=Config.AI_HEDGE_MAX_DELAY,
+        window=Config.AI_ROUTER_WINDOW,
+        failure_threshold=Config.AI_BREAKER_FAILURES,
+        cooldown=Config.AI_BREAKER_COOLDOWN
+    )
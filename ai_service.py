@@ -1,143 +1,543 @@
 import logging
 import asyncio
-from typing import Optional
-from openai import OpenAI, APIError
-from anthropic import Anthropic
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, List, Optional, Sequence, Tuple
+from openai import AsyncOpenAI, APIError, DefaultAsyncHttpxClient
+from anthropic import AsyncAnthropic
+from anthropic import DefaultAsyncHttpxClient as AnthropicHttpxClient
 from config import Config
+from executor import parse_plugin_limits
+from ai_cache import AICache, ai_cache, make_key
+from ai_router import AIRouter, create_router
+from ai_usage import AIQuota, UsageRecord, ai_quota, estimate_tokens, record_usage
 
 logger = logging.getLogger(__name__)
 
-class AIService:
-    """Unified interface for working with all AI assistants"""
-    
+SYSTEM_PROMPT = "You are a QA testing expert. Answer in Russian when needed."
+PROVIDERS = ("openai", "claude", "deepseek")
+# Config attribute holding the model name of each provider
+MODEL_NAMES = {"openai": "OPENAI_MODEL", "claude": "ANTHROPIC_MODEL", "deepseek": "DEEPSEEK_MODEL"}
+
+
+class ProviderMetrics:
+    """Load counters for one AI provider"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.waiting = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_time = 0.0
+        self.run_time = 0.0
+
+    def as_dict(self) -> dict:
+        finished = self.completed + self.failed
+        return {
+            'limit': self.limit,
+            'waiting': self.waiting,
+            'in_flight': self.in_flight,
+            'completed': self.completed,
+            'failed': self.failed,
+            'avg_wait_ms': round(self.wait_time / finished * 1000, 2) if finished else 0.0,
+            'avg_latency_ms': round(self.run_time / finished * 1000, 2) if finished else 0.0,
+        }
+
+
+class FlightStats:
+    """Single-flight counters: how many calls were served by another call's request"""
+
     def __init__(self):
+        self.leaders = 0
+        self.coalesced = 0
+
+    def as_dict(self, in_flight: int) -> dict:
+        calls = self.leaders + self.coalesced
+        return {
+            'leaders': self.leaders,
+            'coalesced': self.coalesced,
+            'dedup_ratio': round(self.coalesced / calls, 3) if calls else 0.0,
+            'in_flight_keys': in_flight,
+        }
+
+
+class AsyncAIService:
+    """Non-blocking interface for all AI assistants.
+
+    Uses ``AsyncOpenAI``/``AsyncAnthropic`` so an LLM round trip never blocks
+    the event loop. OpenAI-compatible providers share one pooled HTTP client,
+    Claude has its own; each provider has a concurrency semaphore and a
+    request timeout. Clients are created lazily in the loop that uses them.
+    Successful responses are stored in ``cache`` (the shared ``ai_cache``
+    unless ``AI_CACHE_ENABLED`` is off) and reused for identical requests;
+    a response is keyed by the provider that actually produced it.
+    Identical concurrent ``generate_text`` calls share one provider request
+    (single-flight): the request runs as a separate task and callers await
+    it through ``asyncio.shield``, so a cancelled caller does not cancel
+    the request for the others. With a ``router`` (built from the AI_FAILOVER
+    and AI_HEDGE settings by default) a failing or slow provider is
+    replaced by the next configured one. Requests that reach a provider are
+    charged against the ``quota`` token buckets (per ``user_id`` and global)
+    and wait while a bucket is empty.
+    """
+
+    def __init__(self, timeout: float = None, provider_limit: int = None, provider_limits: dict = None,
+                 cache: Optional[AICache] = None, router: Optional[AIRouter] = None,
+                 quota: Optional[AIQuota] = None):
+        self.default_model = Config.DEFAULT_AI_MODEL
+        self.timeout = timeout or Config.AI_TIMEOUT
+        self.provider_limit = provider_limit or Config.AI_PROVIDER_LIMIT
+        self.provider_limits = provider_limits if provider_limits is not None \
+            else parse_plugin_limits(Config.AI_PROVIDER_LIMITS)
         self.openai_client = None
         self.claude_client = None
         self.deepseek_client = None
-        self.default_model = Config.DEFAULT_AI_MODEL
-        
-        self._init_clients()
-    
+        self._openai_http = None
+        self._anthropic_http = None
+        self._initialized = False
+        self._semaphores = {}
+        self._metrics = {provider: ProviderMetrics(self._limit(provider)) for provider in PROVIDERS}
+        self.cache = cache if cache is not None else (ai_cache if Config.AI_CACHE_ENABLED else None)
+        self._flights = {}
+        self.flight_stats = FlightStats()
+        self.router = router if router is not None else create_router()
+        self.quota = quota if quota is not None else ai_quota
+
+    def _limit(self, provider: str) -> int:
+        return self.provider_limits.get(provider, self.provider_limit)
+
     def _init_clients(self):
-        """Initialize clients for all AI services"""
+        """Initialize clients for all AI services (once, on first use)"""
+        if self._initialized:
+            return
+        self._initialized = True
+
         try:
+            if Config.OPENAI_API_KEY or Config.DEEPSEEK_API_KEY:
+                # One keep-alive pool for OpenAI-compatible APIs
+                self._openai_http = DefaultAsyncHttpxClient()
             if Config.OPENAI_API_KEY:
-                self.openai_client = OpenAI(api_key=Config.OPENAI_API_KEY)
+                self.openai_client = AsyncOpenAI(
+                    api_key=Config.OPENAI_API_KEY,
+                    base_url=Config.OPENAI_BASE_URL,
+                    timeout=self.timeout,
+                    max_retries=Config.AI_MAX_RETRIES,
+                    http_client=self._openai_http
+                )
                 logger.info("✅ OpenAI client initialized")
         except Exception as e:
             logger.warning(f"⚠️ OpenAI init failed: {e}")
-        
+
         try:
             if Config.ANTHROPIC_API_KEY:
-                self.claude_client = Anthropic(api_key=Config.ANTHROPIC_API_KEY)
+                self._anthropic_http = AnthropicHttpxClient()
+                self.claude_client = AsyncAnthropic(
+                    api_key=Config.ANTHROPIC_API_KEY,
+                    base_url=Config.ANTHROPIC_BASE_URL,
+                    timeout=self.timeout,
+                    max_retries=Config.AI_MAX_RETRIES,
+                    http_client=self._anthropic_http
+                )
                 logger.info("✅ Claude client initialized")
         except Exception as e:
             logger.warning(f"⚠️ Claude init failed: {e}")
-        
+
         try:
             if Config.DEEPSEEK_API_KEY:
-                self.deepseek_client = OpenAI(
+                self.deepseek_client = AsyncOpenAI(
                     api_key=Config.DEEPSEEK_API_KEY,
-                    base_url=Config.DEEPSEEK_BASE_URL
+                    base_url=Config.DEEPSEEK_BASE_URL,
+                    timeout=self.timeout,
+                    max_retries=Config.AI_MAX_RETRIES,
+                    http_client=self._openai_http
                 )
                 logger.info("✅ DeepSeek client initialized")
         except Exception as e:
             logger.warning(f"⚠️ DeepSeek init failed: {e}")
-    
-    def generate_text(self, prompt: str, model: str = None, temperature: float = 0.7, max_tokens: int = 2000) -> str:
+
+    @asynccontextmanager
+    async def _slot(self, provider: str):
+        """Hold one of the provider's concurrency slots"""
+        if provider not in self._semaphores:
+            self._semaphores[provider] = asyncio.Semaphore(self._limit(provider))
+        semaphore, metrics = self._semaphores[provider], self._metrics[provider]
+
+        metrics.waiting += 1
+        queued_at = time.perf_counter()
+        try:
+            await semaphore.acquire()
+        finally:
+            metrics.waiting -= 1
+        started_at = time.perf_counter()
+        metrics.wait_time += started_at - queued_at
+        metrics.in_flight += 1
+        try:
+            yield
+            metrics.completed += 1
+            if self.router is not None:
+                self.router.observe(provider, time.perf_counter() - started_at)
+        except asyncio.CancelledError:
+            metrics.failed += 1
+            # Request lost a hedge race: its time so far is a lower bound, keep it so p95 is not biased down
+            if self.router is not None:
+                self.router.observe(provider, time.perf_counter() - started_at)
+            raise
+        except BaseException:
+            metrics.failed += 1
+            raise
+        finally:
+            metrics.in_flight -= 1
+            metrics.run_time += time.perf_counter() - started_at
+            semaphore.release()
+
+    async def _call(self, provider: str, coro_factory):
+        """Run one provider request under its concurrency limit"""
+        async with self._slot(provider):
+            return await coro_factory()
+
+    def _cache_key(self, model: str, prompt: str, temperature: float, max_tokens: int) -> Optional[str]:
+        if self.cache is None or model not in MODEL_NAMES or not self.cache.should_cache(temperature):
+            return None
+        return make_key(model, getattr(Config, MODEL_NAMES[model]), prompt, temperature, max_tokens)
+
+    async def generate_text(self, prompt: str, model: str = None, temperature: float = 0.7,
+                            max_tokens: int = 2000, user_id: int = None) -> str:
         """Generate text with selected model"""
         model = model or self.default_model
-        
+        if model not in MODEL_NAMES:
+            text, _ = await self._generate(prompt, model, temperature, max_tokens)
+            return text
+
+        flight_key = make_key(model, getattr(Config, MODEL_NAMES[model]), prompt, temperature, max_tokens)
+        task = self._flights.get(flight_key)
+        if task is None:
+            self.flight_stats.leaders += 1
+            task = asyncio.ensure_future(self._cached_generate(prompt, model, temperature, max_tokens, user_id))
+            self._flights[flight_key] = task
+            task.add_done_callback(lambda done: self._land(flight_key, done))
+        else:
+            self.flight_stats.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _land(self, flight_key: str, task: asyncio.Task):
+        if self._flights.get(flight_key) is task:
+            del self._flights[flight_key]
+        # The result may have no waiters left: retrieve the error so it is not reported as lost
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"AI request failed: {task.exception()}")
+
+    async def _cached_generate(self, prompt: str, model: str, temperature: float, max_tokens: int,
+                               user_id: int = None) -> str:
+        key = self._cache_key(model, prompt, temperature, max_tokens)
+        if key is not None:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        model_name = getattr(Config, MODEL_NAMES[model])
+        estimated = self.quota.estimate(prompt, model_name, max_tokens)
+        async with self.quota.reserve(user_id, model, estimated) as usage:
+            started_at = time.perf_counter()
+            text, provider = await self._generate(prompt, model, temperature, max_tokens)
+            if not usage.reported and not text.startswith("❌"):
+                usage.add(estimate_tokens(prompt, model_name), estimate_tokens(text, model_name))
+        # After a failover the answer belongs to the provider that gave it, not the requested one
+        if provider != model:
+            key = self._cache_key(provider, prompt, temperature, max_tokens)
+        if key is not None and not text.startswith("❌"):
+            await self.cache.set(key, text, time.perf_counter() - started_at)
+        return text
+
+    def _client(self, provider: str):
+        return {"openai": self.openai_client, "claude": self.claude_client,
+                "deepseek": self.deepseek_client}.get(provider)
+
+    def _available(self) -> list:
+        return [provider for provider in PROVIDERS if self._client(provider)]
+
+    async def _generate(self, prompt: str, model: str, temperature: float, max_tokens: int) -> Tuple[str, str]:
+        """Response text and the provider that produced it (differs from ``model`` after a failover)"""
+        self._init_clients()
+
+        async def request(provider: str) -> Tuple[str, str]:
+            return await self._request(prompt, provider, temperature, max_tokens), provider
+
         try:
-            if model == "openai":
-                return self._openai_generate(prompt, temperature, max_tokens)
-            elif model == "claude":
-                return self._claude_generate(prompt, temperature, max_tokens)
-            elif model == "deepseek":
-                return self._deepseek_generate(prompt, temperature, max_tokens)
-            else:
-                raise ValueError(f"Unknown model: {model}")
+            if self.router is not None and model in MODEL_NAMES and self._available():
+                return await self.router.route(model, self._available(), request)
+            return await request(model)
         except Exception as e:
             logger.error(f"Error generating text with {model}: {e}", exc_info=True)
-            return f"❌ Error with AI ({model}): {str(e)}"
-    
-    def _openai_generate(self, prompt: str, temperature: float, max_tokens: int) -> str:
+            return f"❌ Error with AI ({model}): {str(e)}", model
+
+    async def _request(self, prompt: str, model: str, temperature: float, max_tokens: int) -> str:
+        if model == "openai":
+            return await self._openai_generate(prompt, temperature, max_tokens)
+        elif model == "claude":
+            return await self._claude_generate(prompt, temperature, max_tokens)
+        elif model == "deepseek":
+            return await self._deepseek_generate(prompt, temperature, max_tokens)
+        else:
+            raise ValueError(f"Unknown model: {model}")
+
+    async def _openai_generate(self, prompt: str, temperature: float, max_tokens: int) -> str:
         """OpenAI GPT"""
         if not self.openai_client:
             return "❌ OpenAI API key not found. Check .env file"
-        
+        return await self._chat_completion("openai", self.openai_client, Config.OPENAI_MODEL,
+                                           prompt, temperature, max_tokens)
+
+    async def _deepseek_generate(self, prompt: str, temperature: float, max_tokens: int) -> str:
+        """DeepSeek"""
+        if not self.deepseek_client:
+            return "❌ DeepSeek API key not found. Check .env file"
+        return await self._chat_completion("deepseek", self.deepseek_client, Config.DEEPSEEK_MODEL,
+                                           prompt, temperature, max_tokens)
+
+    async def _chat_completion(self, provider: str, client: AsyncOpenAI, model_name: str,
+                               prompt: str, temperature: float, max_tokens: int) -> str:
+        """OpenAI-compatible chat completion"""
         try:
-            response = self.openai_client.chat.completions.create(
-                model=Config.OPENAI_MODEL,
+            response = await self._call(provider, lambda: client.chat.completions.create(
+                model=model_name,
                 messages=[
-                    {"role": "system", "content": "You are a QA testing expert. Answer in Russian when needed."},
+                    {"role": "system", "content": SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=temperature,
                 max_tokens=max_tokens
-            )
+            ))
+            if response.usage is not None:
+                record_usage(response.usage.prompt_tokens, response.usage.completion_tokens)
             return response.choices[0].message.content
         except APIError as e:
-            logger.error(f"OpenAI API error: {e}")
+            logger.error(f"{provider} API error: {e}")
             raise
-    
-    def _claude_generate(self, prompt: str, temperature: float, max_tokens: int) -> str:
+
+    async def _claude_generate(self, prompt: str, temperature: float, max_tokens: int) -> str:
         """Anthropic Claude"""
         if not self.claude_client:
             return "❌ Claude API key not found. Check .env file"
-        
+
         try:
-            response = self.claude_client.messages.create(
+            response = await self._call("claude", lambda: self.claude_client.messages.create(
                 model=Config.ANTHROPIC_MODEL,
                 max_tokens=max_tokens,
-                system="You are a QA testing expert. Answer in Russian when needed.",
+                system=SYSTEM_PROMPT,
                 messages=[
                     {"role": "user", "content": prompt}
                 ],
-                temperature=temperature
-            )
+                # Sent in the body: newer SDK releases dropped the keyword argument
+                extra_body={"temperature": temperature}
+            ))
+            if getattr(response, "usage", None) is not None:
+                record_usage(response.usage.input_tokens, response.usage.output_tokens)
             return response.content[0].text
         except Exception as e:
             logger.error(f"Claude API error: {e}")
             raise
-    
-    def _deepseek_generate(self, prompt: str, temperature: float, max_tokens: int) -> str:
-        """DeepSeek"""
-        if not self.deepseek_client:
-            return "❌ DeepSeek API key not found. Check .env file"
-        
+
+    async def stream_text(self, prompt: str, model: str = None, temperature: float = 0.7,
+                          max_tokens: int = 2000, user_id: int = None) -> AsyncIterator[str]:
+        """Generate text with selected model, yielding text deltas as they arrive.
+
+        Errors are reported the same way as in ``generate_text``: as a final
+        ``❌`` chunk instead of an exception. A cached response is yielded
+        as a single chunk; a completed stream is stored in the cache.
+        """
+        model = model or self.default_model
+        key = self._cache_key(model, prompt, temperature, max_tokens)
+        if key is not None:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+        self._init_clients()
+
+        names = {"openai": "OpenAI", "claude": "Claude", "deepseek": "DeepSeek"}
+        if model not in names:
+            yield f"❌ Error with AI ({model}): Unknown model: {model}"
+            return
+        # A stream cannot be switched mid-answer: the router only picks a healthy provider up front
+        provider = model
+        if self.router is not None and self._available():
+            provider = self.router.pick(model, self._available())
+            if provider is None:
+                yield f"❌ Error with AI ({model}): All AI providers are temporarily unavailable"
+                return
+        # pick() may have taken the half-open trial slot: whatever ends the stream
+        # (an error, an early close or a cancelled task) must give it back
+        recorded = False
         try:
-            response = self.deepseek_client.chat.completions.create(
-                model=Config.DEEPSEEK_MODEL,
-                messages=[
-                    {"role": "system", "content": "You are a QA testing expert. Answer in Russian when needed."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            logger.error(f"DeepSeek API error: {e}")
-            raise
-    
-    def improve_bug_report(self, bug_data: dict, model: str = None) -> str:
+            client = self._client(provider)
+            if not client:
+                yield f"❌ {names[provider]} API key not found. Check .env file"
+                return
+
+            chunks = []
+            model_name = getattr(Config, MODEL_NAMES[provider])
+            estimated = self.quota.estimate(prompt, model_name, max_tokens)
+            started_at = time.perf_counter()
+            try:
+                async with self.quota.reserve(user_id, provider, estimated, bind=False) as usage, \
+                        self._slot(provider):
+                    if provider == "claude":
+                        deltas = self._claude_stream(prompt, temperature, max_tokens, usage)
+                    else:
+                        deltas = self._chat_completion_stream(client, model_name, prompt, temperature,
+                                                              max_tokens, usage)
+                    async for delta in deltas:
+                        chunks.append(delta)
+                        yield delta
+                    if not usage.reported:
+                        usage.add(estimate_tokens(prompt, model_name), estimate_tokens("".join(chunks), model_name))
+            except Exception as e:
+                logger.error(f"Error streaming text with {provider}: {e}", exc_info=True)
+                if self.router is not None:
+                    self.router.record(provider, e)
+                    recorded = True
+                yield ("\n\n" if chunks else "") + f"❌ Error with AI ({provider}): {str(e)}"
+                return
+            if self.router is not None:
+                self.router.record(provider)
+                recorded = True
+            if provider != model:
+                key = self._cache_key(provider, prompt, temperature, max_tokens)
+            if key is not None and chunks:
+                await self.cache.set(key, "".join(chunks), time.perf_counter() - started_at)
+        finally:
+            if self.router is not None and not recorded:
+                self.router.release(provider)
+
+    async def _chat_completion_stream(self, client: AsyncOpenAI, model_name: str, prompt: str,
+                                      temperature: float, max_tokens: int,
+                                      usage: UsageRecord) -> AsyncIterator[str]:
+        """OpenAI-compatible chat completion with stream=True"""
+        stream = await client.chat.completions.create(
+            model=model_name,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            # Token usage arrives in a final chunk without choices
+            stream_options={"include_usage": True}
+        )
+        async with stream:
+            async for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    usage.add(chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    async def _claude_stream(self, prompt: str, temperature: float, max_tokens: int,
+                             usage: UsageRecord) -> AsyncIterator[str]:
+        """Anthropic Messages API with stream=True"""
+        stream = await self.claude_client.messages.create(
+            model=Config.ANTHROPIC_MODEL,
+            max_tokens=max_tokens,
+            system=SYSTEM_PROMPT,
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            extra_body={"temperature": temperature},
+            stream=True
+        )
+        async with stream:
+            async for event in stream:
+                if event.type == "content_block_delta" and getattr(event.delta, "text", None):
+                    yield event.delta.text
+                elif event.type == "message_start":
+                    usage.add(event.message.usage.input_tokens, None)
+                elif event.type == "message_delta" and getattr(event, "usage", None) is not None:
+                    usage.add(None, event.usage.output_tokens)
+
+    async def improve_bug_report(self, bug_data: dict, model: str = None) -> str:
         """Improve bug report with AI"""
-        prompt = f"""Please improve the following bug report. Make it more professional and complete:
+        return await self.generate_text(build_bug_report_prompt(bug_data), model)
+
+    async def generate_test_case(self, feature_description: str, model: str = None) -> str:
+        """Generate test case from feature description"""
+        return await self.generate_text(build_test_case_prompt(feature_description), model)
+
+    async def generate_batch(self, prompts: Sequence[str], model: str = None, temperature: float = 0.7,
+                             max_tokens: int = 2000, user_id: int = None, concurrency: int = None,
+                             on_result: Optional[Callable[[int, str], None]] = None) -> List[str]:
+        """Generate texts for many prompts with at most ``concurrency`` requests in flight.
+
+        Repeated prompts are requested once and cached answers are free
+        (each unique prompt goes through ``generate_text``). The limit keeps
+        one batch from taking every provider slot from other users. Results
+        keep the order of ``prompts``; a failed item holds its "❌" error
+        text. ``on_result(index, text)`` is called as soon as an item is ready.
+        """
+        slots = asyncio.Semaphore(concurrency or Config.AI_BATCH_CONCURRENCY)
+        positions = {}
+        for index, prompt in enumerate(prompts):
+            positions.setdefault(prompt, []).append(index)
+        results = [""] * len(prompts)
+
+        async def one(prompt: str):
+            async with slots:
+                text = await self.generate_text(prompt, model, temperature, max_tokens, user_id)
+            for index in positions[prompt]:
+                results[index] = text
+                if on_result is not None:
+                    on_result(index, text)
+
+        await asyncio.gather(*(one(prompt) for prompt in positions))
+        return results
+
+    async def generate_test_cases(self, feature_descriptions: Sequence[str], model: str = None,
+                                  user_id: int = None, on_result: Optional[Callable[[int, str], None]] = None
+                                  ) -> List[str]:
+        """Generate one test case per feature description"""
+        return await self.generate_batch([build_test_case_prompt(feature) for feature in feature_descriptions],
+                                         model, user_id=user_id, on_result=on_result)
+
+    def get_metrics(self) -> dict:
+        return {provider: metrics.as_dict() for provider, metrics in self._metrics.items()}
+
+    def get_dedup_metrics(self) -> dict:
+        return self.flight_stats.as_dict(len(self._flights))
+
+    async def close(self):
+        """Close pooled HTTP clients"""
+        flights = list(self._flights.values())
+        for task in flights:
+            task.cancel()
+        await asyncio.gather(*flights, return_exceptions=True)
+        for client in (self._openai_http, self._anthropic_http):
+            if client is not None:
+                await client.aclose()
+        self._openai_http = self._anthropic_http = None
+        self.openai_client = self.claude_client = self.deepseek_client = None
+        self._initialized = False
+
+
+def build_bug_report_prompt(bug_data: dict) -> str:
+    extra = ""
+    if bug_data.get('environment'):
+        extra += f"\nEnvironment: {bug_data['environment']}"
+    if bug_data.get('severity'):
+        extra += f"\nSeverity: {bug_data['severity']}"
+    return f"""Please improve the following bug report. Make it more professional and complete:
 
 Title: {bug_data.get('title', 'N/A')}
 Description: {bug_data.get('description', 'N/A')}
 Repro Steps: {', '.join(bug_data.get('steps', []))}
 Actual Result: {bug_data.get('actual_result', 'N/A')}
-Expected Result: {bug_data.get('expected_result', 'N/A')}
+Expected Result: {bug_data.get('expected_result', 'N/A')}{extra}
 
 Return improved bug report in structured format."""
-        
-        return self.generate_text(prompt, model)
-    
-    def generate_test_case(self, feature_description: str, model: str = None) -> str:
-        """Generate test case from feature description"""
-        prompt = f"""Create a detailed test case for the following feature:
+
+
+def build_test_case_prompt(feature_description: str) -> str:
+    return f"""Create a detailed test case for the following feature:
 
 {feature_description}
 
@@ -148,8 +548,97 @@ Test case must include:
 4. Expected Result
 5. Priority
 6. Author"""
-        
-        return self.generate_text(prompt, model)
 
-# Global AI service instance
+
+def build_improve_test_case_prompt(test_case: dict) -> str:
+    steps = "\n".join(f"{i}. {step}" for i, step in enumerate(test_case.get('steps', []), 1)) or "N/A"
+    return f"""Please improve the following test case. Make steps atomic and verifiable, add missing
+preconditions, negative checks and a precise expected result:
+
+Title: {test_case.get('title', 'N/A')}
+Description: {test_case.get('description') or 'N/A'}
+Preconditions: {test_case.get('preconditions') or 'N/A'}
+Steps:
+{steps}
+Expected Result: {test_case.get('expected_result') or 'N/A'}
+Priority: {test_case.get('priority') or 'N/A'}
+
+Return improved test case in structured format."""
+
+
+def build_checklist_prompt(checklist: dict) -> str:
+    items = "\n".join(f"- {item}" for item in checklist.get('items', [])) or "N/A"
+    return f"""Please improve the following QA checklist. Rephrase items as short verifiable checks,
+group them by area and add important missing checks (negative cases, boundaries, UX):
+
+Title: {checklist.get('title', 'N/A')}
+Items:
+{items}
+
+Return improved checklist as a numbered list."""
+
+
+class AIService:
+    """Blocking facade over AsyncAIService for scripts and REPL use.
+
+    Requests run on a private event loop in a background thread. Do not call
+    it from aiogram handlers: use ``async_ai_service`` there instead.
+    """
+
+    def __init__(self):
+        self.default_model = Config.DEFAULT_AI_MODEL
+        self._service: Optional[AsyncAIService] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _run(self, coro_factory):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError("AIService blocks the event loop; use async_ai_service in async code")
+
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="ai-service-loop", daemon=True)
+                self._thread.start()
+                # Token buckets are bound to the bot's event loop: scripts get their own accounting
+                self._service = AsyncAIService(quota=AIQuota())
+        return asyncio.run_coroutine_threadsafe(coro_factory(self._service), self._loop).result()
+
+    def generate_text(self, prompt: str, model: str = None, temperature: float = 0.7, max_tokens: int = 2000) -> str:
+        """Generate text with selected model"""
+        return self._run(lambda service: service.generate_text(prompt, model or self.default_model,
+                                                               temperature, max_tokens))
+
+    def improve_bug_report(self, bug_data: dict, model: str = None) -> str:
+        """Improve bug report with AI"""
+        return self._run(lambda service: service.improve_bug_report(bug_data, model or self.default_model))
+
+    def generate_test_case(self, feature_description: str, model: str = None) -> str:
+        """Generate test case from feature description"""
+        return self._run(lambda service: service.generate_test_case(feature_description, model or self.default_model))
+
+    def generate_test_cases(self, feature_descriptions: Sequence[str], model: str = None) -> List[str]:
+        """Generate one test case per feature description"""
+        return self._run(lambda service: service.generate_test_cases(feature_descriptions,
+                                                                     model or self.default_model))
+
+    def close(self):
+        """Stop the background loop and close HTTP clients"""
+        with self._lock:
+            if self._loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self._service.close(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop.close()
+            self._loop = self._thread = self._service = None
+
+
+# Global AI service instances: async for handlers, blocking facade for scripts
+async_ai_service = AsyncAIService()
 ai_service = AIService()
@@ -0,0 +1,266 @@
+import asyncio
+import contextvars
+import logging
+import math
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Dict, Optional
+from config import Config
+
+try:
+    import tiktoken
+except ImportError:  # необязательная зависимость: без нее - оценка по длине текста
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+MAX_USER_BUCKETS = 10000
+
+
+@lru_cache(maxsize=16)
+def _encoder(model: str):
+    """Кодировщик tiktoken для модели (создается один раз)"""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def estimate_tokens(text: str, model: str = None) -> int:
+    """Оценка числа токенов до запроса.
+
+    С установленным tiktoken - точный подсчет для моделей OpenAI (для
+    остальных - cl100k_base), без него - байты UTF-8 / 4: для кириллицы
+    это ближе к реальности, чем символы / 4.
+    """
+    if not text:
+        return 0
+    if tiktoken is not None:
+        try:
+            return len(_encoder(model or "gpt-3.5-turbo").encode(text, disallowed_special=()))
+        except Exception as e:  # например, нет доступа к файлам словаря
+            logger.debug(f"tiktoken недоступен: {e}")
+    return max(1, math.ceil(len(text.encode('utf-8')) / 4))
+
+
+class UsageRecord:
+    """Фактический расход токенов одного обращения к AIService"""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.reported = False       # провайдер вернул usage
+
+    def add(self, prompt_tokens: Optional[int], completion_tokens: Optional[int]):
+        if prompt_tokens is None and completion_tokens is None:
+            return
+        self.prompt_tokens += prompt_tokens or 0
+        self.completion_tokens += completion_tokens or 0
+        self.reported = True
+
+    @property
+    def total(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+# Запись текущего обращения: провайдерские методы добавляют в нее usage из ответа
+current_usage: contextvars.ContextVar[Optional[UsageRecord]] = contextvars.ContextVar('ai_usage', default=None)
+
+
+def record_usage(prompt_tokens: Optional[int], completion_tokens: Optional[int]):
+    record = current_usage.get()
+    if record is not None:
+        record.add(prompt_tokens, completion_tokens)
+
+
+class TokenBucket:
+    """Token bucket с ожиданием вместо отказа.
+
+    Емкость - ``capacity`` токенов, пополнение - ``rate`` токенов в секунду.
+    Запросы обслуживаются по очереди (FIFO): следующий ждет, пока первому
+    не хватит токенов. Расход после ответа корректируется через ``adjust``:
+    баланс может уйти в минус, и тогда ждать будут следующие запросы.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.waiting = 0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float) -> float:
+        """Списать amount токенов, дождавшись пополнения; возвращает время ожидания"""
+        amount = min(amount, self.capacity)
+        started_at = time.monotonic()
+        self.waiting += 1
+        try:
+            async with self._lock:
+                while True:
+                    self._refill()
+                    if self.tokens >= amount:
+                        self.tokens -= amount
+                        return time.monotonic() - started_at
+                    await asyncio.sleep((amount - self.tokens) / self.rate)
+        finally:
+            self.waiting -= 1
+
+    def adjust(self, delta: float):
+        """Доплатить (delta > 0) или вернуть (delta < 0) токены после ответа"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+    def is_idle(self) -> bool:
+        self._refill()
+        return self.waiting == 0 and self.tokens >= self.capacity
+
+
+class UsageStats:
+    """Накопленный расход токенов"""
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.estimated = 0
+        self.wait_time = 0.0
+
+    def add(self, estimated: int, record: UsageRecord, wait_time: float):
+        self.requests += 1
+        self.estimated += estimated
+        self.prompt_tokens += record.prompt_tokens
+        self.completion_tokens += record.completion_tokens
+        self.wait_time += wait_time
+
+    @property
+    def total(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def as_dict(self) -> dict:
+        return {
+            'requests': self.requests,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'estimated_tokens': self.estimated,
+            'avg_wait_ms': round(self.wait_time / self.requests * 1000, 1) if self.requests else 0.0,
+        }
+
+
+class AIQuota:
+    """Лимиты токенов на пользователя и на весь бот, учет расхода.
+
+    Перед запросом к провайдеру резервируется оценка (промпт +
+    ``completion_estimate`` токенов ответа, но не больше max_tokens):
+    сначала в бакете пользователя, затем в общем. Пользователь, выбравший
+    свой лимит, ждет в своей очереди и не занимает общий бакет. После
+    ответа резерв исправляется на фактический расход из usage провайдера
+    (если его нет - на оценку по тексту ответа). Лимит 0 отключает бакет.
+    """
+
+    def __init__(self, global_per_minute: int = 0, user_per_minute: int = 0, completion_estimate: int = 500):
+        self.global_bucket = TokenBucket(global_per_minute / 60, global_per_minute) if global_per_minute else None
+        self.user_per_minute = user_per_minute
+        self.completion_estimate = completion_estimate
+        self.user_buckets: Dict[int, TokenBucket] = {}
+        self.total = UsageStats()
+        self.by_user: Dict[int, UsageStats] = defaultdict(UsageStats)
+        self.by_provider: Dict[str, UsageStats] = defaultdict(UsageStats)
+
+    def _user_bucket(self, user_id: int) -> Optional[TokenBucket]:
+        if not self.user_per_minute or user_id is None:
+            return None
+        bucket = self.user_buckets.get(user_id)
+        if bucket is None:
+            if len(self.user_buckets) >= MAX_USER_BUCKETS:
+                # Полный бездействующий бакет эквивалентен новому - его можно удалить
+                for idle in [uid for uid, b in self.user_buckets.items() if b.is_idle()]:
+                    del self.user_buckets[idle]
+            bucket = self.user_buckets[user_id] = TokenBucket(self.user_per_minute / 60, self.user_per_minute)
+        return bucket
+
+    def estimate(self, prompt: str, model_name: str, max_tokens: int) -> int:
+        return estimate_tokens(prompt, model_name) + min(max_tokens, self.completion_estimate)
+
+    @asynccontextmanager
+    async def reserve(self, user_id: Optional[int], provider: str, estimated: int, bind: bool = True):
+        """Резерв токенов на время запроса.
+
+        При ``bind`` запись расхода доступна провайдерским методам через
+        ``current_usage`` (в том числе в задачах, созданных внутри блока).
+        Для потоковых ответов запись передается явно: async-генератор может
+        продолжаться в другом контексте.
+        """
+        buckets = [b for b in (self._user_bucket(user_id), self.global_bucket) if b is not None]
+        wait_time = 0.0
+        for bucket in buckets:
+            wait_time += await bucket.acquire(estimated)
+        if wait_time > 1:
+            logger.info(f"AI: запрос пользователя {user_id} ждал лимита токенов {wait_time:.1f} с")
+
+        record = UsageRecord()
+        token = current_usage.set(record) if bind else None
+        try:
+            yield record
+        finally:
+            if token is not None:
+                current_usage.reset(token)
+            for bucket in buckets:
+                bucket.adjust(record.total - estimated)
+            self.total.add(estimated, record, wait_time)
+            self.by_provider[provider].add(estimated, record, wait_time)
+            if user_id is not None:
+                self.by_user[user_id].add(estimated, record, wait_time)
+
+    def get_metrics(self) -> dict:
+        return {
+            'total': self.total.as_dict(),
+            'providers': {provider: stats.as_dict() for provider, stats in self.by_provider.items()},
+            'users': len(self.by_user),
+            'global_tokens_available': round(self.global_bucket.tokens) if self.global_bucket else None,
+            'global_waiting': self.global_bucket.waiting if self.global_bucket else 0,
+            'users_waiting': sum(bucket.waiting for bucket in self.user_buckets.values()),
+        }
+
+    def format_report(self, top: int = 10) -> str:
+        """Отчет для администратора (HTML)"""
+        total = self.total
+        lines = [
+            "<b>📊 Расход токенов AI</b>\n",
+            f"Запросов: {total.requests}, токенов: {total.total} "
+            f"(промпт {total.prompt_tokens}, ответ {total.completion_tokens})",
+            f"Оценка до запросов: {total.estimated} токенов",
+            f"Среднее ожидание лимита: {total.as_dict()['avg_wait_ms']} мс",
+        ]
+        if self.global_bucket:
+            lines.append(
+                f"Общий лимит: {self.global_bucket.capacity:.0f} токенов/мин, "
+                f"доступно {max(0, self.global_bucket.tokens):.0f}, в очереди {self.global_bucket.waiting}"
+            )
+        if self.by_provider:
+            lines.append("\n<b>По провайдерам:</b>")
+            for provider, stats in sorted(self.by_provider.items(), key=lambda item: -item[1].total):
+                lines.append(f"• {provider}: {stats.requests} запросов, {stats.total} токенов")
+        if self.by_user:
+            lines.append(f"\n<b>Топ пользователей ({min(top, len(self.by_user))} из {len(self.by_user)}):</b>")
+            ranked = sorted(self.by_user.items(), key=lambda item: -item[1].total)[:top]
+            for user_id, stats in ranked:
+                bucket = self.user_buckets.get(user_id)
+                queued = f", в очереди {bucket.waiting}" if bucket and bucket.waiting else ""
+                lines.append(f"• <code>{user_id}</code>: {stats.requests} запросов, {stats.total} токенов{queued}")
+        return "\n".join(lines)
+
+
+# Глобальные лимиты и учет токенов AI
+ai_quota = AIQuota(
+    global_per_minute=Config.AI_GLOBAL_TOKENS_PER_MINUTE,
+    user_per_minute=Config.AI_USER_TOKENS_PER_MINUTE,
+    completion_estimate=Config.AI_COMPLETION_ESTIMATE
+)
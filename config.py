@@ -6,3 +6,117 @@ load_dotenv()
 class Config:
     BOT_TOKEN = os.getenv('BOT_TOKEN')
     ADMIN_ID = os.getenv('ADMIN_ID')
+
+    # Режим работы: polling или webhook
+    RUN_MODE = os.getenv('RUN_MODE', 'polling')
+    WEB_HOST = os.getenv('WEB_HOST', '0.0.0.0')
+    WEB_PORT = int(os.getenv('WEB_PORT', '8000'))
+    WEB_PROCESSES = int(os.getenv('WEB_PROCESSES', '1'))
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+    WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+    WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+    WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', '8'))
+    WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', '1000'))
+    WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+
+    # FSM-хранилище: memory, sqlite или redis
+    FSM_STORAGE = os.getenv('FSM_STORAGE', 'memory')
+    FSM_SQLITE_PATH = os.getenv('FSM_SQLITE_PATH', 'data/fsm.sqlite3')
+    FSM_REDIS_URL = os.getenv('FSM_REDIS_URL', 'redis://localhost:6379/0')
+    FSM_STATE_TTL = int(os.getenv('FSM_STATE_TTL', '86400'))
+    FSM_FLUSH_INTERVAL = float(os.getenv('FSM_FLUSH_INTERVAL', '1.0'))
+
+    # Пул исполнителей для тяжелых задач плагинов
+    EXECUTOR_THREADS = int(os.getenv('EXECUTOR_THREADS', '4'))
+    EXECUTOR_PROCESSES = int(os.getenv('EXECUTOR_PROCESSES', '0'))
+    EXECUTOR_PLUGIN_LIMIT = int(os.getenv('EXECUTOR_PLUGIN_LIMIT', '2'))
+    EXECUTOR_PLUGIN_LIMITS = os.getenv('EXECUTOR_PLUGIN_LIMITS', '')
+
+    # Общая HTTP-сессия для запросов плагинов к внешним API
+    HTTP_POOL_LIMIT = int(os.getenv('HTTP_POOL_LIMIT', '100'))
+    HTTP_POOL_LIMIT_PER_HOST = int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', '10'))
+    HTTP_DNS_CACHE_TTL = int(os.getenv('HTTP_DNS_CACHE_TTL', '300'))
+    HTTP_KEEPALIVE_TIMEOUT = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', '30'))
+
+    # Кэш file_id отправленных файлов: повторные файлы не загружаются в Telegram заново
+    FILE_ID_CACHE_ENABLED = os.getenv('FILE_ID_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    FILE_ID_CACHE_PATH = os.getenv('FILE_ID_CACHE_PATH', 'data/file_ids.sqlite3')
+    FILE_ID_CACHE_TTL = int(os.getenv('FILE_ID_CACHE_TTL', str(30 * 86400)))
+    FILE_ID_CACHE_MAX_ENTRIES = int(os.getenv('FILE_ID_CACHE_MAX_ENTRIES', '10000'))
+
+    # Файлы заданного размера: локальный Bot API сервер (telegram-bot-api --local) снимает
+    # лимит загрузки 50 МБ (до 2000 МБ); временные файлы пишутся в FILE_TMP_DIR
+    BOT_API_SERVER = os.getenv('BOT_API_SERVER', '')
+    FILE_UPLOAD_LIMIT = int(os.getenv('FILE_UPLOAD_LIMIT', str((2000 if BOT_API_SERVER else 50) * 1024 * 1024)))
+    FILE_TMP_DIR = os.getenv('FILE_TMP_DIR') or None
+
+    # Генерация архивов: максимум файлов, вложенность каталогов и архивов, размер "бомбы"
+    ARCHIVE_MAX_ENTRIES = int(os.getenv('ARCHIVE_MAX_ENTRIES', '100000'))
+    ARCHIVE_MAX_DEPTH = int(os.getenv('ARCHIVE_MAX_DEPTH', '50'))
+    ARCHIVE_MAX_NESTED = int(os.getenv('ARCHIVE_MAX_NESTED', '10'))
+    ARCHIVE_MAX_BOMB_SIZE = int(os.getenv('ARCHIVE_MAX_BOMB_SIZE', str(16 * 1024 ** 3)))
+
+    # Пакетная генерация файлов (форматы × размеры × цвета в одном ZIP): максимум файлов в пакете
+    BATCH_MAX_FILES = int(os.getenv('BATCH_MAX_FILES', '100'))
+
+    # Генерация видео MP4/AVI: максимальные длительность (секунды), частота кадров и сторона кадра
+    VIDEO_MAX_DURATION = int(os.getenv('VIDEO_MAX_DURATION', '600'))
+    VIDEO_MAX_FPS = int(os.getenv('VIDEO_MAX_FPS', '60'))
+    VIDEO_MAX_SIDE = int(os.getenv('VIDEO_MAX_SIDE', '1920'))
+
+    # Шрифт для изображений и PDF (по умолчанию - fonts/ проекта или системный с кириллицей)
+    FONT_PATH = os.getenv('FONT_PATH', '')
+    FONT_CACHE_SIZE = int(os.getenv('FONT_CACHE_SIZE', '64'))
+
+    # Нагрузочный режим проверки API (LOAD NxC URL)
+    LOAD_MAX_REQUESTS = int(os.getenv('LOAD_MAX_REQUESTS', '2000'))
+    LOAD_MAX_CONCURRENCY = int(os.getenv('LOAD_MAX_CONCURRENCY', '50'))
+    LOAD_TIMEOUT = float(os.getenv('LOAD_TIMEOUT', '30'))
+
+    # AI-модели
+    OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+    OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
+    OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL') or None
+    ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
+    ANTHROPIC_MODEL = os.getenv('ANTHROPIC_MODEL', 'claude-3-sonnet-20240229')
+    ANTHROPIC_BASE_URL = os.getenv('ANTHROPIC_BASE_URL') or None
+    DEEPSEEK_API_KEY = os.getenv('DEEPSEEK_API_KEY')
+    DEEPSEEK_MODEL = os.getenv('DEEPSEEK_MODEL', 'deepseek-chat')
+    DEEPSEEK_BASE_URL = os.getenv('DEEPSEEK_BASE_URL', 'https://api.deepseek.com/v1')
+    DEFAULT_AI_MODEL = os.getenv('DEFAULT_AI_MODEL', 'openai')
+    AI_TIMEOUT = float(os.getenv('AI_TIMEOUT', '60'))
+    AI_MAX_RETRIES = int(os.getenv('AI_MAX_RETRIES', '2'))
+    AI_PROVIDER_LIMIT = int(os.getenv('AI_PROVIDER_LIMIT', '4'))
+    AI_PROVIDER_LIMITS = os.getenv('AI_PROVIDER_LIMITS', '')
+    # Интервал правок сообщения при потоковом выводе ответа (с): личный чат / группы
+    AI_STREAM_EDIT_INTERVAL = float(os.getenv('AI_STREAM_EDIT_INTERVAL', '1.0'))
+    AI_STREAM_GROUP_EDIT_INTERVAL = float(os.getenv('AI_STREAM_GROUP_EDIT_INTERVAL', '3.0'))
+
+    # Кэш ответов AI: LRU в памяти + SQLite с TTL
+    AI_CACHE_ENABLED = os.getenv('AI_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    AI_CACHE_PATH = os.getenv('AI_CACHE_PATH', 'data/ai_cache.sqlite3')
+    AI_CACHE_MEMORY_SIZE = int(os.getenv('AI_CACHE_MEMORY_SIZE', '256'))
+    AI_CACHE_TTL = int(os.getenv('AI_CACHE_TTL', str(7 * 86400)))
+    # Не кэшировать запросы с temperature > 0 (каждый ответ генерируется заново)
+    AI_CACHE_BYPASS_CREATIVE = os.getenv('AI_CACHE_BYPASS_CREATIVE', 'false').lower() in ('1', 'true', 'yes')
+
+    # Маршрутизация AI: переключение на другого провайдера, circuit breaker, хеджирование
+    AI_ROUTER_PROVIDERS = os.getenv('AI_ROUTER_PROVIDERS', 'openai,claude,deepseek')
+    AI_FAILOVER = os.getenv('AI_FAILOVER', 'true').lower() in ('1', 'true', 'yes')
+    AI_HEDGE = os.getenv('AI_HEDGE', 'false').lower() in ('1', 'true', 'yes')
+    AI_HEDGE_MIN_DELAY = float(os.getenv('AI_HEDGE_MIN_DELAY', '1.0'))
+    AI_HEDGE_MAX_DELAY = float(os.getenv('AI_HEDGE_MAX_DELAY', '15.0'))
+    AI_ROUTER_WINDOW = int(os.getenv('AI_ROUTER_WINDOW', '100'))
+    AI_BREAKER_FAILURES = int(os.getenv('AI_BREAKER_FAILURES', '3'))
+    AI_BREAKER_COOLDOWN = float(os.getenv('AI_BREAKER_COOLDOWN', '30'))
+
+    # Лимиты токенов AI (token bucket, токенов в минуту; 0 - без лимита). Запросы сверх лимита ждут
+    AI_GLOBAL_TOKENS_PER_MINUTE = int(os.getenv('AI_GLOBAL_TOKENS_PER_MINUTE', '0'))
+    AI_USER_TOKENS_PER_MINUTE = int(os.getenv('AI_USER_TOKENS_PER_MINUTE', '20000'))
+    # Ожидаемая длина ответа для резерва до запроса (уточняется по usage провайдера)
+    AI_COMPLETION_ESTIMATE = int(os.getenv('AI_COMPLETION_ESTIMATE', '500'))
+
+    # Пакетная генерация тест-кейсов из файла (/aibatch)
+    AI_BATCH_MAX_ITEMS = int(os.getenv('AI_BATCH_MAX_ITEMS', '50'))
+    AI_BATCH_CONCURRENCY = int(os.getenv('AI_BATCH_CONCURRENCY', '3'))
+    AI_BATCH_MAX_FILE_SIZE = int(os.getenv('AI_BATCH_MAX_FILE_SIZE', str(1024 * 1024)))
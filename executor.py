@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Optional
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class PluginMetrics:
+    """Счетчики нагрузки одного плагина на пул исполнителей"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.waiting = 0        # ждут свободного слота плагина
+        self.running = 0        # выполняются в пуле
+        self.max_waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_time = 0.0
+        self.run_time = 0.0
+
+    def as_dict(self) -> dict:
+        finished = self.completed + self.failed
+        return {
+            'limit': self.limit,
+            'waiting': self.waiting,
+            'running': self.running,
+            'max_waiting': self.max_waiting,
+            'completed': self.completed,
+            'failed': self.failed,
+            'avg_wait_ms': round(self.wait_time / finished * 1000, 2) if finished else 0.0,
+            'avg_run_ms': round(self.run_time / finished * 1000, 2) if finished else 0.0,
+        }
+
+
+class TaskExecutor:
+    """Общий пул потоков/процессов для тяжелой работы плагинов.
+
+    Обработчики aiogram не должны выполнять CPU-bound код (PIL, reportlab,
+    Faker, lxml, подбор pairwise-комбинаций) прямо в event loop: пока он работает, polling
+    стоит для всех пользователей. Плагины вызывают ``await executor.run(...)``,
+    а пул ограничивает число одновременных задач каждого плагина, чтобы один
+    тяжелый запрос не занял все потоки.
+    """
+
+    def __init__(self, max_threads: int, max_processes: int, default_limit: int, plugin_limits: dict):
+        self.max_threads = max_threads
+        self.max_processes = max_processes
+        self.default_limit = default_limit
+        self.plugin_limits = plugin_limits
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._semaphores: dict = {}
+        self._metrics: dict = {}
+
+    def _get_thread_pool(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(
+                max_workers=self.max_threads,
+                thread_name_prefix="plugin-worker"
+            )
+            logger.info(f"Пул потоков запущен: {self.max_threads} потоков")
+        return self._thread_pool
+
+    def _get_process_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.max_processes <= 0:
+            return None
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(max_workers=self.max_processes)
+            logger.info(f"Пул процессов запущен: {self.max_processes} процессов")
+        return self._process_pool
+
+    def _get_slot(self, plugin: str):
+        if plugin not in self._semaphores:
+            limit = self.plugin_limits.get(plugin, self.default_limit)
+            self._semaphores[plugin] = asyncio.Semaphore(limit)
+            self._metrics[plugin] = PluginMetrics(limit)
+        return self._semaphores[plugin], self._metrics[plugin]
+
+    async def run(self, plugin: str, func: Callable, *args, use_process: bool = False, **kwargs):
+        """Выполнить func(*args, **kwargs) в пуле, не блокируя event loop.
+
+        use_process=True отправляет задачу в пул процессов (func и аргументы
+        должны сериализоваться через pickle). Если пул процессов отключен
+        (EXECUTOR_PROCESSES=0), задача выполняется в пуле потоков.
+        """
+        semaphore, metrics = self._get_slot(plugin)
+        loop = asyncio.get_running_loop()
+
+        metrics.waiting += 1
+        metrics.max_waiting = max(metrics.max_waiting, metrics.waiting)
+        queued_at = time.perf_counter()
+        try:
+            await semaphore.acquire()
+        finally:
+            metrics.waiting -= 1
+
+        started_at = time.perf_counter()
+        metrics.wait_time += started_at - queued_at
+        metrics.running += 1
+        try:
+            pool = self._get_process_pool() if use_process else None
+            if pool is None:
+                pool = self._get_thread_pool()
+            result = await loop.run_in_executor(pool, partial(func, *args, **kwargs))
+            metrics.completed += 1
+            return result
+        except Exception:
+            metrics.failed += 1
+            raise
+        finally:
+            metrics.running -= 1
+            metrics.run_time += time.perf_counter() - started_at
+            semaphore.release()
+
+    def get_metrics(self) -> dict:
+        """Снимок метрик по всем плагинам"""
+        return {
+            'threads': self.max_threads,
+            'processes': self.max_processes,
+            'plugins': {name: m.as_dict() for name, m in self._metrics.items()},
+        }
+
+    def shutdown(self):
+        """Остановка пулов (вызывается при завершении бота)"""
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False, cancel_futures=True)
+            self._thread_pool = None
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+        logger.info("Пулы исполнителей остановлены")
+
+
+def parse_plugin_limits(raw: str) -> dict:
+    """Разбор строки вида 'file_generator=2,pairwise_tester=1'"""
+    limits = {}
+    for item in raw.split(','):
+        if '=' not in item:
+            continue
+        name, value = item.split('=', 1)
+        try:
+            limits[name.strip()] = max(1, int(value))
+        except ValueError:
+            logger.warning(f"Некорректный лимит для плагина: {item}")
+    return limits
+
+
+# Глобальный пул исполнителей
+executor = TaskExecutor(
+    max_threads=Config.EXECUTOR_THREADS,
+    max_processes=Config.EXECUTOR_PROCESSES,
+    default_limit=Config.EXECUTOR_PLUGIN_LIMIT,
+    plugin_limits=parse_plugin_limits(Config.EXECUTOR_PLUGIN_LIMITS),
+)
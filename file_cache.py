@@ -0,0 +1,296 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Awaitable, Callable, Optional, Tuple, Union
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import BufferedInputFile, FSInputFile, Message
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+CLEANUP_INTERVAL = 3600
+MEMORY_SIZE = 512
+# Ответы Bot API, означающие, что сохраненный file_id больше не принимается
+STALE_FILE_ERRORS = ("wrong file identifier", "file reference", "file_id", "wrong remote file", "file not found")
+
+
+def params_key(file_format: str, *params) -> str:
+    """Ключ по формату и нормализованным параметрам генерации"""
+    payload = json.dumps(["params", file_format, *params], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def content_key(method: str, filename: str, content: bytes) -> str:
+    """Ключ по содержимому файла (file_id зависит и от способа отправки, и от имени файла)"""
+    digest = hashlib.sha256(content).hexdigest()
+    payload = json.dumps(["content", method, filename, digest], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def extract_file_id(sent: Message) -> Optional[str]:
+    """file_id из отправленного сообщения (Telegram может сменить тип, например GIF -> animation)"""
+    if sent.photo:
+        return sent.photo[-1].file_id
+    for media in (sent.document, sent.animation, sent.video, sent.audio):
+        if media is not None:
+            return media.file_id
+    return None
+
+
+def is_stale_file_error(error: Exception) -> bool:
+    return isinstance(error, TelegramBadRequest) and any(
+        marker in str(error).lower() for marker in STALE_FILE_ERRORS
+    )
+
+
+class FileIdStats:
+    """Счетчики кэша file_id"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.uploads = 0
+        self.uploaded_bytes = 0
+        self.saved_bytes = 0        # сколько байт не пришлось загружать повторно
+        self.stale = 0              # file_id отклонен Telegram и удален
+
+    def as_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'uploads': self.uploads,
+            'uploaded_bytes': self.uploaded_bytes,
+            'saved_bytes': self.saved_bytes,
+            'stale': self.stale,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+class FileIdCache:
+    """Кэш file_id отправленных ботом файлов.
+
+    Telegram возвращает ``file_id`` загруженного файла, по которому его можно
+    отправить повторно без загрузки. Запись ищется по ключу параметров
+    (формат и нормализованные параметры, до генерации файла) или по ключу
+    содержимого (sha256 готовых байт). Индекс хранится в SQLite (WAL) с
+    TTL и ограничением ``max_entries`` (вытесняются давно не использованные
+    записи), горячие записи - в памяти. file_id привязан к боту, поэтому
+    ключ включает id бота. Если Telegram отклоняет file_id, запись
+    удаляется, а файл загружается заново.
+    """
+
+    def __init__(self, path: str, ttl: int = 30 * 86400, max_entries: int = 10000, memory_size: int = MEMORY_SIZE):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_size = memory_size
+        self.stats = FileIdStats()
+        self._memory: "OrderedDict[str, Tuple[str, str, int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._io: Optional[ThreadPoolExecutor] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._last_cleanup = 0.0
+
+    async def _run(self, func, *args):
+        if self._io is None:
+            self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="file-id-cache")
+        return await asyncio.get_running_loop().run_in_executor(self._io, func, *args)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS file_ids ("
+                "key TEXT PRIMARY KEY, file_id TEXT NOT NULL, filename TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS file_ids_used_at ON file_ids(used_at)")
+            self._conn.commit()
+        return self._conn
+
+    def _load(self, key: str, now: float):
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT file_id, filename, size, created_at FROM file_ids WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None:
+            with conn:
+                conn.execute("UPDATE file_ids SET used_at = ? WHERE key = ?", (now, key))
+        return row
+
+    def _store(self, keys: tuple, file_id: str, filename: str, size: int, now: float, cleanup: bool):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO file_ids (key, file_id, filename, size, created_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(key, file_id, filename, size, now, now) for key in keys]
+            )
+            if cleanup:
+                conn.execute("DELETE FROM file_ids WHERE created_at < ?", (now - self.ttl,))
+                conn.execute(
+                    "DELETE FROM file_ids WHERE key NOT IN "
+                    "(SELECT key FROM file_ids ORDER BY used_at DESC LIMIT ?)", (self.max_entries,)
+                )
+
+    def _delete(self, file_id: str):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM file_ids WHERE file_id = ?", (file_id,))
+
+    def _remember(self, key: str, entry: Tuple[str, str, int, float]):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Tuple[str, str, int]]:
+        """(file_id, имя файла, размер) или None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[3] >= self.ttl:
+                del self._memory[key]
+                entry = None
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is None:
+            try:
+                row = await self._run(self._load, key, now)
+            except Exception as e:
+                logger.error(f"Ошибка чтения кэша file_id: {e}", exc_info=True)
+                row = None
+            if row and now - row[3] < self.ttl:
+                entry = tuple(row)
+                self._remember(key, entry)
+        if entry is None:
+            return None
+        return entry[:3]
+
+    async def set(self, keys: tuple, file_id: str, filename: str, size: int):
+        now = time.time()
+        for key in keys:
+            self._remember(key, (file_id, filename, size, now))
+        cleanup = now - self._last_cleanup >= CLEANUP_INTERVAL
+        if cleanup:
+            self._last_cleanup = now
+        try:
+            await self._run(self._store, keys, file_id, filename, size, now, cleanup)
+        except Exception as e:
+            logger.error(f"Ошибка записи кэша file_id: {e}", exc_info=True)
+
+    async def forget(self, file_id: str):
+        """Удалить все записи с file_id, который Telegram больше не принимает"""
+        self.stats.stale += 1
+        with self._lock:
+            for key in [key for key, entry in self._memory.items() if entry[0] == file_id]:
+                del self._memory[key]
+        try:
+            await self._run(self._delete, file_id)
+        except Exception as e:
+            logger.error(f"Ошибка удаления из кэша file_id: {e}", exc_info=True)
+
+    async def send(self, message: Message, method: str,
+                   produce: Callable[[], Awaitable[Tuple[Union[bytes, Path], str]]], key: Optional[str] = None,
+                   caption: Optional[Callable[[str], str]] = None, request_timeout: Optional[float] = None,
+                   **kwargs) -> Message:
+        """Отправить файл методом ``message.answer_<method>``, по возможности без загрузки.
+
+        ``produce`` возвращает (содержимое, имя файла) и вызывается, только
+        если файла нет в кэше по ключу параметров ``key``. Содержимое - байты
+        или путь к файлу на диске (он загружается потоком через FSInputFile
+        и ищется только по ``key``). ``caption`` строит подпись по имени
+        файла, ``request_timeout`` - таймаут загрузки; остальные аргументы
+        передаются методу отправки.
+        """
+        bot_prefix = f"{message.bot.id if message.bot else 0}:"
+        answer = getattr(message, f"answer_{method}")
+        keys = (bot_prefix + key,) if key else ()
+
+        for lookup in keys:
+            sent = await self._send_cached(answer, lookup, caption, **kwargs)
+            if sent is not None:
+                return sent
+
+        content, filename = await produce()
+        if isinstance(content, Path):
+            upload = FSInputFile(content, filename=filename)
+            size = content.stat().st_size
+        else:
+            if isinstance(content, str):
+                content = content.encode('utf-8')
+            by_content = bot_prefix + content_key(method, filename, content)
+            sent = await self._send_cached(answer, by_content, caption, **kwargs)
+            if sent is not None:
+                file_id = extract_file_id(sent)
+                if file_id and keys:
+                    await self.set(keys, file_id, filename, len(content))
+                return sent
+            keys += (by_content,)
+            upload = BufferedInputFile(file=content, filename=filename)
+            size = len(content)
+
+        self.stats.misses += 1
+        if caption is not None:
+            kwargs['caption'] = caption(filename)
+        request = answer(upload, **kwargs)
+        sent = await (request if request_timeout is None else message.bot(request, request_timeout=request_timeout))
+        self.stats.uploads += 1
+        self.stats.uploaded_bytes += size
+        file_id = extract_file_id(sent)
+        if file_id and keys:
+            await self.set(keys, file_id, filename, size)
+        return sent
+
+    async def _send_cached(self, answer, key: str, caption, **kwargs) -> Optional[Message]:
+        cached = await self.get(key)
+        if cached is None:
+            return None
+        file_id, filename, size = cached
+        if caption is not None:
+            kwargs['caption'] = caption(filename)
+        try:
+            sent = await answer(file_id, **kwargs)
+        except TelegramBadRequest as e:
+            if not is_stale_file_error(e):
+                raise
+            logger.info(f"file_id устарел, файл будет загружен заново: {e}")
+            await self.forget(file_id)
+            return None
+        self.stats.hits += 1
+        self.stats.saved_bytes += size
+        return sent
+
+    def get_metrics(self) -> dict:
+        metrics = self.stats.as_dict()
+        metrics['memory_entries'] = len(self._memory)
+        return metrics
+
+    async def close(self):
+        if self._io is None:
+            return
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        self._io.shutdown(wait=True)
+        self._io = None
+
+
+# Глобальный кэш file_id (None, если отключен)
+file_id_cache = FileIdCache(
+    Config.FILE_ID_CACHE_PATH,
+    ttl=Config.FILE_ID_CACHE_TTL,
+    max_entries=Config.FILE_ID_CACHE_MAX_ENTRIES
+) if Config.FILE_ID_CACHE_ENABLED else None
@@ -3,6 +3,8 @@ from aiogram.filters import Command, StateFilter
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 import logging
+from config import Config
+from ai_usage import ai_quota
 from messages import WELCOME_MSG, MENU_MSG, HELP_MSG, get_main_menu, get_back_menu
 
 logger = logging.getLogger(__name__)
@@ -96,6 +98,12 @@ from plugins.api_validator import (
     ApiValidatorStates
 )
 
+from plugins.ai_batch import (
+    ai_batch_command,
+    process_batch_file,
+    AiBatchStates
+)
+
 class CommandRouter:
     def __init__(self, dp: Dispatcher):
         self.dp = dp
@@ -154,6 +162,10 @@ class CommandRouter:
         await state.set_state(ApiValidatorStates.waiting_for_url)
         await api_validator_command(message, state)
 
+    async def handle_ai_batch_command(self, message: Message, state: FSMContext):
+        await state.clear()
+        await ai_batch_command(message, state)
+
     async def handle_back_to_menu(self, message: Message, state: FSMContext):
         await state.clear()
         await message.answer(MENU_MSG, reply_markup=get_main_menu())
@@ -217,6 +229,18 @@ class CommandRouter:
             async def cmd_api(message: Message, state: FSMContext):
                 await self.handle_api_validator_command(message, state)
 
+            @self.dp.message(Command("aibatch"))
+            async def cmd_aibatch(message: Message, state: FSMContext):
+                await self.handle_ai_batch_command(message, state)
+
+            # Статистика расхода токенов AI (только для администратора)
+            @self.dp.message(Command("aistats"))
+            async def cmd_aistats(message: Message, state: FSMContext):
+                if not Config.ADMIN_ID or not message.from_user or str(message.from_user.id) != str(Config.ADMIN_ID):
+                    await message.answer("⛔ Команда доступна только администратору")
+                    return
+                await message.answer(ai_quota.format_report(), parse_mode="HTML")
+
             # Обработчики состояний с проверкой /help
             @self.dp.message(StateFilter(FileGeneratorStates.waiting_for_format))
             async def handle_file_format_choice(message: Message, state: FSMContext):
@@ -592,6 +616,17 @@ class CommandRouter:
                     return
                 await process_sql_choice(message, state)
 
+            # Пакетная генерация тест-кейсов из файла
+            @self.dp.message(StateFilter(AiBatchStates.waiting_for_file))
+            async def handle_ai_batch_file(message: Message, state: FSMContext):
+                if message.text == "/help":
+                    await self.handle_help_command(message, state)
+                    return
+                if message.text == "Назад в меню":
+                    await self.handle_back_to_menu(message, state)
+                    return
+                await process_batch_file(message, state)
+
             # Главный обработчик текстовых сообщений
             @self.dp.message()
             async def handle_text(message: Message, state: FSMContext):
@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+import aiohttp
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class PoolStats:
+    """Счетчики пула соединений исходящих HTTP-запросов"""
+
+    def __init__(self):
+        self.requests = 0
+        self.reused = 0             # запрос ушел по уже открытому keep-alive соединению
+        self.created = 0            # пришлось открыть новое соединение
+        self.dns_cache_hits = 0
+        self.dns_cache_misses = 0
+        self.failed = 0
+
+    def as_dict(self) -> dict:
+        connections = self.reused + self.created
+        dns_total = self.dns_cache_hits + self.dns_cache_misses
+        return {
+            'requests': self.requests,
+            'failed': self.failed,
+            'connections_reused': self.reused,
+            'connections_created': self.created,
+            'pool_hit_rate': round(self.reused / connections, 3) if connections else 0.0,
+            'dns_cache_hits': self.dns_cache_hits,
+            'dns_cache_misses': self.dns_cache_misses,
+            'dns_hit_rate': round(self.dns_cache_hits / dns_total, 3) if dns_total else 0.0,
+        }
+
+
+class RequestTimings:
+    """Длительность этапов одного HTTP-запроса по монотонным часам (perf_counter).
+
+    Объект передается в ``session.request(..., trace_request_ctx=RequestTimings())``,
+    отметки времени ставят обработчики TraceConfig общей сессии, а конец
+    чтения тела отмечает вызывающий код через ``finish()``.
+    В aiohttp нет отдельного события TLS-рукопожатия: этап подключения
+    включает установку TCP-соединения и TLS.
+    """
+
+    PHASES = ('queue', 'dns', 'connect', 'ttfb', 'body', 'total')
+
+    def __init__(self):
+        self.started = None
+        self.queue = 0.0
+        self.queued_at = None
+        self.connect_started = None
+        self.dns_started = None
+        self.dns_finished = None
+        self.connected = None
+        self.headers_sent = None
+        self.response_started = None
+        self.finished = None
+        self.reused = False
+        self.dns_cached = False
+        self.redirects = 0
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def phases(self) -> dict:
+        """Этапы в миллисекундах; None - этап не наступил (например, соединение переиспользовано)"""
+        def ms(start, end):
+            return round((end - start) * 1000, 2) if start is not None and end is not None else None
+
+        dns = ms(self.dns_started, self.dns_finished)
+        connect_from = self.dns_finished if self.dns_finished is not None else self.connect_started
+        request_sent = self.headers_sent or self.connected or self.started
+        return {
+            'queue': round(self.queue * 1000, 2),
+            'dns': 0.0 if dns is None and self.dns_cached else dns,
+            'connect': ms(connect_from, self.connected),
+            'ttfb': ms(request_sent, self.response_started),
+            'body': ms(self.response_started, self.finished),
+            'total': ms(self.started, self.finished or self.response_started),
+        }
+
+
+def _timings(context) -> Optional[RequestTimings]:
+    timings = getattr(context, 'trace_request_ctx', None)
+    return timings if isinstance(timings, RequestTimings) else None
+
+
+def _mark(attribute: str):
+    """Обработчик TraceConfig, записывающий текущее время в атрибут RequestTimings"""
+    async def handler(session, context, params):
+        timings = _timings(context)
+        if timings is not None:
+            setattr(timings, attribute, time.perf_counter())
+    return handler
+
+
+class HttpSessionManager:
+    """Общая aiohttp-сессия приложения для запросов плагинов к внешним API.
+
+    Новая ``ClientSession`` на каждую проверку - это новый коннектор, DNS-запрос
+    и TLS-рукопожатие. Общая сессия держит keep-alive соединения и DNS-кэш,
+    поэтому повторные запросы к тому же хосту идут по готовому соединению.
+    Сессия создается в ``main.py`` при старте и закрывается при остановке;
+    если плагин обратился раньше, она создается лениво.
+    """
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 10,
+                 dns_cache_ttl: int = 300, keepalive_timeout: float = 30.0):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.stats = PoolStats()
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+        stats = self.stats
+
+        async def on_request_start(session, context, params):
+            stats.requests += 1
+            timings = _timings(context)
+            # При редиректах время считаем от первого запроса
+            if timings is not None and timings.started is None:
+                timings.started = time.perf_counter()
+
+        async def on_request_redirect(session, context, params):
+            timings = _timings(context)
+            if timings is not None:
+                timings.redirects += 1
+
+        async def on_connection_queued_end(session, context, params):
+            timings = _timings(context)
+            if timings is not None and timings.queued_at is not None:
+                timings.queue += time.perf_counter() - timings.queued_at
+
+        async def on_request_exception(session, context, params):
+            stats.failed += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            stats.reused += 1
+            timings = _timings(context)
+            if timings is not None:
+                timings.reused = True
+
+        async def on_connection_create_end(session, context, params):
+            stats.created += 1
+
+        async def on_dns_cache_hit(session, context, params):
+            stats.dns_cache_hits += 1
+            timings = _timings(context)
+            if timings is not None:
+                timings.dns_cached = True
+
+        async def on_dns_cache_miss(session, context, params):
+            stats.dns_cache_misses += 1
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_request_exception.append(on_request_exception)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace.on_dns_cache_miss.append(on_dns_cache_miss)
+        # Отметки этапов для RequestTimings
+        trace.on_request_redirect.append(on_request_redirect)
+        trace.on_connection_queued_start.append(_mark('queued_at'))
+        trace.on_connection_queued_end.append(on_connection_queued_end)
+        trace.on_connection_create_start.append(_mark('connect_started'))
+        trace.on_dns_resolvehost_start.append(_mark('dns_started'))
+        trace.on_dns_resolvehost_end.append(_mark('dns_finished'))
+        trace.on_connection_create_end.append(_mark('connected'))
+        trace.on_request_headers_sent.append(_mark('headers_sent'))
+        trace.on_request_end.append(_mark('response_started'))
+        return trace
+
+    async def start(self):
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_cache_ttl,
+            use_dns_cache=True,
+            keepalive_timeout=self.keepalive_timeout,
+            enable_cleanup_closed=True
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            trace_configs=[self._trace_config()]
+        )
+        logger.info(
+            f"HTTP-сессия: limit={self.limit}, limit_per_host={self.limit_per_host}, "
+            f"dns_ttl={self.dns_cache_ttl}s, keepalive={self.keepalive_timeout}s"
+        )
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            await self.start()
+        return self._session
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Общая сессия в виде контекстного менеджера (сессия при выходе не закрывается)"""
+        yield await self.get_session()
+
+    def get_metrics(self) -> dict:
+        metrics = self.stats.as_dict()
+        metrics['open'] = self._session is not None and not self._session.closed
+        return metrics
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            # Даем закрыться SSL-соединениям, иначе aiohttp пишет предупреждения
+            await asyncio.sleep(0.25)
+        self._session = None
+
+
+http_sessions = HttpSessionManager(
+    limit=Config.HTTP_POOL_LIMIT,
+    limit_per_host=Config.HTTP_POOL_LIMIT_PER_HOST,
+    dns_cache_ttl=Config.HTTP_DNS_CACHE_TTL,
+    keepalive_timeout=Config.HTTP_KEEPALIVE_TIMEOUT
+)
@@ -1,14 +1,24 @@
 import logging
 import asyncio
+import multiprocessing
 import sys
 import os
 from pathlib import Path
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.types import Message
 from config import Config
 from handlers import CommandRouter
+from executor import executor
+from http_session import http_sessions
+from ai_service import async_ai_service
+from ai_cache import ai_cache
+from ai_usage import ai_quota
+from file_cache import file_id_cache
+from webhook import WebhookDispatcher
+from storage import create_storage
 from aiohttp import web
 
 # Создаем папку для логов, если её нет
@@ -27,6 +37,8 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+WEBHOOK_KEY = web.AppKey("webhook", WebhookDispatcher)
+
 async def notify_admin(bot: Bot, message: str):
     """Отправка уведомления администратору"""
     try:
@@ -48,69 +60,142 @@ async def health_check(request: web.Request):
     """Эндпоинт для проверки работоспособности (UptimeRobot)"""
     return web.Response(text="OK")
 
-async def start_http_server(app: web.Application):
+async def metrics_handler(request: web.Request):
+    """Метрики пула исполнителей, HTTP-сессии, AI-провайдеров и очереди webhook"""
+    metrics = {
+        'executor': executor.get_metrics(),
+        'http': http_sessions.get_metrics(),
+        'ai': async_ai_service.get_metrics(),
+        'ai_dedup': async_ai_service.get_dedup_metrics(),
+        'ai_router': async_ai_service.router.get_metrics() if async_ai_service.router else None,
+        'ai_cache': ai_cache.get_metrics(),
+        'ai_usage': ai_quota.get_metrics(),
+        'file_id_cache': file_id_cache.get_metrics() if file_id_cache else None,
+    }
+    webhook = request.app.get(WEBHOOK_KEY)
+    if webhook:
+        metrics['webhook'] = webhook.get_metrics()
+    return web.json_response(metrics)
+
+async def start_http_server(app: web.Application, reuse_port: bool = False):
     """Запуск HTTP-сервера"""
     try:
         runner = web.AppRunner(app)
         await runner.setup()
-        site = web.TCPSite(runner, '0.0.0.0', 8000)
+        site = web.TCPSite(runner, Config.WEB_HOST, Config.WEB_PORT, reuse_port=reuse_port or None)
         await site.start()
-        logger.info("HTTP-сервер запущен на порту 8000")
+        logger.info(f"HTTP-сервер запущен на порту {Config.WEB_PORT}")
+        return runner
     except OSError as e:
         if e.errno == 98:  # Address already in use
-            logger.warning("Порт 8000 уже занят. HTTP-сервер не будет запущен (возможно, уже запущен другой экземпляр бота)")
+            logger.warning(f"Порт {Config.WEB_PORT} уже занят. HTTP-сервер не будет запущен (возможно, уже запущен другой экземпляр бота)")
         else:
             logger.error(f"Ошибка при запуске HTTP-сервера: {e}")
     except Exception as e:
         logger.error(f"Неожиданная ошибка при запуске HTTP-сервера: {e}")
+    return None
 
-async def main():
+async def main(worker_index: int = 0):
     bot = None
+    dp = None
+    webhook = None
+    runner = None
+    # Уведомления и настройку webhook выполняет только первый процесс
+    is_primary = worker_index == 0
     try:
         # Инициализация бота
-        bot = Bot(token=Config.BOT_TOKEN, default=DefaultBotProperties(parse_mode="HTML"))
-        dp = Dispatcher(storage=MemoryStorage())
+        # Локальный Bot API сервер позволяет загружать файлы до 2000 МБ
+        session = AiohttpSession(
+            api=TelegramAPIServer.from_base(Config.BOT_API_SERVER, is_local=True)
+        ) if Config.BOT_API_SERVER else None
+        bot = Bot(token=Config.BOT_TOKEN, session=session, default=DefaultBotProperties(parse_mode="HTML"))
+        dp = Dispatcher(storage=create_storage())
+        await http_sessions.start()
         
         # Регистрация обработчиков
         logger.info("=== Инициализация бота ===")
         router = CommandRouter(dp)
         router.register_handlers()
 
-        # Пропуск накопившихся сообщений
-        await bot.delete_webhook(drop_pending_updates=True)
-
-        # Уведомление о запуске
-        await notify_admin(bot, "🟢 Бот успешно запущен!")
-
-        # Создание и запуск HTTP-сервера
+        # Создание HTTP-приложения
         app = web.Application()
         app.router.add_get('/health', health_check)
-        asyncio.create_task(start_http_server(app))
-
-        logger.info("=== Запуск бота ===")
-        await dp.start_polling(
-            bot,
-            allowed_updates=dp.resolve_used_update_types(),
-            close_bot_session=True,
-            timeout=30,
-            relax=0.1
-        )
+        app.router.add_get('/metrics', metrics_handler)
+
+        if Config.RUN_MODE == 'webhook':
+            webhook = WebhookDispatcher(
+                dp, bot,
+                secret_token=Config.WEBHOOK_SECRET,
+                workers=Config.WEBHOOK_WORKERS,
+                queue_size=Config.WEBHOOK_QUEUE_SIZE
+            )
+            webhook.register(app, Config.WEBHOOK_PATH)
+            app[WEBHOOK_KEY] = webhook
+            await webhook.start()
+
+            runner = await start_http_server(app, reuse_port=Config.WEB_PROCESSES > 1)
+            if runner is None:
+                raise RuntimeError("HTTP-сервер для webhook не запущен")
+
+            if is_primary:
+                await bot.set_webhook(
+                    url=Config.WEBHOOK_URL.rstrip('/') + Config.WEBHOOK_PATH,
+                    secret_token=Config.WEBHOOK_SECRET,
+                    allowed_updates=dp.resolve_used_update_types(),
+                    max_connections=Config.WEBHOOK_MAX_CONNECTIONS,
+                    drop_pending_updates=True
+                )
+                await notify_admin(bot, "🟢 Бот успешно запущен (webhook)!")
+
+            logger.info(f"=== Запуск бота (webhook, процесс {worker_index}) ===")
+            await asyncio.Event().wait()
+        else:
+            # Пропуск накопившихся сообщений
+            await bot.delete_webhook(drop_pending_updates=True)
+
+            # Уведомление о запуске
+            await notify_admin(bot, "🟢 Бот успешно запущен!")
+
+            # Запуск HTTP-сервера
+            asyncio.create_task(start_http_server(app))
+
+            logger.info("=== Запуск бота ===")
+            await dp.start_polling(
+                bot,
+                allowed_updates=dp.resolve_used_update_types(),
+                close_bot_session=True,
+                timeout=30,
+                relax=0.1
+            )
         
     except asyncio.CancelledError:
         logger.info("Получен сигнал завершения работы")
     except Exception as e:
         logger.critical(f"Фатальная ошибка: {e}", exc_info=True)
-        if bot:
+        if bot and is_primary:
             await notify_admin(bot, f"🔴 Критическая ошибка бота:\n{str(e)}")
         raise
     finally:
         logger.info("Завершение работы бота...")
+        if runner:
+            await runner.cleanup()
+        if webhook:
+            await webhook.stop()
+        if dp:
+            await dp.storage.close()
+        await http_sessions.close()
+        await async_ai_service.close()
+        await ai_cache.close()
+        if file_id_cache:
+            await file_id_cache.close()
         if bot:
-            await notify_admin(bot, "🔴 Бот остановлен")
+            if is_primary:
+                await notify_admin(bot, "🔴 Бот остановлен")
             await close_bot_session(bot)
+        executor.shutdown()
         logger.info("Бот остановлен")
 
-def run_bot():
+def run_bot(worker_index: int = 0):
     if sys.platform == 'win32':
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
@@ -118,7 +203,7 @@ def run_bot():
     asyncio.set_event_loop(loop)
 
     try:
-        task = loop.create_task(main())
+        task = loop.create_task(main(worker_index))
         loop.run_forever()
     except KeyboardInterrupt:
         logger.info("Приложение остановлено пользователем")
@@ -135,5 +220,47 @@ def run_bot():
         loop.close()
         logger.info("Event loop закрыт")
 
+def check_webhook_config():
+    """Без WEBHOOK_URL webhook не зарегистрировать, а без WEBHOOK_SECRET обработчик принимает любой POST"""
+    missing = [name for name in ('WEBHOOK_URL', 'WEBHOOK_SECRET') if not getattr(Config, name)]
+    if missing:
+        logger.critical(f"RUN_MODE=webhook: не заданы {', '.join(missing)} (см. .env.example)")
+        sys.exit(1)
+
+def run_workers(processes: int):
+    """Запуск нескольких процессов webhook-сервера на одном порту (SO_REUSEPORT)"""
+    if sys.platform == 'win32':
+        logger.warning("SO_REUSEPORT недоступен в Windows, будет запущен один процесс")
+        run_bot()
+        return
+
+    if Config.FSM_STORAGE.lower() != 'redis':
+        logger.warning(
+            f"FSM_STORAGE={Config.FSM_STORAGE} не разделяется между процессами: "
+            "для нескольких процессов используйте FSM_STORAGE=redis"
+        )
+    workers = [
+        multiprocessing.Process(target=run_bot, args=(index,), name=f"bot-worker-{index}")
+        for index in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        logger.info("Приложение остановлено пользователем")
+        for worker in workers:
+            worker.join(timeout=15)
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+
 if __name__ == "__main__":
-    run_bot()
+    if Config.RUN_MODE == 'webhook':
+        check_webhook_config()
+    if Config.RUN_MODE == 'webhook' and Config.WEB_PROCESSES > 1:
+        run_workers(Config.WEB_PROCESSES)
+    else:
+        run_bot()
@@ -45,6 +45,7 @@ HELP_MSG = (
     "/pairwise - 🧪 Создать Pairwise тест\n"
     "/datavalidator - 📑 Валидатор данных JSON/XML/YAML\n"
     "/docs - 📝 Создать документацию (тест-кейс, чек-лист, баг-репорт)\n"
+    "/aibatch - 🤖 Тест-кейсы по списку фич из файла (AI)\n"
     "/testdata - 👥 Создать тестовые данные\n"
     "/timestamp - 🕐 Конвертировать Timestamp\n"
     "/sql - 🗃 Сгенерировать SQL\n"
@@ -0,0 +1,258 @@
+from aiogram.types import Message, BufferedInputFile
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.exceptions import TelegramAPIError
+import asyncio
+import csv
+import io
+import logging
+import os
+import re
+import time
+import zipfile
+from typing import List
+from config import Config
+from messages import get_main_menu, get_back_menu
+from executor import executor
+from ai_service import async_ai_service
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = ('.txt', '.csv')
+MAX_FEATURE_LENGTH = 4000
+PROGRESS_INTERVAL = 3.0     # не чаще одной правки сообщения о прогрессе за столько секунд
+# Заголовки колонки CSV с описанием фичи (иначе берется первая колонка)
+FEATURE_COLUMNS = ('feature', 'description', 'фича', 'описание', 'функциональность', 'требование')
+
+# Активные пакетные задачи: (chat_id, user_id) -> asyncio.Task
+_batch_jobs = {}
+
+
+class AiBatchStates(StatesGroup):
+    waiting_for_file = State()
+
+
+async def ai_batch_command(message: Message, state: FSMContext):
+    await state.set_state(AiBatchStates.waiting_for_file)
+    await message.answer(
+        "🤖 <b>Тест-кейсы из списка фич</b>\n\n"
+        "Отправь файл <b>TXT</b> или <b>CSV</b> с описаниями фич:\n"
+        "• TXT — одна фича на строку (или блоки, разделенные пустой строкой)\n"
+        "• CSV — колонка <code>feature</code>/<code>описание</code> или первая колонка\n\n"
+        f"Максимум {Config.AI_BATCH_MAX_ITEMS} фич в файле. "
+        "Для каждой будет сгенерирован тест-кейс, результат придет одним XLSX файлом.",
+        reply_markup=get_back_menu(),
+        parse_mode="HTML"
+    )
+
+
+def decode_upload(data: bytes) -> str:
+    """Текст загруженного файла: UTF-8 (с BOM или без), иначе cp1251"""
+    try:
+        return data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return data.decode('cp1251', errors='replace')
+
+
+def parse_features(text: str, filename: str) -> List[str]:
+    """Описания фич из TXT или CSV"""
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    if filename.lower().endswith('.csv'):
+        try:
+            dialect = csv.Sniffer().sniff(text[:4096], delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        rows = [row for row in csv.reader(io.StringIO(text), dialect) if any(cell.strip() for cell in row)]
+        if not rows:
+            return []
+        header = [cell.strip().lower() for cell in rows[0]]
+        column = next((header.index(name) for name in FEATURE_COLUMNS if name in header), None)
+        if column is not None:
+            rows = rows[1:]
+        else:
+            column = 0
+        features = [row[column].strip() for row in rows if len(row) > column]
+    elif re.search(r'\n[ \t]*\n', text.strip()):
+        # Многострочные описания разделены пустыми строками
+        features = [block.strip() for block in re.split(r'\n[ \t]*\n', text)]
+    else:
+        features = [line.strip() for line in text.split('\n')]
+    return [feature[:MAX_FEATURE_LENGTH] for feature in features if feature]
+
+
+async def process_batch_file(message: Message, state: FSMContext):
+    document = message.document
+    if document is None:
+        await message.answer("❌ Пришли файл TXT или CSV (как документ) или нажми «Назад в меню»")
+        return
+
+    filename = document.file_name or "features.txt"
+    if not filename.lower().endswith(SUPPORTED_EXTENSIONS):
+        await message.answer("❌ Поддерживаются только файлы TXT и CSV")
+        return
+    if document.file_size and document.file_size > Config.AI_BATCH_MAX_FILE_SIZE:
+        await message.answer(f"❌ Файл слишком большой (максимум {Config.AI_BATCH_MAX_FILE_SIZE // 1024} КБ)")
+        return
+
+    job_key = (message.chat.id, message.from_user.id if message.from_user else 0)
+    job = _batch_jobs.get(job_key)
+    if job is not None and not job.done():
+        await message.answer("⏳ Предыдущий файл ещё обрабатывается, подожди немного")
+        return
+
+    try:
+        buffer = await message.bot.download(document, destination=io.BytesIO())
+        features = parse_features(decode_upload(buffer.getvalue()), filename)
+    except TelegramAPIError as e:
+        logger.error(f"AI batch download error: {e}", exc_info=True)
+        await message.answer("❌ Не удалось скачать файл, попробуй ещё раз")
+        return
+    except Exception as e:
+        logger.error(f"AI batch parse error: {e}", exc_info=True)
+        await message.answer("❌ Не удалось прочитать файл. Проверь формат TXT/CSV")
+        return
+
+    if not features:
+        await message.answer("❌ В файле не найдено ни одного описания фичи")
+        return
+    skipped = max(0, len(features) - Config.AI_BATCH_MAX_ITEMS)
+    features = features[:Config.AI_BATCH_MAX_ITEMS]
+
+    await state.clear()
+    note = f"\n⚠️ Обработаю первые {len(features)}, остальные {skipped} пропущены (лимит)" if skipped else ""
+    await message.answer(f"📥 Найдено фич: {len(features)}{note}", reply_markup=get_main_menu())
+
+    base_name = os.path.splitext(os.path.basename(filename))[0] or "features"
+    task = asyncio.create_task(_batch_job(message, features, base_name, job_key[1]))
+    _batch_jobs[job_key] = task
+    task.add_done_callback(lambda done: _batch_jobs.pop(job_key) if _batch_jobs.get(job_key) is done else None)
+
+
+class BatchProgress:
+    """Сообщение о ходе пакетной генерации, обновляемое не чаще PROGRESS_INTERVAL"""
+
+    def __init__(self, message: Message, total: int):
+        self.message = message
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.status_message = None
+        self._shown = None
+        self._next_edit = 0.0
+        self._changed = asyncio.Event()
+
+    def text(self) -> str:
+        failed = f", ошибок {self.failed}" if self.failed else ""
+        return f"⏳ Генерирую тест-кейсы: {self.done}/{self.total}{failed}"
+
+    def on_result(self, index: int, text: str):
+        self.done += 1
+        if text.startswith("❌"):
+            self.failed += 1
+        self._changed.set()
+
+    async def _show(self, text: str):
+        if text == self._shown:
+            return
+        try:
+            if self.status_message is None:
+                self.status_message = await self.message.answer(text)
+            else:
+                await self.status_message.edit_text(text)
+            self._shown = text
+        except TelegramAPIError as e:
+            # Прогресс необязателен: при лимитах Telegram просто пропускаем правку
+            logger.warning(f"Не удалось обновить прогресс: {e}")
+
+    async def run(self):
+        """Обновлять сообщение, пока задача не будет отменена"""
+        await self._show(self.text())
+        while True:
+            await self._changed.wait()
+            delay = self._next_edit - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._changed.clear()
+            await self._show(self.text())
+            self._next_edit = time.monotonic() + PROGRESS_INTERVAL
+
+    async def finish(self, text: str):
+        await self._show(text)
+
+
+async def _batch_job(message: Message, features: List[str], base_name: str, user_id: int):
+    progress = BatchProgress(message, len(features))
+    updater = asyncio.create_task(progress.run())
+    started_at = time.perf_counter()
+    try:
+        results = await async_ai_service.generate_test_cases(features, user_id=user_id,
+                                                             on_result=progress.on_result)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"AI batch error: {e}", exc_info=True)
+        await message.answer("❌ Не удалось сгенерировать тест-кейсы")
+        return
+    finally:
+        updater.cancel()
+        await asyncio.gather(updater, return_exceptions=True)
+
+    elapsed = time.perf_counter() - started_at
+    failed = sum(1 for text in results if text.startswith("❌"))
+    await progress.finish(
+        f"✅ Готово: {len(results) - failed}/{len(results)} тест-кейсов за {elapsed:.0f} с"
+        + (f", ошибок {failed}" if failed else "")
+    )
+    if failed == len(results):
+        await message.answer("❌ AI не смог сгенерировать ни одного тест-кейса, попробуй позже")
+        return
+
+    try:
+        content, filename = await executor.run("ai_batch", render_batch, features, results, base_name)
+        await message.answer_document(
+            document=BufferedInputFile(file=content, filename=filename),
+            caption=f"📋 Тест-кейсы: {len(results) - failed} из {len(results)}"
+        )
+    except Exception as e:
+        logger.error(f"AI batch result error: {e}", exc_info=True)
+        await message.answer("❌ Не удалось отправить файл с тест-кейсами")
+
+
+def render_batch(features: List[str], results: List[str], base_name: str):
+    """Итоговый файл: XLSX, а без openpyxl - ZIP с тест-кейсами в Markdown (в пуле исполнителей)"""
+    try:
+        from openpyxl import Workbook
+        from openpyxl.styles import Alignment, Font
+    except ImportError:
+        return render_batch_zip(features, results, base_name)
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Test cases"
+    ws.append(["№", "Описание фичи", "Тест-кейс", "Статус"])
+    for cell in ws[1]:
+        cell.font = Font(bold=True)
+    for index, (feature, text) in enumerate(zip(features, results), start=1):
+        status = "Ошибка" if text.startswith("❌") else "OK"
+        ws.append([index, feature[:32767], text[:32767], status])
+
+    wrap = Alignment(wrap_text=True, vertical="top")
+    for row in ws.iter_rows(min_row=2):
+        for cell in row:
+            cell.alignment = wrap
+    for column, width in zip("ABCD", (6, 50, 100, 10)):
+        ws.column_dimensions[column].width = width
+    ws.freeze_panes = "A2"
+
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue(), f"{base_name}_test_cases.xlsx"
+
+
+def render_batch_zip(features: List[str], results: List[str], base_name: str):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for index, (feature, text) in enumerate(zip(features, results), start=1):
+            zip_file.writestr(f"TC_{index:03d}.md", f"# Фича\n\n{feature}\n\n# Тест-кейс\n\n{text}\n")
+    return buffer.getvalue(), f"{base_name}_test_cases.zip"
+
@@ -0,0 +1,376 @@
+from aiogram.types import Message, BufferedInputFile
+from PIL import Image, ImageDraw, ImageFont
+from collections import Counter
+from urllib.parse import urlparse
+import aiohttp
+import asyncio
+import html
+import io
+import logging
+import re
+import time
+from config import Config
+from executor import executor
+from http_session import http_sessions, RequestTimings
+
+logger = logging.getLogger(__name__)
+
+# LOAD 200x20 GET https://api.example.com/users  (метод можно не указывать)
+LOAD_RE = re.compile(
+    r'^LOAD\s+(\d+)\s*[xх×*]\s*(\d+)\s+(?:([A-Za-z]+)\s+)?(\S+)$',
+    re.IGNORECASE
+)
+LOAD_METHODS = ['GET', 'POST', 'PUT', 'DELETE', 'PATCH', 'HEAD', 'OPTIONS']
+DRAIN_CHUNK_SIZE = 64 * 1024
+# Шаг временного ряда, с; для графика соседние шаги объединяются
+TIMELINE_STEP = 0.1
+CHART_POINTS = 60
+# Этапы запроса, по которым строятся отдельные гистограммы
+PHASES = (('queue', 'Ожидание в пуле'), ('dns', 'DNS'), ('connect', 'Подключение (TCP + TLS)'), ('ttfb', 'TTFB'), ('body', 'Тело'))
+
+
+class LatencyHistogram:
+    """Гистограмма задержек в стиле HDR Histogram.
+
+    Значения (микросекунды) попадают в логарифмически-линейные корзины:
+    внутри каждой степени двойки 2**(precision - 1) равных корзин, поэтому
+    относительная погрешность перцентилей не больше 2**(1 - precision)
+    (~1.6% при precision=7), а память зависит от разброса, а не от числа
+    запросов. Минимум, максимум и среднее считаются точно.
+    """
+
+    def __init__(self, precision: int = 7):
+        self.precision = precision
+        self.counts = Counter()
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, value: int) -> int:
+        shift = max(0, value.bit_length() - self.precision)
+        return (shift << self.precision) + (value >> shift)
+
+    def _bucket_value(self, index: int) -> int:
+        """Середина корзины - представитель значений в ней"""
+        shift, mantissa = divmod(index, 1 << self.precision)
+        if shift == 0:
+            return mantissa
+        low = mantissa << shift
+        return low + ((1 << shift) - 1) // 2
+
+    def record(self, value_us: int):
+        value_us = max(0, int(value_us))
+        self.counts[self._index(value_us)] += 1
+        self.count += 1
+        self.total += value_us
+        self.min = value_us if self.min is None else min(self.min, value_us)
+        self.max = value_us if self.max is None else max(self.max, value_us)
+
+    def percentile(self, q: float) -> int:
+        """Значение, не больше которого q процентов измерений"""
+        if not self.count:
+            return 0
+        if q >= 100:
+            return self.max
+        target = max(1, int(round(q / 100 * self.count)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(max(self._bucket_value(index), self.min), self.max)
+        return self.max
+
+    def merge(self, other: 'LatencyHistogram'):
+        self.counts.update(other.counts)
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary_ms(self) -> dict:
+        return {
+            'p50': self.percentile(50) / 1000,
+            'p90': self.percentile(90) / 1000,
+            'p99': self.percentile(99) / 1000,
+            'max': (self.max or 0) / 1000,
+            'mean': self.mean() / 1000,
+        }
+
+
+class LoadTestResult:
+    """Результаты нагрузочного прогона, собираемые по мере выполнения запросов"""
+
+    def __init__(self, method: str, url: str, total: int, concurrency: int):
+        self.method = method
+        self.url = url
+        self.total = total
+        self.concurrency = concurrency
+        self.latency = LatencyHistogram()
+        self.statuses = Counter()
+        self.errors = Counter()
+        self.bytes_received = 0
+        self.phases = {name: LatencyHistogram() for name, _ in PHASES}
+        self.reused = 0
+        self.new_connections = 0
+        # Временной ряд: номер шага TIMELINE_STEP от старта -> [гистограмма, число ошибок]
+        self.timeline = {}
+        self.started_at = None
+        self.elapsed = 0.0
+
+    @property
+    def completed(self) -> int:
+        return sum(self.statuses.values()) + sum(self.errors.values())
+
+    def _slot(self, finished_at: float):
+        slot = int((finished_at - self.started_at) / TIMELINE_STEP)
+        if slot not in self.timeline:
+            self.timeline[slot] = [LatencyHistogram(), 0]
+        return self.timeline[slot]
+
+    def record_response(self, status: int, timings: RequestTimings, size: int):
+        phases = timings.phases()
+        value_us = phases['total'] * 1000
+        self.statuses[status] += 1
+        self.bytes_received += size
+        self.latency.record(value_us)
+        self._slot(timings.finished)[0].record(value_us)
+        if timings.reused:
+            self.reused += 1
+        else:
+            self.new_connections += 1
+        # DNS и подключение есть только у новых соединений
+        for name, histogram in self.phases.items():
+            if phases[name] is not None:
+                histogram.record(phases[name] * 1000)
+
+    def record_error(self, error: str, finished_at: float):
+        self.errors[error] += 1
+        self._slot(finished_at)[1] += 1
+
+    def throughput(self) -> float:
+        return self.completed / self.elapsed if self.elapsed else 0.0
+
+    def series(self, points: int = CHART_POINTS) -> list:
+        """[(начало интервала с, запросов/с, p50 мс, p99 мс, ошибок/с)] для графика"""
+        slots = int(self.elapsed / TIMELINE_STEP) + 1
+        group = max(1, -(-slots // points))
+        width = group * TIMELINE_STEP
+        rows = []
+        for first in range(0, slots, group):
+            histogram, errors = LatencyHistogram(), 0
+            for slot in range(first, first + group):
+                if slot in self.timeline:
+                    histogram.merge(self.timeline[slot][0])
+                    errors += self.timeline[slot][1]
+            rows.append((
+                round(first * TIMELINE_STEP, 2),
+                (histogram.count + errors) / width,
+                histogram.percentile(50) / 1000,
+                histogram.percentile(99) / 1000,
+                errors / width
+            ))
+        return rows
+
+
+def is_load_command(text: str) -> bool:
+    return bool(text) and text.strip().upper().startswith('LOAD ')
+
+
+def parse_load_command(text: str):
+    """Разбор 'LOAD NxC [METHOD] URL' -> (N, C, метод, URL); ValueError при ошибке"""
+    match = LOAD_RE.match(text.strip())
+    if not match:
+        raise ValueError("Формат: LOAD 200x20 GET https://api.example.com/data")
+    total, concurrency = int(match.group(1)), int(match.group(2))
+    method = (match.group(3) or 'GET').upper()
+    url = match.group(4)
+
+    if method not in LOAD_METHODS:
+        raise ValueError(f"Неподдерживаемый метод {method}")
+    if not 1 <= total <= Config.LOAD_MAX_REQUESTS:
+        raise ValueError(f"Число запросов должно быть от 1 до {Config.LOAD_MAX_REQUESTS}")
+    if not 1 <= concurrency <= Config.LOAD_MAX_CONCURRENCY:
+        raise ValueError(f"Параллельность должна быть от 1 до {Config.LOAD_MAX_CONCURRENCY}")
+
+    if not urlparse(url).scheme:
+        url = f"https://{url}"
+    if not urlparse(url).netloc:
+        raise ValueError("Некорректный URL")
+    return total, min(concurrency, total), method, url
+
+
+async def run_load_test(session: aiohttp.ClientSession, method: str, url: str, total: int,
+                        concurrency: int, timeout: float = 30, progress=None) -> LoadTestResult:
+    """N запросов с параллельностью C; тела ответов читаются и сразу отбрасываются.
+
+    Этапы запросов отмечает TraceConfig общей сессии (см. http_session.RequestTimings).
+    """
+    result = LoadTestResult(method, url, total, concurrency)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    remaining = iter(range(total))
+    result.started_at = time.perf_counter()
+
+    async def worker():
+        for _ in remaining:
+            timings = RequestTimings()
+            try:
+                async with session.request(method, url, timeout=client_timeout,
+                                           trace_request_ctx=timings) as response:
+                    size = 0
+                    async for chunk in response.content.iter_chunked(DRAIN_CHUNK_SIZE):
+                        size += len(chunk)
+                    timings.finish()
+                    result.record_response(response.status, timings, size)
+            except asyncio.TimeoutError:
+                result.record_error("Timeout", time.perf_counter())
+            except aiohttp.ClientError as e:
+                result.record_error(type(e).__name__, time.perf_counter())
+            if progress is not None:
+                await progress(result)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed = time.perf_counter() - result.started_at
+    return result
+
+
+def render_chart(series: list, title: str) -> bytes:
+    """PNG-график по времени: столбцы - запросы/с, линии - p50 и p99 (синхронно, в пуле)"""
+    width, height = 900, 420
+    left, right, top, bottom = 60, 60, 40, 50
+    plot_w, plot_h = width - left - right, height - top - bottom
+
+    img = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.load_default()
+
+    seconds = max(1, len(series))
+    max_rps = max([row[1] for row in series] + [1])
+    max_latency = max([row[3] for row in series] + [1.0])
+    bar_w = plot_w / seconds
+
+    # Сетка и оси
+    for step in range(5):
+        y = top + plot_h * step / 4
+        draw.line([(left, y), (left + plot_w, y)], fill=(230, 230, 230))
+        draw.text((5, y - 6), f"{max_rps * (4 - step) / 4:.0f}", fill=(70, 110, 170), font=font)
+        draw.text((left + plot_w + 5, y - 6), f"{max_latency * (4 - step) / 4:.0f}", fill=(200, 60, 60), font=font)
+    draw.rectangle([left, top, left + plot_w, top + plot_h], outline=(120, 120, 120))
+
+    p50_points, p99_points = [], []
+    for position, (started, rps, p50, p99, errors) in enumerate(series):
+        x0 = left + position * bar_w
+        bar_h = plot_h * rps / max_rps
+        draw.rectangle([x0 + 1, top + plot_h - bar_h, x0 + bar_w - 1, top + plot_h], fill=(170, 200, 235))
+        if errors:
+            error_h = plot_h * errors / max_rps
+            draw.rectangle([x0 + 1, top + plot_h - error_h, x0 + bar_w - 1, top + plot_h], fill=(240, 150, 150))
+        x = x0 + bar_w / 2
+        if p99:
+            p50_points.append((x, top + plot_h - plot_h * p50 / max_latency))
+            p99_points.append((x, top + plot_h - plot_h * p99 / max_latency))
+        if position % max(1, seconds // 6) == 0:
+            draw.text((x0, top + plot_h + 4), f"{started:g}", fill='black', font=font)
+
+    for points, color in ((p50_points, (40, 150, 60)), (p99_points, (200, 60, 60))):
+        if len(points) > 1:
+            draw.line(points, fill=color, width=2)
+        for x, y in points:
+            draw.ellipse([x - 2, y - 2, x + 2, y + 2], fill=color)
+
+    draw.text((left, 12), title, fill='black', font=font)
+    draw.text((left, height - 18), "req/s (bars, errors in red)", fill=(70, 110, 170), font=font)
+    draw.text((left + 250, height - 18), "p50 ms", fill=(40, 150, 60), font=font)
+    draw.text((left + 330, height - 18), "p99 ms", fill=(200, 60, 60), font=font)
+    draw.text((left + plot_w - 80, height - 18), "time, s", fill='black', font=font)
+
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def format_report(result: LoadTestResult, pool_limit: int = None) -> str:
+    latency = result.latency.summary_ms()
+    failed = sum(result.errors.values()) + sum(
+        count for status, count in result.statuses.items() if status >= 400
+    )
+    report = (
+        f"📈 <b>Нагрузочный тест API</b>\n\n"
+        f"> <b>URL:</b> <code>{html.escape(result.url)}</code>\n"
+        f"> <b>Метод:</b> <code>{result.method}</code>\n"
+        f"> <b>Запросов:</b> {result.completed} из {result.total}, параллельно {result.concurrency}\n"
+        f"> <b>Длительность:</b> {result.elapsed:.2f} с\n"
+        f"> <b>Пропускная способность:</b> {result.throughput():.1f} запросов/с\n"
+        f"> <b>Получено:</b> {result.bytes_received / 1024:.1f} КБ\n\n"
+        f"<b>⏱ Задержка, мс:</b>\n"
+        f"• p50: {latency['p50']:.1f}\n"
+        f"• p90: {latency['p90']:.1f}\n"
+        f"• p99: {latency['p99']:.1f}\n"
+        f"• max: {latency['max']:.1f}\n"
+        f"• среднее: {latency['mean']:.1f}\n\n"
+        f"<b>🔬 Этапы, мс (p50 / p90 / p99 / max):</b>\n" +
+        "\n".join(
+            f"• {title}: " + (
+                " / ".join(f"{value:.1f}" for key, value in result.phases[name].summary_ms().items() if key != 'mean')
+                if result.phases[name].count else "—"
+            )
+            for name, title in PHASES
+        ) +
+        f"\n• Новых соединений: {result.new_connections}, переиспользовано: {result.reused}\n\n"
+        f"<b>📊 Статусы:</b>\n" +
+        ("\n".join(f"• {status}: {count}" for status, count in sorted(result.statuses.items())) or "• нет ответов")
+    )
+    if result.errors:
+        report += "\n\n<b>❌ Ошибки:</b>\n" + "\n".join(
+            f"• {html.escape(error)}: {count}" for error, count in result.errors.most_common()
+        )
+    report += f"\n\n<b>Доля ошибок:</b> {failed / max(result.completed, 1) * 100:.1f}%"
+    if pool_limit and result.concurrency > pool_limit:
+        report += (
+            f"\n\n<i>Фактическая параллельность ограничена пулом соединений "
+            f"(HTTP_POOL_LIMIT_PER_HOST={pool_limit}); ожидание в пуле входит в задержку</i>"
+        )
+    return report
+
+
+async def process_load_test(message: Message, text: str):
+    """Обработка команды LOAD из валидатора API"""
+    try:
+        total, concurrency, method, url = parse_load_command(text)
+    except ValueError as e:
+        await message.answer(f"❌ {html.escape(str(e))}", parse_mode="HTML")
+        return
+
+    status_message = await message.answer(f"⏳ Нагрузочный тест: 0/{total}")
+    last_update = time.monotonic()
+
+    async def progress(result: LoadTestResult):
+        nonlocal last_update
+        # Telegram ограничивает частоту редактирования сообщений
+        if time.monotonic() - last_update < 2:
+            return
+        last_update = time.monotonic()
+        try:
+            await status_message.edit_text(f"⏳ Нагрузочный тест: {result.completed}/{total}")
+        except Exception:
+            pass
+
+    logger.info(f"Load test: {method} {url} {total}x{concurrency}")
+    session = await http_sessions.get_session()
+    result = await run_load_test(session, method, url, total, concurrency,
+                                 timeout=Config.LOAD_TIMEOUT, progress=progress)
+
+    await message.answer(format_report(result, http_sessions.limit_per_host), parse_mode="HTML")
+
+    chart = await executor.run(
+        "api_validator", render_chart, result.series(),
+        f"{method} {url} - {total} requests x {concurrency}"
+    )
+    await message.answer_photo(
+        BufferedInputFile(chart, filename="load_test.png"),
+        caption="Запросы в секунду и задержка p50/p99 по времени"
+    )
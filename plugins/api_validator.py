@@ -4,12 +4,13 @@ from aiogram.fsm.state import State, StatesGroup
 import aiohttp
 import asyncio
 import json
-import time
 import logging
 import html
 import re
 from urllib.parse import urlparse
 from messages import MENU_MSG, get_main_menu, get_back_menu
+from http_session import http_sessions, RequestTimings
+from plugins.api_load_tester import is_load_command, process_load_test
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +30,79 @@ def escape_html_for_telegram(text: str) -> str:
 
 HTTP_METHODS = ['GET', 'POST', 'PUT', 'DELETE', 'PATCH', 'HEAD', 'OPTIONS']
 
+# Ограничиваем размер ответа до 5MB для безопасности
+MAX_RESPONSE_SIZE = 5 * 1024 * 1024
+# Сколько байт большого ответа сохраняем для показа
+PREVIEW_SIZE = 4 * 1024
+CHUNK_SIZE = 64 * 1024
+
+async def read_body_capped(response: aiohttp.ClientResponse, max_size: int = MAX_RESPONSE_SIZE,
+                           preview_size: int = PREVIEW_SIZE):
+    """Потоковое чтение тела ответа с ограничением размера.
+
+    Тело читается частями и не накапливается сверх max_size: если ответ
+    больше (по Content-Length или по факту), чтение прерывается, а для
+    показа остаются только первые preview_size байт.
+
+    Возвращает (body, preview, size, size_exact): body - тело целиком или None,
+    если ответ слишком большой; size - размер из Content-Length или число
+    прочитанных байт (size_exact=False - ответ был больше, чтение прервано).
+    """
+    declared = response.content_length
+    too_large = declared is not None and declared > max_size
+    buffer = bytearray()
+    received = 0
+    finished = True
+
+    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+        received += len(chunk)
+        if not too_large and received > max_size:
+            too_large = True
+            del buffer[preview_size:]
+        if too_large:
+            buffer += chunk[:max(0, preview_size - len(buffer))]
+            if len(buffer) >= preview_size:
+                finished = False
+                break
+        else:
+            buffer += chunk
+
+    if not too_large:
+        return bytes(buffer), bytes(buffer[:preview_size]), received, True
+
+    if not finished:
+        # Не дочитываем: соединение закрывается, а не возвращается в пул
+        response.close()
+    if declared is not None:
+        return None, bytes(buffer), declared, True
+    return None, bytes(buffer), received, finished
+
+def format_timings(timings: RequestTimings) -> str:
+    """Блок с этапами запроса для сообщения с результатом"""
+    phases = timings.phases()
+
+    def value(name: str) -> str:
+        return f"{phases[name]} мс" if phases[name] is not None else "—"
+
+    if timings.reused:
+        dns = connect = "соединение переиспользовано ♻️"
+    else:
+        dns = "из кэша" if timings.dns_cached else value('dns')
+        connect = value('connect')
+    lines = [
+        "<b>⏱ Этапы запроса:</b>",
+        f"• DNS: {dns}",
+        f"• Подключение (TCP + TLS): {connect}",
+        f"• Ожидание ответа (TTFB): {value('ttfb')}",
+        f"• Загрузка тела: {value('body')}",
+        f"• Всего: {value('total')}",
+    ]
+    if phases['queue']:
+        lines.insert(1, f"• Ожидание соединения в пуле: {phases['queue']} мс")
+    if timings.redirects:
+        lines.append(f"• Перенаправлений: {timings.redirects}")
+    return "\n".join(lines)
+
 async def api_validator_command(message: Message, state: FSMContext):
     await show_url_input_menu(message, state)
 
@@ -49,6 +123,8 @@ async def show_url_input_menu(message: Message, state: FSMContext):
         "• <code>POST https://api.example.com/users</code>\n"
         "• <code>GET https://api.example.com/data</code>\n\n"
         "Поддерживаемые методы: GET, POST, PUT, DELETE, PATCH, HEAD, OPTIONS\n\n"
+        "Нагрузочный тест: N запросов с параллельностью C:\n"
+        "• <code>LOAD 200x20 GET https://api.example.com/data</code>\n\n"
         "💡 <i>Указывай конкретные endpoints, а не корневые URL</i>",
         parse_mode="HTML",
         reply_markup=builder
@@ -69,6 +145,11 @@ async def process_api_validation(message: Message, state: FSMContext):
         input_text = message.text.strip()
         logger.info(f"Processing API validation request: {input_text}")
         
+        if is_load_command(input_text):
+            await process_load_test(message, input_text)
+            await ask_for_validate_again(message, state)
+            return
+        
         # Парсим метод и URL
         parts = input_text.split(maxsplit=1)
         if len(parts) == 2 and parts[0].upper() in HTTP_METHODS:
@@ -105,11 +186,14 @@ async def process_api_validation(message: Message, state: FSMContext):
         # Делаем запрос
         await message.answer("⏳ Выполняю запрос...")
         
-        start_time = time.time()
-        async with aiohttp.ClientSession() as session:
+        # Этапы запроса (DNS, подключение, TTFB, тело) отмечает TraceConfig общей сессии
+        timings = RequestTimings()
+        # Общая сессия: keep-alive соединения и DNS-кэш переиспользуются между проверками
+        async with http_sessions.acquire() as session:
             try:
-                async with session.request(method, url, timeout=aiohttp.ClientTimeout(total=30)) as response:
-                    response_time = round((time.time() - start_time) * 1000, 2)  # в миллисекундах
+                async with session.request(method, url, timeout=aiohttp.ClientTimeout(total=30),
+                                           trace_request_ctx=timings) as response:
+                    response_time = timings.phases()['total']  # до получения заголовков, в миллисекундах
                     
                     # Пытаемся сначала прочитать как JSON, если не получится - читаем как текст
                     is_json = False
@@ -122,14 +206,19 @@ async def process_api_validation(message: Message, state: FSMContext):
                     
                     # Пытаемся прочитать как JSON
                     try:
-                        # Читаем байты, чтобы можно было попробовать и JSON и текст
-                        # Ограничиваем размер ответа до 5MB для безопасности
-                        max_size = 5 * 1024 * 1024  # 5MB
-                        raw_data = await response.read()
+                        # Читаем байты, чтобы можно было попробовать и JSON и текст.
+                        # Тело читается потоком: большой ответ не попадает в память целиком
+                        max_size = MAX_RESPONSE_SIZE
+                        raw_data, preview, body_size, size_exact = await read_body_capped(response, max_size)
+                        timings.finish()
                         
-                        if len(raw_data) > max_size:
-                            response_text = f"[Ответ слишком большой: {len(raw_data)} байт (максимум {max_size} байт)]"
-                            logger.warning(f"Response too large: {len(raw_data)} bytes for URL {url}")
+                        if raw_data is None:
+                            size_text = f"{body_size}" if size_exact else f"более {body_size}"
+                            response_text = (
+                                f"[Ответ слишком большой: {size_text} байт (максимум {max_size} байт)]\n"
+                                f"{preview.decode('utf-8', errors='replace')}"
+                            )
+                            logger.warning(f"Response too large: {size_text} bytes for URL {url}")
                         else:
                             # Пытаемся распарсить как JSON
                             try:
@@ -158,6 +247,7 @@ async def process_api_validation(message: Message, state: FSMContext):
                         f"> <b>Метод:</b> <code>{method}</code>\n"
                         f"> <b>Статус:</b> <code>{response.status}</code> {status_text}\n"
                         f"> <b>Время ответа:</b> {response_time} мс\n\n"
+                        f"{format_timings(timings)}\n\n"
                     )
                     
                     # Добавляем информацию о заголовках
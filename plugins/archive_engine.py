@@ -0,0 +1,237 @@
+"""Генерация архивов для тестирования загрузки и распаковки.
+
+Параметры задаются строкой ``ключ=значение``:
+
+* ``files=1000`` - количество файлов;
+* ``depth=5`` - вложенность каталогов (файлы распределяются по уровням);
+* ``nested=3`` - архив в архиве: файлы лежат в самом глубоком архиве;
+* ``method=deflate`` - сжатие ZIP: store, deflate, bzip2, lzma или mixed
+  (методы чередуются по записям); RAR - только store;
+* ``types=txt,png,pdf`` - форматы файлов (чередуются по записям);
+* ``size=10KB`` - размер каждого файла (иначе - обычный файл формата);
+* ``bomb=1GB`` - запись из нулей с коэффициентом сжатия около 1000:1;
+* ``zip64`` - записи и каталог в формате zip64 даже для маленьких архивов.
+
+Архив пишется на диск потоком (``archive_formats``), содержимое файлов
+берется у генераторов бота: функция ``render_entry(format, index)``
+передается вызывающим кодом. Файл заданного размера создается один раз
+на формат и копируется в каждую запись.
+"""
+import os
+import zlib
+from functools import lru_cache
+from typing import Callable, List, Optional, Sequence, Tuple
+from config import Config
+from plugins.archive_formats import BZIP2, DEFLATE, LZMA, STORE, Rar5Writer, ZipStreamWriter
+from plugins.sized_files import CHUNK, WRITERS as SIZED_WRITERS, format_size, parse_size, write_sized_file
+
+ARCHIVE_FORMATS = ('zip', 'rar')
+METHODS = {
+    STORE: (STORE,), DEFLATE: (DEFLATE,), BZIP2: (BZIP2,), LZMA: (LZMA,),
+    'mixed': (STORE, DEFLATE, BZIP2, LZMA),
+}
+DEFAULT_FILES = 10
+# Средний размер обычного файла - для оценки места на диске
+ENTRY_ESTIMATE = 16 * 1024
+ENTRY_OVERHEAD = 200
+BOMB_RATIO = 1000
+
+
+class ArchiveSpec:
+    """Параметры генерируемого архива"""
+
+    def __init__(self, format_type: str):
+        self.format_type = format_type
+        self.files = DEFAULT_FILES
+        self.depth = 0
+        self.nested = 0
+        self.method = STORE if format_type == 'rar' else DEFLATE
+        self.types: List[str] = ['txt']
+        self.size: Optional[int] = None
+        self.bomb = 0
+        self.zip64 = False
+
+    @property
+    def methods(self) -> Tuple[str, ...]:
+        return METHODS[self.method]
+
+    def key(self) -> tuple:
+        """Нормализованные параметры (ключ кэша file_id)"""
+        return (self.files, self.depth, self.nested, self.method, tuple(self.types), self.size, self.bomb,
+                self.zip64)
+
+    def estimate(self) -> int:
+        """Оценка размера архива сверху (место на диске, таймаут загрузки)"""
+        entry = self.size if self.size is not None else ENTRY_ESTIMATE
+        payload = self.files * (entry + ENTRY_OVERHEAD) + self.bomb // BOMB_RATIO
+        return payload + (self.depth + self.nested + 1) * ENTRY_OVERHEAD
+
+    def describe(self) -> str:
+        parts = [f"файлов: {self.files} ({', '.join(self.types)})"]
+        if self.size is not None:
+            parts.append(f"по {format_size(self.size)}")
+        if self.depth:
+            parts.append(f"вложенность каталогов {self.depth}")
+        if self.nested:
+            parts.append(f"архив в архиве ×{self.nested}")
+        if self.bomb:
+            parts.append(f"бомба {format_size(self.bomb)}")
+        parts.append(f"сжатие {self.method}" + (", zip64" if self.zip64 else ""))
+        return ", ".join(parts)
+
+
+def _int_param(key: str, value: str, low: int, high: int) -> int:
+    if not value.isdigit():
+        raise ValueError(f"{key} должно быть целым числом")
+    number = int(value)
+    if not low <= number <= high:
+        raise ValueError(f"{key} должно быть от {low} до {high}")
+    return number
+
+
+def _size_param(key: str, value: str, limit: int) -> int:
+    size = parse_size(value)
+    if size is None:
+        size = int(value) if value.isdigit() else None
+    if size is None:
+        raise ValueError(f"{key}: укажи размер, например 10KB или 1GB")
+    if size > limit:
+        raise ValueError(f"{key} не может превышать {format_size(limit)}")
+    return size
+
+
+def parse_archive_spec(text: str, format_type: str, entry_formats: Sequence[str]) -> Optional[ArchiveSpec]:
+    """Параметры архива из текста; None - в тексте нет параметров"""
+    tokens = (text or "").lower().replace(';', ' ').split()
+    if not any('=' in token or token == 'zip64' for token in tokens):
+        return None
+
+    spec = ArchiveSpec(format_type)
+    for token in tokens:
+        if token == 'zip64':
+            spec.zip64 = True
+            continue
+        key, separator, value = token.partition('=')
+        if not separator or not value:
+            raise ValueError(f"непонятный параметр «{token}», нужен формат ключ=значение")
+        if key == 'files':
+            spec.files = _int_param(key, value, 1, Config.ARCHIVE_MAX_ENTRIES)
+        elif key == 'depth':
+            spec.depth = _int_param(key, value, 0, Config.ARCHIVE_MAX_DEPTH)
+        elif key == 'nested':
+            spec.nested = _int_param(key, value, 0, Config.ARCHIVE_MAX_NESTED)
+        elif key == 'method':
+            if value not in METHODS:
+                raise ValueError(f"method: {', '.join(METHODS)}")
+            spec.method = value
+        elif key == 'types':
+            types = [item.strip('.') for item in value.split(',') if item.strip('.')]
+            unknown = [item for item in types if item not in entry_formats]
+            if unknown or not types:
+                raise ValueError(f"types: неизвестный формат {', '.join(unknown)}; "
+                                 f"доступны {', '.join(entry_formats)}")
+            spec.types = types
+        elif key == 'size':
+            spec.size = _size_param(key, value, Config.FILE_UPLOAD_LIMIT)
+        elif key == 'bomb':
+            spec.bomb = _size_param(key, value, Config.ARCHIVE_MAX_BOMB_SIZE)
+        else:
+            raise ValueError(f"неизвестный параметр «{key}»; доступны files, depth, nested, method, "
+                             f"types, size, bomb, zip64")
+
+    if format_type == 'rar':
+        if spec.method != STORE or spec.bomb or spec.zip64:
+            raise ValueError("RAR создается только без сжатия: method, bomb и zip64 доступны для ZIP")
+    if spec.size is not None:
+        unsized = [item for item in spec.types if item not in SIZED_WRITERS]
+        if unsized:
+            raise ValueError(f"size не поддерживается для {', '.join(unsized)}")
+    return spec
+
+
+def _read_chunks(path: str):
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK)
+            if not chunk:
+                return
+            yield chunk
+
+
+@lru_cache(maxsize=1)
+def _zero_block() -> bytes:
+    """1 МБ нулей, сжатый Deflate с полным сбросом: такие блоки можно повторять подряд"""
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+    return compressor.compress(bytes(CHUNK)) + compressor.flush(zlib.Z_FULL_FLUSH)
+
+
+def _add_bomb(writer: ZipStreamWriter, name: str, size: int):
+    """Запись из size нулевых байт: сжатие выполняется один раз, блок повторяется"""
+    block = _zero_block()
+    full, rest = divmod(size, CHUNK)
+    zeros = bytes(CHUNK)
+    crc = 0
+    for _ in range(full):
+        crc = zlib.crc32(zeros, crc)
+    crc = zlib.crc32(zeros[:rest], crc)
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+    tail = compressor.compress(zeros[:rest]) + compressor.flush()
+    writer.add_raw(name, size, crc, [block] * full + [tail], DEFLATE)
+
+
+def _write_payload(writer, spec: ArchiveSpec, render_entry: Callable[[str, int], bytes], work_path: str,
+                   temp_files: List[str]):
+    directories = [""]
+    for level in range(1, spec.depth + 1):
+        directories.append(f"{directories[-1]}dir_{level}/")
+        writer.add_dir(directories[-1])
+
+    width = len(str(spec.files))
+    sized = {}
+    for index in range(spec.files):
+        file_format = spec.types[index % len(spec.types)]
+        method = spec.methods[index % len(spec.methods)]
+        name = f"{directories[index % len(directories)]}file_{index + 1:0{width}d}.{file_format}"
+        if spec.size is None:
+            data = render_entry(file_format, index)
+            writer.add_file(name, len(data), [data], method)
+            continue
+        if file_format not in sized:
+            path = f"{work_path}.entry.{file_format}"
+            temp_files.append(path)
+            sized[file_format] = (path, write_sized_file(file_format, spec.size, path))
+        path, size = sized[file_format]
+        writer.add_file(name, size, _read_chunks(path), method)
+
+    if spec.bomb:
+        _add_bomb(writer, "bomb.bin", spec.bomb)
+
+
+def write_archive(spec: ArchiveSpec, render_entry: Callable[[str, int], bytes], path: str) -> int:
+    """Записать архив в path; возвращает размер.
+
+    Синхронно, выполняется в пуле исполнителей. Вложенные архивы
+    собираются изнутри наружу во временных файлах рядом с path.
+    """
+    temp_files: List[str] = []
+    try:
+        inner = None
+        for level in range(spec.nested, -1, -1):
+            target = path if level == 0 else f"{path}.level{level}"
+            temp_files.append(target)
+            with open(target, 'wb') as f:
+                writer = Rar5Writer(f) if spec.format_type == 'rar' else ZipStreamWriter(f, spec.zip64)
+                if inner is None:
+                    _write_payload(writer, spec, render_entry, path, temp_files)
+                else:
+                    writer.add_file(f"nested_{level + 1}.{spec.format_type}", os.path.getsize(inner),
+                                    _read_chunks(inner), STORE)
+                writer.close()
+            if inner is not None:
+                os.remove(inner)
+            inner = target
+        return os.path.getsize(path)
+    finally:
+        for temp in temp_files:
+            if temp != path and os.path.exists(temp):
+                os.remove(temp)
@@ -0,0 +1,251 @@
+"""Потоковая запись архивов ZIP и RAR5.
+
+Записи пишутся в файл по мере поступления данных, содержимое не
+накапливается в памяти: размер записи известен заранее, а контрольная
+сумма (и для ZIP - сжатый размер) дописывается в заголовок после данных,
+поэтому выходной файл должен поддерживать seek.
+
+* ZIP - хранение, Deflate, BZIP2 и LZMA, у каждой записи свой метод;
+  zip64 включается для больших записей, архивов больше 4 ГБ и больше
+  65535 записей или принудительно. Заранее сжатые данные (например,
+  повторяющийся блок Deflate) добавляются через ``add_raw``.
+* RAR5 - только хранение без сжатия: алгоритм сжатия RAR закрыт.
+  libarchive (bsdtar) определяет формат по содержимому и принимает за
+  ZIP архив RAR, в последних 16 КБ которого хранится ZIP (DOCX, XLSX).
+"""
+import bz2
+import calendar
+import struct
+import zipfile
+import zlib
+from typing import Iterable, Tuple
+
+ZIP_DATE = (2024, 1, 1, 0, 0, 0)
+
+STORE = 'store'
+DEFLATE = 'deflate'
+BZIP2 = 'bzip2'
+LZMA = 'lzma'
+ZIP_METHODS = {STORE: 0, DEFLATE: 8, BZIP2: 12, LZMA: 14}
+# Версия формата, необходимая для распаковки (APPNOTE 4.4.3)
+_ZIP_VERSIONS = {STORE: 20, DEFLATE: 20, BZIP2: 46, LZMA: 63}
+_ZIP64_VERSION = 45
+_ZIP64_LIMIT = 0xFFFFFFFF
+_ZIP_UTF8 = 0x0800
+_ZIP_LZMA_EOS = 0x0002
+_UNIX = 3
+
+_RAR_SIGNATURE = b'Rar!\x1a\x07\x01\x00'
+_RAR_MAIN, _RAR_FILE, _RAR_END = 1, 2, 5
+_RAR_HAS_DATA = 0x0002
+_RAR_DIRECTORY, _RAR_UNIX_TIME, _RAR_CRC = 0x0001, 0x0002, 0x0004
+_RAR_HOST_UNIX = 1
+
+FILE_MODE = 0o100644
+DIR_MODE = 0o040755
+
+
+def _dos_datetime(date_time: Tuple[int, ...]) -> Tuple[int, int]:
+    year, month, day, hour, minute, second = date_time
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+
+def _compressor(method: str):
+    if method == DEFLATE:
+        return zlib.compressobj(6, zlib.DEFLATED, -15)
+    if method == BZIP2:
+        return bz2.BZ2Compressor()
+    if method == LZMA:
+        # Формат LZMA в ZIP (заголовок со свойствами кодера) - как в zipfile
+        return zipfile.LZMACompressor()
+    return None
+
+
+class ZipStreamWriter:
+    """Потоковая запись ZIP-архива в файл с поддержкой seek"""
+
+    def __init__(self, f, force_zip64: bool = False, date_time: Tuple[int, ...] = ZIP_DATE):
+        self.f = f
+        self.force_zip64 = force_zip64
+        self.dos_time, self.dos_date = _dos_datetime(date_time)
+        self.entries = 0
+        self._central = []
+
+    def add_dir(self, name: str):
+        name = name.rstrip('/') + '/'
+        self._add(name, STORE, 0, [], mode=DIR_MODE, external=0x10)
+
+    def add_file(self, name: str, size: int, chunks: Iterable[bytes], method: str = DEFLATE):
+        """Запись размером ``size`` байт из потока фрагментов"""
+        self._add(name, method, size, chunks, mode=FILE_MODE)
+
+    def add_raw(self, name: str, size: int, crc: int, compressed: Iterable[bytes], method: str = DEFLATE):
+        """Запись из уже сжатых данных (``crc`` и ``size`` - для исходных)"""
+        self._add(name, method, size, compressed, mode=FILE_MODE, raw_crc=crc)
+
+    def _local_header(self, name: bytes, method: str, flags: int, crc: int, compressed: int, size: int,
+                      zip64: bool) -> bytes:
+        extra = b''
+        if zip64:
+            extra = struct.pack('<HHQQ', 0x0001, 16, size, compressed)
+            compressed = size = _ZIP64_LIMIT
+        version = max(_ZIP_VERSIONS[method], _ZIP64_VERSION if zip64 else 0)
+        return struct.pack(
+            '<IHHHHHIIIHH', 0x04034b50, version, flags, ZIP_METHODS[method], self.dos_time, self.dos_date,
+            crc, compressed, size, len(name), len(extra)
+        ) + name + extra
+
+    def _add(self, name: str, method: str, size: int, chunks: Iterable[bytes], mode: int, external: int = 0,
+             raw_crc: int = None):
+        encoded = name.encode('utf-8')
+        flags = _ZIP_UTF8 | (_ZIP_LZMA_EOS if method == LZMA else 0)
+        # Несжимаемые данные могут вырасти при сжатии - запас как в zipfile
+        zip64 = self.force_zip64 or size * 1.05 > _ZIP64_LIMIT
+        offset = self.f.tell()
+        self.f.write(self._local_header(encoded, method, flags, 0, 0, size, zip64))
+        data_start = self.f.tell()
+
+        compressor = None if raw_crc is not None else _compressor(method)
+        crc = 0
+        written = 0
+        for chunk in chunks:
+            if raw_crc is None:
+                crc = zlib.crc32(chunk, crc)
+                written += len(chunk)
+                if compressor is not None:
+                    chunk = compressor.compress(chunk)
+            if chunk:
+                self.f.write(chunk)
+        if compressor is not None:
+            self.f.write(compressor.flush())
+        if raw_crc is not None:
+            crc, written = raw_crc, size
+        if written != size:
+            raise ValueError(f"Размер записи {name}: ожидалось {size}, записано {written}")
+
+        end = self.f.tell()
+        compressed = end - data_start
+        if not zip64 and compressed > _ZIP64_LIMIT:
+            raise ValueError(f"Запись {name} после сжатия больше 4 ГБ, нужен zip64")
+        self.f.seek(offset)
+        self.f.write(self._local_header(encoded, method, flags, crc, compressed, size, zip64))
+        self.f.seek(end)
+        self._central.append((encoded, method, flags, crc, compressed, size, offset, zip64,
+                              (mode << 16) | external))
+        self.entries += 1
+
+    def _central_record(self, encoded: bytes, method: str, flags: int, crc: int, compressed: int, size: int,
+                        offset: int, zip64: bool, attributes: int) -> bytes:
+        fields = []
+        if zip64:
+            fields += [size, compressed]
+            size = compressed = _ZIP64_LIMIT
+        if offset >= _ZIP64_LIMIT:
+            fields.append(offset)
+            offset = _ZIP64_LIMIT
+        extra = struct.pack(f'<HH{len(fields)}Q', 0x0001, 8 * len(fields), *fields) if fields else b''
+        version = max(_ZIP_VERSIONS[method], _ZIP64_VERSION if extra else 0)
+        return struct.pack(
+            '<IHHHHHHIIIHHHHHII', 0x02014b50, (_UNIX << 8) | version, version, flags, ZIP_METHODS[method],
+            self.dos_time, self.dos_date, crc, compressed, size, len(encoded), len(extra), 0, 0, 0,
+            attributes, offset
+        ) + encoded + extra
+
+    def close(self):
+        start = self.f.tell()
+        for entry in self._central:
+            self.f.write(self._central_record(*entry))
+        self._central = []
+        directory_size = self.f.tell() - start
+        count = self.entries
+        if self.force_zip64 or count >= 0xFFFF or start >= _ZIP64_LIMIT or directory_size >= _ZIP64_LIMIT:
+            zip64_end = self.f.tell()
+            self.f.write(struct.pack(
+                '<IQHHIIQQQQ', 0x06064b50, 44, (_UNIX << 8) | _ZIP64_VERSION, _ZIP64_VERSION, 0, 0,
+                count, count, directory_size, start
+            ))
+            self.f.write(struct.pack('<IIQI', 0x07064b50, 0, zip64_end, 1))
+            count = min(count, 0xFFFF)
+            start = min(start, _ZIP64_LIMIT)
+            directory_size = min(directory_size, _ZIP64_LIMIT)
+        self.f.write(struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, count, count, directory_size, start, 0))
+
+
+def vint(value: int) -> bytes:
+    """Целое переменной длины RAR5: по 7 бит, младшие первыми"""
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _rar_block(header_type: int, flags: int, body: bytes, data_size: int = None) -> bytes:
+    fields = vint(header_type) + vint(flags | (_RAR_HAS_DATA if data_size is not None else 0))
+    if data_size is not None:
+        fields += vint(data_size)
+    fields += body
+    header = vint(len(fields)) + fields
+    return struct.pack('<I', zlib.crc32(header)) + header
+
+
+def _rar_file_header(name: bytes, size: int, crc: int, directory: bool, mtime: int) -> bytes:
+    flags = _RAR_UNIX_TIME | (_RAR_DIRECTORY if directory else _RAR_CRC)
+    body = vint(flags) + vint(size) + vint(DIR_MODE if directory else FILE_MODE) + struct.pack('<I', mtime)
+    if not directory:
+        body += struct.pack('<I', crc)
+    # Информация о сжатии 0: версия 0, метод 0 (хранение)
+    body += vint(0) + vint(_RAR_HOST_UNIX) + vint(len(name)) + name
+    # Область данных обязательна и у каталогов (libarchive без нее отвергает заголовок)
+    return _rar_block(_RAR_FILE, 0, body, data_size=size)
+
+
+def rar_header_size(name: str, size: int) -> int:
+    """Размер заголовка записи RAR5 (для подгонки архива под точный размер)"""
+    return len(_rar_file_header(name.encode('utf-8'), size, 0, False, 0))
+
+
+class Rar5Writer:
+    """Потоковая запись архива RAR5 (записи хранятся без сжатия)"""
+
+    def __init__(self, f, date_time: Tuple[int, ...] = ZIP_DATE):
+        self.f = f
+        self.mtime = calendar.timegm(tuple(date_time) + (0, 0, 0))
+        self.entries = 0
+        self.f.write(_RAR_SIGNATURE)
+        self.f.write(_rar_block(_RAR_MAIN, 0, vint(0)))
+
+    def add_dir(self, name: str):
+        self.f.write(_rar_file_header(name.rstrip('/').encode('utf-8'), 0, 0, True, self.mtime))
+        self.entries += 1
+
+    def add_file(self, name: str, size: int, chunks: Iterable[bytes], method: str = STORE):
+        if method != STORE:
+            raise ValueError("RAR создается только без сжатия (store)")
+        encoded = name.encode('utf-8')
+        offset = self.f.tell()
+        self.f.write(_rar_file_header(encoded, size, 0, False, self.mtime))
+        crc = 0
+        written = 0
+        for chunk in chunks:
+            crc = zlib.crc32(chunk, crc)
+            written += len(chunk)
+            self.f.write(chunk)
+        if written != size:
+            raise ValueError(f"Размер записи {name}: ожидалось {size}, записано {written}")
+        end = self.f.tell()
+        self.f.seek(offset)
+        self.f.write(_rar_file_header(encoded, size, crc, False, self.mtime))
+        self.f.seek(end)
+        self.entries += 1
+
+    def close(self):
+        self.f.write(_rar_block(_RAR_END, 0, vint(0)))
+
+
+# Служебные блоки без записей: сигнатура, главный заголовок и конец архива
+RAR_OVERHEAD = len(_RAR_SIGNATURE) + len(_rar_block(_RAR_MAIN, 0, vint(0))) + len(_rar_block(_RAR_END, 0, vint(0)))
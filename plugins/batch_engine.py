@@ -0,0 +1,236 @@
+"""Пакетная генерация файлов: матрица форматов, размеров и цветов в одном ZIP.
+
+Запрос - списки через запятую в любом порядке::
+
+    PNG,JPG,GIF 100,1000,5000 #FF0000,#00FF00
+    PDF,DOCX 10KB,1MB
+
+* форматы - ``png,jpg,pdf``;
+* размеры изображений в пикселях - ``100`` (квадрат) или ``800x600``;
+* размеры файлов в байтах - ``10KB``, ``1MB`` (как у файлов точного размера);
+* цвета изображений - ``#FF0000`` (по умолчанию белый).
+
+Каждый формат комбинируется с подходящими ему размерами: пиксели - только
+для изображений, а формат без размеров дает один файл по умолчанию.
+Файлы генерируются параллельно в пуле исполнителей (это делает
+вызывающий код), а ``BatchArchive`` дописывает их в ZIP по мере
+готовности и в конце добавляет ``manifest.csv`` с размерами и
+контрольными суммами (CRC32, MD5, SHA-256) каждого файла.
+"""
+import csv
+import hashlib
+import io
+import os
+import re
+import zlib
+from itertools import product
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from config import Config
+from plugins.archive_formats import DEFLATE, STORE, ZipStreamWriter
+from plugins.sized_files import CHUNK, WRITERS as SIZED_WRITERS, format_size, parse_size
+
+MANIFEST_NAME = "manifest.csv"
+MANIFEST_FIELDS = ("file", "format", "width", "height", "color", "size", "crc32", "md5", "sha256")
+DIMENSION_PATTERN = re.compile(r'^(\d+)(?:[xх×*](\d+))?$')
+COLOR_PATTERN = re.compile(r'^#(?:[0-9a-f]{3}){1,2}$')
+# Форматы, которые имеет смысл сжимать в ZIP (остальные уже сжаты)
+COMPRESSIBLE_FORMATS = ('bmp', 'svg', 'txt', 'css', 'html', 'js', 'json')
+# Оценка сверху для файлов без заданного размера
+DEFAULT_ENTRY_ESTIMATE = 64 * 1024
+ENTRY_OVERHEAD = 200
+
+
+class BatchItem(NamedTuple):
+    """Один файл матрицы: изображение (width, height, color) или файл размера size"""
+    format_type: str
+    width: int = 0
+    height: int = 0
+    color: Optional[Tuple[int, int, int]] = None
+    size: Optional[int] = None
+
+    @property
+    def filename(self) -> str:
+        if self.size is not None:
+            return f"file_{format_size(self.size)}.{self.format_type}"
+        if not self.width:
+            return f"file.{self.format_type}"
+        suffix = "" if self.color is None else "_" + "".join(f"{channel:02x}" for channel in self.color)
+        return f"image_{self.width}x{self.height}{suffix}.{self.format_type}"
+
+    @property
+    def method(self) -> str:
+        # Файлы точного размера хранятся без сжатия: размер архива известен заранее
+        if self.size is None and self.format_type in COMPRESSIBLE_FORMATS:
+            return DEFLATE
+        return STORE
+
+    def estimate(self) -> int:
+        if self.size is not None:
+            return self.size
+        if self.width:
+            # Несжатый BMP - худший случай для изображения
+            return self.width * self.height * 3 + 1024
+        return DEFAULT_ENTRY_ESTIMATE
+
+
+class BatchSpec:
+    """Матрица файлов пакетной генерации"""
+
+    def __init__(self, formats: List[str], dimensions: List[Tuple[int, int]], sizes: List[int],
+                 colors: List[Tuple[int, int, int]]):
+        self.formats = formats
+        self.dimensions = dimensions
+        self.sizes = sizes
+        self.colors = colors
+
+    def key(self) -> tuple:
+        """Нормализованные параметры (ключ кэша file_id)"""
+        return (tuple(self.formats), tuple(self.dimensions), tuple(self.sizes), tuple(self.colors))
+
+    def items(self, image_formats: Sequence[str]) -> List[BatchItem]:
+        """Файлы матрицы в порядке форматов, размеров и цветов"""
+        items = []
+        for format_type in self.formats:
+            if format_type in image_formats:
+                colors = self.colors or [None]
+                items += [BatchItem(format_type, width, height, color)
+                          for (width, height), color in product(self.dimensions, colors)]
+            items += [BatchItem(format_type, size=size) for size in self.sizes]
+            if not any(item.format_type == format_type for item in items):
+                items.append(BatchItem(format_type))
+        return items
+
+    def describe(self) -> str:
+        parts = [", ".join(item.upper() for item in self.formats)]
+        if self.dimensions:
+            parts.append(", ".join(f"{width}x{height}" for width, height in self.dimensions))
+        if self.sizes:
+            parts.append(", ".join(format_size(size) for size in self.sizes))
+        if self.colors:
+            parts.append(", ".join("#" + "".join(f"{channel:02X}" for channel in color) for color in self.colors))
+        return " × ".join(parts)
+
+
+def _parse_color(value: str) -> Tuple[int, int, int]:
+    hex_color = value.lstrip('#')
+    if len(hex_color) == 3:
+        hex_color = ''.join(c * 2 for c in hex_color)
+    return tuple(int(hex_color[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def _unique(values: list) -> list:
+    return list(dict.fromkeys(values))
+
+
+def parse_batch_spec(text: str, format_aliases: Dict[str, str], image_formats: Sequence[str],
+                     default_formats: Sequence[str], max_image_size: int) -> Optional[BatchSpec]:
+    """Матрица файлов из текста; None - это не пакетный запрос (нет списка через запятую).
+
+    ``format_aliases`` - названия форматов (в верхнем регистре) и их
+    расширения, ``default_formats`` - форматы, для которых есть файл по
+    умолчанию (без размера).
+    """
+    tokens = (text or "").split()
+    if not tokens or not any(',' in token for token in tokens):
+        return None
+    if tokens[0].split(',')[0].upper() not in format_aliases:
+        return None
+
+    formats, dimensions, sizes, colors = [], [], [], []
+    for token in tokens:
+        for value in filter(None, token.split(',')):
+            lowered = value.lower()
+            dimension = DIMENSION_PATTERN.match(lowered)
+            if value.upper() in format_aliases:
+                formats.append(format_aliases[value.upper()])
+            elif dimension:
+                width = int(dimension.group(1))
+                height = int(dimension.group(2) or width)
+                if not (0 < width <= max_image_size and 0 < height <= max_image_size):
+                    raise ValueError(f"размер изображения {value}: от 1 до {max_image_size}px")
+                dimensions.append((width, height))
+            elif COLOR_PATTERN.match(lowered):
+                colors.append(_parse_color(lowered))
+            elif parse_size(value) is not None:
+                size = parse_size(value)
+                if not 0 < size <= Config.FILE_UPLOAD_LIMIT:
+                    raise ValueError(f"размер файла {value}: не больше {format_size(Config.FILE_UPLOAD_LIMIT)}")
+                sizes.append(size)
+            else:
+                raise ValueError(f"непонятное значение «{value}»: нужен формат (PNG), размер (100, 800x600, "
+                                 f"10KB) или цвет (#FF0000)")
+
+    spec = BatchSpec(_unique(formats), _unique(dimensions), _unique(sizes), _unique(colors))
+    if sizes:
+        unsized = [item for item in spec.formats if item not in SIZED_WRITERS]
+        if unsized:
+            raise ValueError(f"размер в байтах не поддерживается для {', '.join(unsized)}")
+    if dimensions and not any(item in image_formats for item in spec.formats):
+        raise ValueError("размеры в пикселях указаны, но в списке нет изображений")
+    if colors and not dimensions:
+        raise ValueError("цвет задается вместе с размером изображения, например: PNG 100,500 #FF0000")
+    for format_type in spec.formats:
+        if not sizes and not (dimensions and format_type in image_formats) and format_type not in default_formats:
+            raise ValueError(f"для {format_type.upper()} укажи размер файла, например 10KB")
+
+    count = len(spec.items(image_formats))
+    if count > Config.BATCH_MAX_FILES:
+        raise ValueError(f"в пакете {count} файлов, максимум {Config.BATCH_MAX_FILES}")
+    return spec
+
+
+def estimate_batch(items: Sequence[BatchItem]) -> int:
+    """Оценка размера архива сверху (место на диске, таймаут загрузки)"""
+    return sum(item.estimate() + ENTRY_OVERHEAD for item in items) + ENTRY_OVERHEAD
+
+
+class BatchArchive:
+    """ZIP пакетной генерации: файлы дописываются по мере готовности, манифест - в конце.
+
+    Методы синхронные (запись на диск), вызываются из пула исполнителей
+    по одному: ZIP пишется последовательно.
+    """
+
+    def __init__(self, path: str):
+        self.f = open(path, 'wb')
+        self.writer = ZipStreamWriter(self.f)
+        self.rows: Dict[BatchItem, dict] = {}
+
+    def add(self, item: BatchItem, size: int, chunks: Iterable[bytes]):
+        """Записать файл матрицы, попутно считая контрольные суммы"""
+        crc, md5, sha256 = 0, hashlib.md5(), hashlib.sha256()
+
+        def hashed():
+            nonlocal crc
+            for chunk in chunks:
+                crc = zlib.crc32(chunk, crc)
+                md5.update(chunk)
+                sha256.update(chunk)
+                yield chunk
+
+        self.writer.add_file(item.filename, size, hashed(), item.method)
+        self.rows[item] = {
+            "file": item.filename, "format": item.format_type,
+            "width": item.width or "", "height": item.height or "",
+            "color": "" if item.color is None else "#" + "".join(f"{channel:02X}" for channel in item.color),
+            "size": size, "crc32": f"{crc:08x}", "md5": md5.hexdigest(), "sha256": sha256.hexdigest(),
+        }
+
+    def add_path(self, item: BatchItem, path: str):
+        """Записать файл матрицы с диска (файлы заданного размера)"""
+        with open(path, 'rb') as f:
+            self.add(item, os.path.getsize(path), iter(lambda: f.read(CHUNK), b''))
+
+    def close(self, items: Sequence[BatchItem]):
+        """Дописать manifest.csv (в порядке матрицы) и центральный каталог"""
+        buffer = io.StringIO()
+        manifest = csv.DictWriter(buffer, fieldnames=MANIFEST_FIELDS, lineterminator='\n')
+        manifest.writeheader()
+        manifest.writerows(self.rows[item] for item in items)
+        data = buffer.getvalue().encode('utf-8')
+        self.writer.add_file(MANIFEST_NAME, len(data), [data], DEFLATE)
+        self.writer.close()
+        self.f.close()
+
+    def abort(self):
+        self.f.close()
@@ -9,6 +9,7 @@ import xmltodict
 from lxml import etree
 from io import StringIO
 from messages import MENU_MSG, get_main_menu, get_back_menu
+from executor import executor
 
 logger = logging.getLogger(__name__)
 
@@ -227,31 +228,39 @@ async def validate_json(message: Message, json_text: str):
         )
         raise
 
+def parse_xml(xml_text: str):
+    """Разбор и форматирование XML (синхронно, выполняется в пуле исполнителей)"""
+    # Пытаемся распарсить XML с помощью lxml (более строгая проверка)
+    parser = etree.XMLParser(resolve_entities=False)
+    tree = etree.parse(StringIO(xml_text), parser)
+    root = tree.getroot()
+    
+    # Форматируем XML для красивого вывода
+    formatted_xml = etree.tostring(root, encoding='unicode', pretty_print=True)
+    
+    # Получаем информацию о структуре
+    structure_info = analyze_xml_structure(root)
+    
+    # Также пробуем конвертировать в словарь для анализа
+    try:
+        xmltodict.parse(xml_text)
+        dict_info = "\n✅ Можно конвертировать в словарь"
+    except Exception:
+        dict_info = "\n⚠ Не удалось конвертировать в словарь"
+    
+    return formatted_xml, structure_info, dict_info
+
 async def validate_xml(message: Message, xml_text: str):
     """Валидация XML"""
     try:
-        # Пытаемся распарсить XML с помощью lxml (более строгая проверка)
-        parser = etree.XMLParser(resolve_entities=False)
-        tree = etree.parse(StringIO(xml_text), parser)
-        root = tree.getroot()
-        
-        # Форматируем XML для красивого вывода
-        formatted_xml = etree.tostring(root, encoding='unicode', pretty_print=True)
+        # Разбор lxml + xmltodict выполняется в пуле, чтобы не блокировать event loop
+        formatted_xml, structure_info, dict_info = await executor.run("data_validator", parse_xml, xml_text)
         
-        # Получаем информацию о структуре
         # ВАЖНО: structure_info содержит строки вида "<tag>", а мы шлём сообщение с parse_mode="HTML".
         # Поэтому обязательно экранируем, иначе Telegram попытается распарсить это как HTML и упадёт
         # с ошибкой "can't parse entities: Unsupported start tag ...".
-        structure_info = analyze_xml_structure(root)
         escaped_structure_info = escape_xml_tags(structure_info)
         
-        # Также пробуем конвертировать в словарь для анализа
-        try:
-            xml_dict = xmltodict.parse(xml_text)
-            dict_info = "\n✅ Можно конвертировать в словарь"
-        except:
-            dict_info = "\n⚠ Не удалось конвертировать в словарь"
-        
         # Отправляем результат в нескольких сообщениях
         # 1. Сообщение о успешной валидации
         await message.answer(
@@ -343,17 +352,17 @@ async def validate_xml(message: Message, xml_text: str):
         )
         raise
 
+def parse_yaml(yaml_text: str):
+    """Разбор и форматирование YAML (синхронно, выполняется в пуле исполнителей)"""
+    parsed = yaml.safe_load(yaml_text)
+    formatted_yaml = yaml.dump(parsed, default_flow_style=False, allow_unicode=True)
+    return formatted_yaml, analyze_yaml_structure(parsed)
+
 async def validate_yaml(message: Message, yaml_text: str):
     """Валидация YAML"""
     try:
-        # Пытаемся распарсить YAML
-        parsed = yaml.safe_load(yaml_text)
-        
-        # Форматируем для красивого вывода
-        formatted_yaml = yaml.dump(parsed, default_flow_style=False, allow_unicode=True)
-        
-        # Получаем информацию о структуре
-        structure_info = analyze_yaml_structure(parsed)
+        # Разбор и форматирование YAML выполняются в пуле исполнителей
+        formatted_yaml, structure_info = await executor.run("data_validator", parse_yaml, yaml_text)
         
         # Отправляем результат
         await message.answer(
@@ -1,9 +1,13 @@
 from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+import asyncio
 import logging
 import html
 from messages import MENU_MSG, get_main_menu, get_back_menu
+from ai_service import async_ai_service, build_bug_report_prompt, build_improve_test_case_prompt, \
+    build_checklist_prompt
+from stream_renderer import TelegramStreamRenderer
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +46,15 @@ class DocsStates(StatesGroup):
 
 TEST_CASE_PRIORITIES = ['Критический', 'Высокий', 'Средний', 'Низкий']
 BUG_SEVERITIES = ["Blocker", "Critical", "Medium", "Minor", "Trivial"]
+AI_IMPROVE_BUTTON = "✨ Улучшить с AI"
+AI_JOB_PLACEHOLDERS = {
+    "tc": "✨ AI улучшает тест-кейс...",
+    "bug": "✨ AI улучшает баг-репорт...",
+    "cl": "✨ AI улучшает чек-лист...",
+}
+
+# Фоновые задачи AI: не больше одной на пользователя в чате
+_ai_jobs = {}
 
 
 async def docs_command(message: Message, state: FSMContext):
@@ -102,6 +115,62 @@ async def process_docs_type(message: Message, state: FSMContext):
         await message.answer("⚠ Пожалуйста, выбери вариант из списка")
 
 
+# ===== Улучшение документа с помощью AI =====
+
+def _ai_prompt(kind: str, data: dict) -> str:
+    """Промпт для AI по данным документа из FSM"""
+    if kind == "tc":
+        return build_improve_test_case_prompt({
+            'title': data.get("tc_title", ""),
+            'description': data.get("tc_description", ""),
+            'preconditions': data.get("tc_preconditions", ""),
+            'steps': data.get("tc_steps", []),
+            'expected_result': data.get("tc_expected_result", ""),
+            'priority': data.get("tc_priority", ""),
+        })
+    if kind == "bug":
+        return build_bug_report_prompt({
+            'title': data.get("bug_title", ""),
+            'description': data.get("bug_description", ""),
+            'steps': data.get("bug_steps", []),
+            'actual_result': data.get("bug_actual_result", ""),
+            'expected_result': data.get("bug_expected_result", ""),
+            'environment': data.get("bug_environment", ""),
+            'severity': data.get("bug_severity", ""),
+        })
+    return build_checklist_prompt({'title': data.get("cl_title", ""), 'items': data.get("cl_items", [])})
+
+
+async def start_ai_improvement(message: Message, state: FSMContext, kind: str):
+    """Запуск улучшения документа AI-моделью в фоновой задаче.
+
+    Обработчик сразу возвращается: состояние FSM не меняется, ответ
+    модели выводится в чат по мере генерации.
+    """
+    job_key = (message.chat.id, message.from_user.id if message.from_user else 0)
+    job = _ai_jobs.get(job_key)
+    if job is not None and not job.done():
+        await message.answer("⏳ AI ещё работает над предыдущим документом, подожди немного")
+        return
+
+    data = await state.get_data()
+    task = asyncio.create_task(_ai_improvement_job(message, _ai_prompt(kind, data), AI_JOB_PLACEHOLDERS[kind],
+                                                   job_key[1]))
+    _ai_jobs[job_key] = task
+    task.add_done_callback(lambda done: _ai_jobs.pop(job_key) if _ai_jobs.get(job_key) is done else None)
+
+
+async def _ai_improvement_job(message: Message, prompt: str, placeholder: str, user_id: int):
+    try:
+        renderer = TelegramStreamRenderer(message, placeholder=placeholder)
+        await renderer.render(async_ai_service.stream_text(prompt, user_id=user_id))
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"AI improvement error: {e}", exc_info=True)
+        await message.answer("❌ Не удалось улучшить документ с помощью AI")
+
+
 # ===== ТЕСТ-КЕЙС =====
 
 async def _start_test_case_flow(message: Message, state: FSMContext):
@@ -337,6 +406,7 @@ def generate_test_case_template(data: dict) -> str:
 async def ask_for_new_test_case(message: Message, state: FSMContext):
     keyboard = ReplyKeyboardMarkup(
         keyboard=[
+            [KeyboardButton(text=AI_IMPROVE_BUTTON)],
             [KeyboardButton(text="✨ Создать ещё тест-кейс")],
             [KeyboardButton(text="📝 Вернуться к выбору документа")],
             [KeyboardButton(text="Назад в меню")],
@@ -345,7 +415,7 @@ async def ask_for_new_test_case(message: Message, state: FSMContext):
     )
 
     await message.answer(
-        "Хочешь создать ещё один тест-кейс или выбрать другой тип документа?",
+        "Можно улучшить тест-кейс с помощью AI, создать ещё один или выбрать другой тип документа",
         reply_markup=keyboard,
     )
     await state.set_state(DocsStates.tc_waiting_for_choice)
@@ -356,7 +426,9 @@ async def tc_handle_choice(message: Message, state: FSMContext):
         await message.answer("❌ Пожалуйста, используй предложенные кнопки")
         return
 
-    if message.text == "✨ Создать ещё тест-кейс":
+    if message.text == AI_IMPROVE_BUTTON:
+        await start_ai_improvement(message, state, "tc")
+    elif message.text == "✨ Создать ещё тест-кейс":
         await _start_test_case_flow(message, state)
     elif message.text == "📝 Вернуться к выбору документа":
         await docs_command(message, state)
@@ -718,6 +790,7 @@ def generate_bug_report(data: dict) -> str:
 async def ask_for_new_bug_report(message: Message, state: FSMContext):
     keyboard = ReplyKeyboardMarkup(
         keyboard=[
+            [KeyboardButton(text=AI_IMPROVE_BUTTON)],
             [KeyboardButton(text="✨ Создать ещё баг-репорт")],
             [KeyboardButton(text="📝 Вернуться к выбору документа")],
             [KeyboardButton(text="Назад в меню")],
@@ -726,7 +799,7 @@ async def ask_for_new_bug_report(message: Message, state: FSMContext):
     )
 
     await message.answer(
-        "Хочешь создать ещё один баг-репорт или выбрать другой тип документа?",
+        "Можно улучшить баг-репорт с помощью AI, создать ещё один или выбрать другой тип документа",
         reply_markup=keyboard,
     )
     await state.set_state(DocsStates.bug_waiting_for_choice)
@@ -737,7 +810,9 @@ async def bug_handle_choice(message: Message, state: FSMContext):
         await message.answer("❌ Пожалуйста, используй предложенные кнопки")
         return
 
-    if message.text == "✨ Создать ещё баг-репорт":
+    if message.text == AI_IMPROVE_BUTTON:
+        await start_ai_improvement(message, state, "bug")
+    elif message.text == "✨ Создать ещё баг-репорт":
         await _start_bug_report_flow(message, state)
     elif message.text == "📝 Вернуться к выбору документа":
         await docs_command(message, state)
@@ -851,6 +926,7 @@ def generate_checklist_template(data: dict) -> str:
 async def ask_for_new_checklist(message: Message, state: FSMContext):
     keyboard = ReplyKeyboardMarkup(
         keyboard=[
+            [KeyboardButton(text=AI_IMPROVE_BUTTON)],
             [KeyboardButton(text="✨ Создать ещё чек-лист")],
             [KeyboardButton(text="📝 Вернуться к выбору документа")],
             [KeyboardButton(text="Назад в меню")],
@@ -859,7 +935,7 @@ async def ask_for_new_checklist(message: Message, state: FSMContext):
     )
 
     await message.answer(
-        "Хочешь создать ещё один чек-лист или выбрать другой тип документа?",
+        "Можно улучшить чек-лист с помощью AI, создать ещё один или выбрать другой тип документа",
         reply_markup=keyboard,
     )
     await state.set_state(DocsStates.cl_waiting_for_choice)
@@ -870,7 +946,9 @@ async def cl_handle_choice(message: Message, state: FSMContext):
         await message.answer("❌ Пожалуйста, используй предложенные кнопки")
         return
 
-    if message.text == "✨ Создать ещё чек-лист":
+    if message.text == AI_IMPROVE_BUTTON:
+        await start_ai_improvement(message, state, "cl")
+    elif message.text == "✨ Создать ещё чек-лист":
         await _start_checklist_flow(message, state)
     elif message.text == "📝 Вернуться к выбору документа":
         await docs_command(message, state)
@@ -1,15 +1,30 @@
 from aiogram.types import Message, BufferedInputFile, ReplyKeyboardMarkup, KeyboardButton, FSInputFile
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
+import asyncio
 import io
+import itertools
 import logging
 import re
 import zipfile
 import json
 import tempfile
 import os
+import shutil
+from functools import lru_cache
+from pathlib import Path
 from messages import MENU_MSG, get_back_menu, get_main_menu
+from config import Config
+from executor import executor
+from file_cache import file_id_cache, params_key
+from plugins.sized_files import write_sized_file, parse_size, format_size
+from plugins.font_registry import get_font, pdf_font_name
+from plugins.archive_engine import ARCHIVE_FORMATS, parse_archive_spec, write_archive
+from plugins.archive_formats import STORE, Rar5Writer
+from plugins.video_muxer import parse_video_params, write_video
+from plugins.batch_engine import BatchArchive, estimate_batch, parse_batch_spec
+from plugins.image_patterns import FLAT, PATTERN_FORMATS, encode_image, render_pattern, split_mode, write_pattern_file
 
 logger = logging.getLogger(__name__)
 
@@ -23,8 +38,43 @@ SUPPORTED_FORMATS = {
     'video': ['mp4', 'avi'],
     'other': ['pdf', 'svg']
 }
+IMAGE_FORMATS = ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'ico']
+# Форматы, содержимое которых зависит только от формата (и параметров изображения)
+FIXED_FORMATS = ['zip', 'rar']
+VIDEO_FORMATS = ['mp4', 'avi']
 DEFAULT_COLOR = (255, 255, 255)  # Белый
+# Файлы заданного размера: свободное место сверх размера файла и минимальная скорость загрузки
+DISK_RESERVE = 64 * 1024 * 1024
+UPLOAD_MIN_SPEED = 1024 * 1024  # байт/с
+# Пакетная генерация: сколько файлов матрицы генерируется одновременно (ограничивает память)
+BATCH_WINDOW = 8
+SIZE_HINT = ("📦 Или укажи размер файла, например <code>50MB</code> или <code>300KB</code> — "
+             "файл будет ровно такого размера\n\n")
 TEXT_COLOR = (0, 0, 0)  # Черный
+# Форматы файлов внутри генерируемых архивов
+ARCHIVE_ENTRY_FORMATS = IMAGE_FORMATS + ['svg', 'txt', 'css', 'html', 'js', 'json', 'pdf', 'docx', 'xlsx']
+ARCHIVE_ENTRY_IMAGE_SIZE = 200
+
+FORMAT_MAP = {
+    "JPG": "jpg", "JPEG": "jpg",
+    "PNG": "png",
+    "GIF": "gif",
+    "ICO": "ico",
+    "BMP": "bmp",
+    "SVG": "svg",
+    "TXT": "txt",
+    "CSS": "css",
+    "HTML": "html",
+    "JS": "js",
+    "JSON": "json",
+    "PDF": "pdf",
+    "DOCX": "docx",
+    "XLSX": "xlsx",
+    "ZIP": "zip",
+    "RAR": "rar",
+    "MP4": "mp4",
+    "AVI": "avi"
+}
 
 class FileGeneratorStates(StatesGroup):
     waiting_for_format = State()
@@ -48,7 +98,9 @@ async def generate_file_command(message: Message, state: FSMContext):
     )
     
     await message.answer(
-        "🗂 Выбери формат файла для создания 👇",
+        "🗂 Выбери формат файла для создания 👇\n\n"
+        "Можно сразу указать формат и размер, например <code>PDF 50MB</code>\n"
+        "Или несколько файлов одним архивом: <code>PNG,JPG,GIF 100,1000,5000 #FF0000,#00FF00</code>",
         reply_markup=format_keyboard
     )
 
@@ -62,32 +114,33 @@ async def process_format_choice(message: Message, state: FSMContext):
         await message.answer(MENU_MSG, reply_markup=get_main_menu())
         return
       
-    format_map = {
-        "JPG": "jpg", "JPEG": "jpg",
-        "PNG": "png",
-        "GIF": "gif",
-        "ICO": "ico",
-        "BMP": "bmp",
-        "SVG": "svg",
-        "TXT": "txt",
-        "CSS": "css",
-        "HTML": "html",
-        "JS": "js",
-        "JSON": "json",
-        "PDF": "pdf",
-        "DOCX": "docx",
-        "XLSX": "xlsx",
-        "ZIP": "zip",
-        "RAR": "rar",
-        "MP4": "mp4",
-        "AVI": "avi"
-    }
-    
-    if message.text not in format_map:
+    if message.text not in FORMAT_MAP:
+        # Пакет файлов одной строкой: "PNG,JPG,GIF 100,1000,5000 #FF0000"
+        try:
+            batch = parse_batch_spec(message.text, FORMAT_MAP, IMAGE_FORMATS + ['svg'], ARCHIVE_ENTRY_FORMATS,
+                                     MAX_IMAGE_SIZE)
+        except ValueError as e:
+            await message.answer(f"❌ Ошибка: {e}\nПопробуй еще раз")
+            return
+        if batch is not None:
+            await state.update_data(format='zip')
+            await state.set_state(FileGeneratorStates.waiting_for_params)
+            await process_batch_request(message, state, batch)
+            return
+        # Формат и размер одной строкой: "PDF 50MB", "PNG 20MB noise"
+        parts = message.text.split(maxsplit=1)
+        size_text, mode = split_mode(parts[1]) if len(parts) == 2 else ("", FLAT)
+        target_size = parse_size(size_text)
+        if parts and parts[0].upper() in FORMAT_MAP and target_size is not None:
+            file_format = FORMAT_MAP[parts[0].upper()]
+            await state.update_data(format=file_format)
+            await state.set_state(FileGeneratorStates.waiting_for_params)
+            await process_sized_request(message, state, file_format, target_size, mode)
+            return
         await message.answer("ℹ️ Выбери формат из предложенных вариантов")
         return
     
-    selected_format = format_map[message.text]
+    selected_format = FORMAT_MAP[message.text]
     await state.update_data(format=selected_format)
     await send_params_prompt(message, state)
 
@@ -102,10 +155,15 @@ async def send_params_prompt(message: Message, state: FSMContext):
             "Введи параметры изображения:\n"
             "• <code>размер</code> - для квадратного изображения\n"
             "• <code>ширина высота</code> - для прямоугольного\n"
-            "• Можно добавить цвет в формате #RRGGBB\n\n"
+            "• Можно добавить цвет в формате #RRGGBB\n"
+            "• Можно добавить содержимое: <code>noise</code> (шум), <code>gradient</code>, "
+            "<code>checker</code> (шахматка), <code>perlin</code> (как фото)\n\n"
             "Примеры:\n"
             f"<code>500</code> - квадрат 500x500\n"
-            f"<code>800 600 #FF0000</code> - красный прямоугольник\n\n"
+            f"<code>800 600 #FF0000</code> - красный прямоугольник\n"
+            f"<code>2000 1000 noise</code> - несжимаемый шум\n\n"
+            f"{SIZE_HINT}"
+            "Размер тоже можно с содержимым: <code>20MB noise</code>\n\n"
             "Введи нужные параметры в чат 👇",
             parse_mode="HTML",
             reply_markup=ReplyKeyboardMarkup(
@@ -123,6 +181,7 @@ async def send_params_prompt(message: Message, state: FSMContext):
             "Введи содержимое файла:\n\n"
             f"Пример для {selected_format.upper()}:\n"
             f"<code>{get_text_file_example(selected_format)}</code>\n\n"
+            f"{SIZE_HINT}"
             "Введи содержимое файла в чат 👇",
             parse_mode="HTML",
             reply_markup=ReplyKeyboardMarkup(
@@ -138,6 +197,7 @@ async def send_params_prompt(message: Message, state: FSMContext):
         await message.answer(
             f"📄 <b>{selected_format.upper()}</b> формат (офисный документ)\n\n"
             "Введи текст для документа (будет создан простой документ с этим текстом):\n\n"
+            f"{SIZE_HINT}"
             "Введи текст в чат 👇",
             parse_mode="HTML",
             reply_markup=ReplyKeyboardMarkup(
@@ -152,7 +212,19 @@ async def send_params_prompt(message: Message, state: FSMContext):
         # Архивы
         await message.answer(
             f"📦 <b>{selected_format.upper()}</b> формат (архив)\n\n"
-            "Будет создан пустой архив. Введи любое сообщение для продолжения:\n\n"
+            "Параметры архива (любые, через пробел):\n"
+            "• <code>files=1000</code> — количество файлов\n"
+            "• <code>depth=5</code> — вложенность каталогов\n"
+            "• <code>nested=3</code> — архив в архиве\n"
+            + ("• <code>method=mixed</code> — сжатие: store, deflate, bzip2, lzma, mixed\n"
+               "• <code>bomb=1GB</code> — запись из нулей (сжатие ~1000:1)\n"
+               "• <code>zip64</code> — формат zip64\n" if selected_format == 'zip' else
+               "• RAR создается без сжатия (store)\n")
+            + "• <code>types=txt,png,pdf</code> — форматы файлов\n"
+            "• <code>size=10KB</code> — размер каждого файла\n\n"
+            "Например: <code>files=500 depth=3 types=txt,png,pdf</code>\n"
+            "Любое другое сообщение — простой архив с одним файлом\n\n"
+            f"{SIZE_HINT}"
             "Введи любое сообщение в чат 👇",
             parse_mode="HTML",
             reply_markup=ReplyKeyboardMarkup(
@@ -167,7 +239,13 @@ async def send_params_prompt(message: Message, state: FSMContext):
         # Видео
         await message.answer(
             f"🎬 <b>{selected_format.upper()}</b> формат (видео)\n\n"
-            "Будет создан минимальный видео файл. Введи любое сообщение для продолжения:\n\n"
+            "Будет создано видео MJPEG с таймером. Параметры (любые, через пробел):\n"
+            "• длительность: <code>10s</code>, <code>2 мин</code> или <code>1:30</code>\n"
+            "• частота кадров: <code>30fps</code>\n"
+            "• разрешение: <code>1280x720</code> или <code>720p</code>\n\n"
+            "Например: <code>30s 25fps 720p</code>\n"
+            "Сообщение без параметров — видео 5 секунд, 25 fps, 640x360\n\n"
+            f"{SIZE_HINT}"
             "Введи любое сообщение в чат 👇",
             parse_mode="HTML",
             reply_markup=ReplyKeyboardMarkup(
@@ -183,6 +261,7 @@ async def send_params_prompt(message: Message, state: FSMContext):
         await message.answer(
             f"📕 <b>PDF</b> формат (документ)\n\n"
             "Введи текст для PDF документа:\n\n"
+            f"{SIZE_HINT}"
             "Введи текст в чат 👇",
             parse_mode="HTML",
             reply_markup=ReplyKeyboardMarkup(
@@ -219,58 +298,64 @@ async def process_file_params(message: Message, state: FSMContext):
         await message.answer(MENU_MSG, reply_markup=get_main_menu())
         return
     
+    data = await state.get_data()
+    # Размер файла, у изображений - с режимом содержимого: "50MB noise"
+    size_text, mode = split_mode(message.text) if data['format'] in IMAGE_FORMATS else (message.text, FLAT)
+    target_size = parse_size(size_text)
+    if target_size is not None:
+        await process_sized_request(message, state, data['format'], target_size, mode)
+        return
+
     try:
-        data = await state.get_data()
         file_format = data['format']
-        file_content = None
-        filename = None
+        text = message.text
+        cache_key = None
+        method = None
+        
+        # Архив по параметрам (files=1000 depth=3 ...) собирается на диске
+        spec = parse_archive_spec(text, file_format, ARCHIVE_ENTRY_FORMATS) if file_format in ARCHIVE_FORMATS else None
+        if spec is not None:
+            await send_archive(message, spec)
+            await offer_another_file(message, state)
+            return
         
-        # Генерация файла в зависимости от формата
-        if file_format in ['jpg', 'jpeg', 'png', 'gif', 'ico', 'bmp']:
-            file_content, filename = await generate_image_file(message.text, file_format)
+        # Генератор файла в зависимости от формата: вызывается, только если файла нет в кэше file_id
+        if file_format in IMAGE_FORMATS:
+            width, height, color, mode = parse_image_params(text)
+            cache_key = params_key(file_format, width, height, color, mode)
+            produce = lambda: render_image_file(width, height, color, file_format, mode)
+            if mode != FLAT:
+                # Telegram пережимает фото: шум и узоры отправляются документом без изменений
+                method = 'document'
         elif file_format == 'svg':
-            file_content, filename = await generate_svg_file(message.text)
+            produce = lambda: generate_svg_file(text)
         elif file_format in ['txt', 'css', 'html', 'js']:
-            file_content, filename = await generate_text_file(message.text, file_format)
+            produce = lambda: generate_text_file(text, file_format)
         elif file_format == 'json':
-            file_content, filename = await generate_json_file(message.text)
+            produce = lambda: generate_json_file(text)
         elif file_format == 'pdf':
-            file_content, filename = await generate_pdf_file(message.text)
+            produce = lambda: generate_pdf_file(text)
         elif file_format == 'docx':
-            file_content, filename = await generate_docx_file(message.text)
+            produce = lambda: generate_docx_file(text)
         elif file_format == 'xlsx':
-            file_content, filename = await generate_xlsx_file(message.text)
+            produce = lambda: generate_xlsx_file(text)
         elif file_format == 'zip':
-            file_content, filename = await generate_zip_file()
+            produce = generate_zip_file
         elif file_format == 'rar':
-            file_content, filename = await generate_rar_file()
-        elif file_format in ['mp4', 'avi']:
-            file_content, filename = await generate_video_file(file_format)
+            produce = generate_rar_file
+        elif file_format in VIDEO_FORMATS:
+            await send_video(message, file_format, parse_video_params(text))
+            await offer_another_file(message, state)
+            return
         else:
             await message.answer(f"❌ Формат {file_format} пока не поддерживается")
             return
-        
-        if file_content is None:
-            await message.answer("❌ Ошибка при создании файла")
-            return
+        if file_format in FIXED_FORMATS:
+            cache_key = params_key(file_format)
         
         # Отправка файла
-        await send_file(message, file_content, filename, file_format)
-        
-        # Предложение создать ещё
-        keyboard = ReplyKeyboardMarkup(
-            keyboard=[
-                [KeyboardButton(text="✨ Создать ещё")],
-                [KeyboardButton(text="Назад в меню")]
-            ],
-            resize_keyboard=True
-        )
-        
-        await message.answer(
-            "Хочешь создать ещё один файл?",
-            reply_markup=keyboard
-        )
-        await state.set_state(FileGeneratorStates.waiting_for_choice)
+        await send_file(message, produce, file_format, cache_key, method)
+        await offer_another_file(message, state)
         
     except ValueError as e:
         await message.answer(f"❌ Ошибка: {e}\nПопробуй еще раз")
@@ -279,8 +364,175 @@ async def process_file_params(message: Message, state: FSMContext):
         await message.answer(f"⚠️ Ошибка при создании файла: {str(e)}")
         await state.clear()
 
+async def offer_another_file(message: Message, state: FSMContext):
+    """Предложение создать ещё"""
+    keyboard = ReplyKeyboardMarkup(
+        keyboard=[
+            [KeyboardButton(text="✨ Создать ещё")],
+            [KeyboardButton(text="Назад в меню")]
+        ],
+        resize_keyboard=True
+    )
+    
+    await message.answer(
+        "Хочешь создать ещё один файл?",
+        reply_markup=keyboard
+    )
+    await state.set_state(FileGeneratorStates.waiting_for_choice)
+
+async def process_sized_request(message: Message, state: FSMContext, file_format: str, target_size: int,
+                                mode: str = FLAT):
+    try:
+        await send_sized_file(message, file_format, target_size, mode)
+        await offer_another_file(message, state)
+    except ValueError as e:
+        await message.answer(f"❌ Ошибка: {e}\nПопробуй еще раз")
+    except Exception as e:
+        logger.error(f"Sized file generation error: {e}", exc_info=True)
+        await message.answer(f"⚠️ Ошибка при создании файла: {str(e)}")
+        await state.clear()
+
+async def send_sized_file(message: Message, file_format: str, target_size: int, mode: str = FLAT):
+    """Файл заданного размера: пишется потоком во временный файл и загружается с диска.
+
+    Изображение с режимом содержимого (шум, градиент...) кодируется один раз
+    с подобранным разрешением, остаток добирается так же, как у заливки.
+    """
+    check_upload_size(target_size)
+    if mode != FLAT and file_format not in PATTERN_FORMATS:
+        raise ValueError(f"режим {mode} для файла заданного размера: {', '.join(PATTERN_FORMATS).upper()}")
+    if mode == FLAT:
+        filename = f"file_{format_size(target_size)}.{file_format}"
+        writer_args = (write_sized_file, file_format, target_size)
+    else:
+        filename = f"file_{format_size(target_size)}_{mode}.{file_format}"
+        writer_args = (write_pattern_file, file_format, mode, target_size, DEFAULT_COLOR)
+    await send_disk_file(message, file_format, filename, params_key(file_format, "size", target_size, mode),
+                         target_size, f"⏳ Создаю {filename} ({target_size} байт)...", *writer_args)
+
+async def send_archive(message: Message, spec):
+    """Архив по параметрам: собирается на диске и загружается с диска"""
+    if spec.size is not None and spec.method == STORE:
+        # Файлы заданного размера без сжатия: размер архива известен заранее
+        check_upload_size(spec.estimate())
+    await send_disk_file(message, spec.format_type, f"archive.{spec.format_type}",
+                         params_key(spec.format_type, "archive", *spec.key()), spec.estimate(),
+                         f"⏳ Создаю архив: {spec.describe()}...",
+                         write_archive, spec, render_archive_entry)
+
+async def send_video(message: Message, file_format: str, params):
+    """Видео по параметрам: кадры пишутся на диск по мере отрисовки"""
+    await send_disk_file(message, file_format, f"video_{params.width}x{params.height}.{file_format}",
+                         params_key(file_format, "video", *params.key()), params.estimate(),
+                         f"⏳ Создаю видео: {params.describe()}...",
+                         write_video, file_format, params)
+
+async def process_batch_request(message: Message, state: FSMContext, spec):
+    try:
+        await send_batch(message, spec)
+        await offer_another_file(message, state)
+    except ValueError as e:
+        await message.answer(f"❌ Ошибка: {e}\nПопробуй еще раз")
+    except Exception as e:
+        logger.error(f"Batch file generation error: {e}", exc_info=True)
+        await message.answer(f"⚠️ Ошибка при создании файлов: {str(e)}")
+        await state.clear()
+
+async def send_batch(message: Message, spec):
+    """Матрица файлов одним ZIP-архивом с манифестом"""
+    items = spec.items(IMAGE_FORMATS + ['svg'])
+    # Файлы точного размера хранятся без сжатия: архив не меньше их суммы
+    check_upload_size(sum(item.size for item in items if item.size is not None))
+    await send_disk_file(message, 'zip', "batch.zip", params_key('zip', "batch", *spec.key()),
+                         estimate_batch(items), f"⏳ Создаю {len(items)} файлов: {spec.describe()}...",
+                         build_batch, items)
+
+async def render_batch_entry(index: int, item, work_dir: str):
+    """Файл матрицы: байты или путь к файлу на диске (для файлов заданного размера)"""
+    if item.size is not None:
+        path = Path(work_dir) / f"entry_{index}.{item.format_type}"
+        await executor.run("file_generator", write_sized_file, item.format_type, item.size, str(path))
+        return item, path
+    if item.format_type == 'svg' and item.width:
+        color = "#" + "".join(f"{channel:02x}" for channel in item.color or DEFAULT_COLOR)
+        return item, render_svg(f"{item.width} {item.height} {color}")[0]
+    if item.width:
+        data, _ = await executor.run("file_generator", render_image, item.width, item.height,
+                                     item.color or DEFAULT_COLOR, item.format_type, use_process=True)
+        return item, data
+    return item, await executor.run("file_generator", render_archive_entry, item.format_type, 0)
+
+async def build_batch(items, path: str):
+    """Генерация файлов матрицы в пуле и запись в ZIP по мере готовности.
+
+    Одновременно генерируется не больше ``BATCH_WINDOW`` файлов, готовые
+    дописываются в архив по одному (в порядке готовности).
+    """
+    work_dir = str(Path(path).parent)
+    queue = iter(enumerate(items))
+    pending = set()
+    archive = BatchArchive(path)
+    try:
+        while True:
+            for index, item in itertools.islice(queue, BATCH_WINDOW - len(pending)):
+                pending.add(asyncio.ensure_future(render_batch_entry(index, item, work_dir)))
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                item, content = task.result()
+                if isinstance(content, Path):
+                    await executor.run("file_generator", archive.add_path, item, str(content))
+                    content.unlink()
+                else:
+                    await executor.run("file_generator", archive.add, item, len(content), [content])
+        await executor.run("file_generator", archive.close, items)
+    except BaseException:
+        for task in pending:
+            task.cancel()
+        archive.abort()
+        raise
+
+def check_upload_size(size: int):
+    limit = Config.FILE_UPLOAD_LIMIT
+    if size > limit:
+        hint = "" if Config.BOT_API_SERVER else " (до 2000MB — с локальным Bot API сервером, BOT_API_SERVER)"
+        raise ValueError(f"максимальный размер файла — {format_size(limit)}{hint}")
+
+async def send_disk_file(message: Message, file_format: str, filename: str, cache_key: str, expected_size: int,
+                         status: str, writer, *args):
+    """Файл пишется ``writer(*args, path)`` во временный каталог и загружается с диска.
+
+    Синхронный ``writer`` выполняется в пуле исполнителей, асинхронный
+    (сам распределяет работу по пулу) - в event loop.
+    """
+    tmp_dir = tempfile.mkdtemp(prefix="gen-", dir=Config.FILE_TMP_DIR)
+    try:
+        async def produce():
+            if shutil.disk_usage(tmp_dir).free < expected_size + DISK_RESERVE:
+                raise ValueError("недостаточно места на диске для файла такого размера")
+            await message.answer(status)
+            path = Path(tmp_dir) / filename
+            if asyncio.iscoroutinefunction(writer):
+                await writer(*args, str(path))
+            else:
+                await executor.run("file_generator", writer, *args, str(path))
+            check_upload_size(path.stat().st_size)
+            return path, filename
+
+        await send_file(message, produce, file_format, cache_key,
+                        method='document', request_timeout=60 + expected_size / UPLOAD_MIN_SPEED)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
 async def generate_image_file(params_text: str, format_type: str):
     """Генерация изображения"""
+    width, height, color, mode = parse_image_params(params_text)
+    return await render_image_file(width, height, color, format_type, mode)
+
+def parse_image_params(params_text: str):
+    """Ширина, высота, цвет и режим содержимого изображения из текста пользователя"""
+    params_text, mode = split_mode(params_text)
     parts = params_text.split()
     
     # Парсинг параметров (аналогично image_generator)
@@ -320,15 +572,27 @@ async def generate_image_file(params_text: str, format_type: str):
         raise ValueError("Размеры должны быть положительными числами")
     if width > MAX_IMAGE_SIZE or height > MAX_IMAGE_SIZE:
         raise ValueError(f"Максимальный размер: {MAX_IMAGE_SIZE}px")
-    
+    return width, height, color, mode
+
+async def render_image_file(width: int, height: int, color: tuple, format_type: str, mode: str = FLAT):
+    # Отрисовка выполняется в пуле, чтобы не блокировать event loop
+    content, filename = await executor.run("file_generator", render_image, width, height, color, format_type, mode,
+                                           use_process=True)
+    # Шум и несжатые форматы (BMP) большого разрешения могут превысить лимит загрузки
+    check_upload_size(len(content))
+    return content, filename
+
+def render_image(width: int, height: int, color: tuple, format_type: str, mode: str = FLAT):
+    """Отрисовка изображения (синхронно, выполняется в пуле исполнителей)"""
+    if mode != FLAT:
+        # Шум, градиент, шахматка, фото-подобный шум - массивы NumPy
+        content = encode_image(render_pattern(mode, width, height, color), format_type, mode)
+        return content, f"image_{width}x{height}_{mode}.{format_type}"
+
     # Создание изображения
     img = Image.new('RGB', (width, height), color=color)
     d = ImageDraw.Draw(img)
-    
-    try:
-        font = ImageFont.truetype("arial.ttf", size=min(width, height)//10)
-    except (OSError, IOError):
-        font = ImageFont.load_default()
+    font = get_font(min(width, height)//10)
     
     text = f"{width}x{height}\n.{format_type}"
     text_bbox = d.textbbox((0, 0), text, font=font)
@@ -336,28 +600,16 @@ async def generate_image_file(params_text: str, format_type: str):
     y = (height - (text_bbox[3] - text_bbox[1])) / 2
     d.text((x, y), text, font=font, fill=TEXT_COLOR)
     
-    # Сохранение в BytesIO
-    img_byte_arr = io.BytesIO()
-    save_format = format_type.upper() if format_type != 'jpg' else 'JPEG'
-    if format_type == 'ico':
-        # ICO требует специальной обработки - сохраняем как PNG
-        # (настоящий ICO требует специальной библиотеки, но PNG с расширением .ico будет работать)
-        img.save(img_byte_arr, format='PNG')
-        img_byte_arr.seek(0)
-        return img_byte_arr.getvalue(), f"image_{width}x{height}.ico"
-    elif format_type == 'gif':
-        # GIF требует режим 'P' для палитры
-        img_p = img.convert('P')
-        img_p.save(img_byte_arr, format='GIF')
-        img_byte_arr.seek(0)
-        return img_byte_arr.getvalue(), f"image_{width}x{height}.gif"
-    else:
-        img.save(img_byte_arr, format=save_format)
-        img_byte_arr.seek(0)
-        return img_byte_arr.getvalue(), f"image_{width}x{height}.{format_type}"
+    # ICO сохраняется как PNG (настоящий ICO требует специальной библиотеки,
+    # но PNG с расширением .ico будет работать), GIF - в режиме палитры
+    return encode_image(img, format_type), f"image_{width}x{height}.{format_type}"
 
 async def generate_svg_file(params_text: str):
     """Генерация SVG файла"""
+    return render_svg(params_text)
+
+def render_svg(params_text: str):
+    """Сборка SVG (синхронно)"""
     parts = params_text.split()
     
     if len(parts) == 1:
@@ -390,6 +642,10 @@ async def generate_svg_file(params_text: str):
 
 async def generate_text_file(content: str, format_type: str):
     """Генерация текстового файла"""
+    return render_text(content, format_type)
+
+def render_text(content: str, format_type: str):
+    """Сборка текстового файла (синхронно)"""
     # Для HTML добавляем базовую структуру если её нет
     if format_type == 'html':
         # Проверяем, есть ли уже полная HTML структура
@@ -423,6 +679,10 @@ async def generate_text_file(content: str, format_type: str):
 
 async def generate_json_file(content: str):
     """Генерация JSON файла"""
+    return render_json(content)
+
+def render_json(content: str):
+    """Сборка JSON файла (синхронно)"""
     try:
         # Попытка распарсить как JSON
         json_obj = json.loads(content)
@@ -436,138 +696,123 @@ async def generate_json_file(content: str):
 async def generate_pdf_file(content: str):
     """Генерация PDF файла с поддержкой русского языка"""
     try:
-        from reportlab.lib.pagesizes import A4
-        from reportlab.pdfgen import canvas
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
-        from reportlab.lib.units import mm
-        
-        buffer = io.BytesIO()
-        p = canvas.Canvas(buffer, pagesize=A4)
-        width, height = A4
-        
-        # Пытаемся использовать встроенный шрифт с поддержкой кириллицы
-        # DejaVu Sans поддерживает кириллицу, но может быть не установлен
-        try:
-            # Пробуем найти системный шрифт с поддержкой кириллицы
-            font_paths = [
-                '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
-                '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
-                '/System/Library/Fonts/Helvetica.ttc',
-                '/usr/share/fonts/truetype/noto/NotoSans-Regular.ttf',
-            ]
-            
-            font_registered = False
-            for font_path in font_paths:
-                try:
-                    if os.path.exists(font_path):
-                        pdfmetrics.registerFont(TTFont('CyrillicFont', font_path))
-                        font_name = 'CyrillicFont'
-                        font_registered = True
-                        break
-                except Exception:
-                    continue
-            
-            if not font_registered:
-                # Используем встроенный шрифт (может не поддерживать кириллицу полностью)
-                font_name = 'Helvetica'
-        except Exception:
-            font_name = 'Helvetica'
-        
-        # Разбиваем текст на строки
-        lines = content.split('\n')
-        y_position = height - 30 * mm
-        line_height = 6 * mm
-        font_size = 12
-        
-        p.setFont(font_name, font_size)
-        
-        for line in lines[:100]:  # Ограничение количества строк
-            if y_position < 30 * mm:
-                p.showPage()
-                y_position = height - 30 * mm
-                p.setFont(font_name, font_size)
-            
-            # Обрезаем строку если слишком длинная (примерно 80 символов для A4)
-            if len(line) > 80:
-                # Разбиваем длинные строки
-                words = line.split()
-                current_line = ""
-                for word in words:
-                    if len(current_line + word) < 80:
-                        current_line += word + " "
-                    else:
-                        if current_line:
-                            p.drawString(20 * mm, y_position, current_line.strip())
-                            y_position -= line_height
-                            if y_position < 30 * mm:
-                                p.showPage()
-                                y_position = height - 30 * mm
-                                p.setFont(font_name, font_size)
-                        current_line = word + " "
-                if current_line:
-                    p.drawString(20 * mm, y_position, current_line.strip())
-                    y_position -= line_height
-            else:
-                p.drawString(20 * mm, y_position, line)
-                y_position -= line_height
-        
-        p.save()
-        buffer.seek(0)
-        return buffer.getvalue(), "file.pdf"
+        return await executor.run("file_generator", render_pdf, content, use_process=True)
     except ImportError:
         raise ValueError("Библиотека reportlab не установлена. Установите: pip install reportlab")
     except Exception as e:
         logger.error(f"PDF generation error: {e}", exc_info=True)
         raise ValueError(f"Ошибка при создании PDF: {str(e)}")
 
+def render_pdf(content: str):
+    """Отрисовка PDF (синхронно, выполняется в пуле исполнителей)"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.units import mm
+    
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    
+    # Шрифт с кириллицей (регистрируется в reportlab один раз на процесс)
+    font_name = pdf_font_name()
+    
+    # Разбиваем текст на строки
+    lines = content.split('\n')
+    y_position = height - 30 * mm
+    line_height = 6 * mm
+    font_size = 12
+    
+    p.setFont(font_name, font_size)
+    
+    for line in lines[:100]:  # Ограничение количества строк
+        if y_position < 30 * mm:
+            p.showPage()
+            y_position = height - 30 * mm
+            p.setFont(font_name, font_size)
+        
+        # Обрезаем строку если слишком длинная (примерно 80 символов для A4)
+        if len(line) > 80:
+            # Разбиваем длинные строки
+            words = line.split()
+            current_line = ""
+            for word in words:
+                if len(current_line + word) < 80:
+                    current_line += word + " "
+                else:
+                    if current_line:
+                        p.drawString(20 * mm, y_position, current_line.strip())
+                        y_position -= line_height
+                        if y_position < 30 * mm:
+                            p.showPage()
+                            y_position = height - 30 * mm
+                            p.setFont(font_name, font_size)
+                    current_line = word + " "
+            if current_line:
+                p.drawString(20 * mm, y_position, current_line.strip())
+                y_position -= line_height
+        else:
+            p.drawString(20 * mm, y_position, line)
+            y_position -= line_height
+    
+    p.save()
+    buffer.seek(0)
+    return buffer.getvalue(), "file.pdf"
+
 async def generate_docx_file(content: str):
     """Генерация DOCX файла"""
     try:
-        from docx import Document
-        
-        doc = Document()
-        
-        # Разбиваем текст на параграфы
-        paragraphs = content.split('\n')
-        for para in paragraphs:
-            if para.strip():
-                doc.add_paragraph(para.strip())
-        
-        buffer = io.BytesIO()
-        doc.save(buffer)
-        buffer.seek(0)
-        return buffer.getvalue(), "file.docx"
+        return await executor.run("file_generator", render_docx, content)
     except ImportError:
         raise ValueError("Библиотека python-docx не установлена. Установите: pip install python-docx")
     except Exception as e:
         logger.error(f"DOCX generation error: {e}", exc_info=True)
         raise ValueError(f"Ошибка при создании DOCX: {str(e)}")
 
+def render_docx(content: str):
+    """Сборка DOCX (синхронно, выполняется в пуле исполнителей)"""
+    from docx import Document
+    
+    doc = Document()
+    
+    # Разбиваем текст на параграфы
+    paragraphs = content.split('\n')
+    for para in paragraphs:
+        if para.strip():
+            doc.add_paragraph(para.strip())
+    
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    buffer.seek(0)
+    return buffer.getvalue(), "file.docx"
+
 async def generate_xlsx_file(content: str):
     """Генерация XLSX файла"""
     try:
-        from openpyxl import Workbook
-        
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Sheet1"
-        
-        # Разбиваем текст на строки и добавляем в ячейки
-        lines = content.split('\n')
-        for idx, line in enumerate(lines[:1000], start=1):  # Ограничение 1000 строк
-            ws[f'A{idx}'] = line[:32767]  # Максимальная длина ячейки Excel
-        
-        buffer = io.BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        return buffer.getvalue(), "file.xlsx"
+        return await executor.run("file_generator", render_xlsx, content)
     except ImportError:
         raise ValueError("Библиотека openpyxl не установлена. Установите: pip install openpyxl")
     except Exception as e:
         logger.error(f"XLSX generation error: {e}", exc_info=True)
         raise ValueError(f"Ошибка при создании XLSX: {str(e)}")
 
+def render_xlsx(content: str):
+    """Сборка XLSX (синхронно, выполняется в пуле исполнителей)"""
+    from openpyxl import Workbook
+    
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Sheet1"
+    
+    # Разбиваем текст на строки и добавляем в ячейки
+    lines = content.split('\n')
+    for idx, line in enumerate(lines[:1000], start=1):  # Ограничение 1000 строк
+        ws[f'A{idx}'] = line[:32767]  # Максимальная длина ячейки Excel
+    
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    return buffer.getvalue(), "file.xlsx"
+
 async def generate_zip_file():
     """Генерация ZIP архива"""
     buffer = io.BytesIO()
@@ -577,78 +822,66 @@ async def generate_zip_file():
     return buffer.getvalue(), "archive.zip"
 
 async def generate_rar_file():
-    """Генерация RAR архива (заглушка - создает ZIP с расширением .rar)"""
-    # RAR требует специальной библиотеки, создаем ZIP с расширением .rar
-    # В реальности это не настоящий RAR, но файл будет создан
+    """Генерация RAR архива (RAR5, файлы хранятся без сжатия)"""
     buffer = io.BytesIO()
-    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        zip_file.writestr("readme.txt", "Это архив (формат RAR не полностью поддерживается)")
-    buffer.seek(0)
+    data = "Это архив RAR".encode('utf-8')
+    writer = Rar5Writer(buffer)
+    writer.add_file("readme.txt", len(data), [data])
+    writer.close()
     return buffer.getvalue(), "archive.rar"
 
-async def generate_video_file(format_type: str):
-    """Генерация минимального видео файла"""
-    # Создаем минимальные валидные заголовки для видео файлов
-    # Эти файлы будут иметь правильную структуру, но не будут воспроизводиться
-    
-    if format_type == 'mp4':
-        # Минимальный MP4 файл (ftyp box)
-        # Это минимальный валидный MP4 файл с базовой структурой
-        mp4_header = (
-            b'\x00\x00\x00\x20'  # Box size (32 bytes)
-            b'ftyp'              # Box type: ftyp
-            b'isom'              # Major brand: ISO Media
-            b'\x00\x00\x02\x00'  # Minor version
-            b'isom'              # Compatible brand
-            b'iso2'              # Compatible brand
-            b'mp41'              # Compatible brand
-        )
-        return mp4_header, "video.mp4"
-        
-    elif format_type == 'avi':
-        # Минимальный AVI файл (RIFF заголовок)
-        # Это минимальный валидный AVI файл
-        avi_header = (
-            b'RIFF'              # RIFF signature
-            b'\x00\x00\x00\x00'  # File size (will be calculated)
-            b'AVI '             # AVI signature
-            b'LIST'             # LIST chunk
-            b'\x00\x00\x00\x00' # Chunk size
-            b'hdrl'             # hdrl list
-            b'avih'             # avih chunk
-            b'\x38\x00\x00\x00' # Chunk size (56 bytes)
-            b'\x00\x00\x00\x00' * 14  # AVI header data (zeros for minimal file)
-        )
-        return avi_header, "video.avi"
-    else:
-        minimal_content = b''
-    
-    return minimal_content, f"video.{format_type}"
+def render_archive_entry(format_type: str, index: int) -> bytes:
+    """Содержимое файла внутри архива - теми же генераторами, что и отдельные файлы (синхронно)"""
+    if format_type in ['txt', 'css', 'html', 'js']:
+        return render_text(f"{get_text_file_example(format_type)}\n\nФайл {index + 1}\n", format_type)[0]
+    if format_type == 'json':
+        return render_json(json.dumps({"file": index + 1, "name": "test"}))[0]
+    return _archive_sample(format_type)
 
-async def send_file(message: Message, file_content: bytes, filename: str, file_format: str):
-    """Отправка файла пользователю"""
-    try:
+@lru_cache(maxsize=16)
+def _archive_sample(format_type: str) -> bytes:
+    """Изображения и документы отрисовываются один раз на формат"""
+    size = ARCHIVE_ENTRY_IMAGE_SIZE
+    if format_type in IMAGE_FORMATS:
+        return render_image(size, size, DEFAULT_COLOR, format_type)[0]
+    if format_type == 'svg':
+        return render_svg(str(size))[0]
+    content = get_text_file_example('txt')
+    if format_type == 'pdf':
+        return render_pdf(content)[0]
+    if format_type == 'docx':
+        return render_docx(content)[0]
+    if format_type == 'xlsx':
+        return render_xlsx(content)[0]
+    raise ValueError(f"Формат {format_type} нельзя положить в архив")
+
+async def send_file(message: Message, produce, file_format: str, cache_key: str = None,
+                    method: str = None, request_timeout: float = None):
+    """Отправка файла пользователю.
+
+    ``produce`` возвращает (содержимое, имя файла); содержимое - байты или
+    путь к файлу на диске. Файл, который бот уже отправлял, повторно не
+    загружается: используется сохраненный file_id (по ``cache_key`` - даже
+    без генерации).
+    """
+    # Изображения отправляем как фото, все остальные файлы - как документы
+    method = method or ('photo' if file_format in IMAGE_FORMATS else 'document')
+    caption = lambda filename: f"✅ Готово! {filename}"
+    if file_id_cache is not None:
+        await file_id_cache.send(message, method, produce, key=cache_key, caption=caption,
+                                 request_timeout=request_timeout)
+        return
+
+    file_content, filename = await produce()
+    if isinstance(file_content, Path):
+        file_input = FSInputFile(file_content, filename=filename)
+    else:
         # Убеждаемся, что file_content это bytes
         if isinstance(file_content, str):
             file_content = file_content.encode('utf-8')
-        
         file_input = BufferedInputFile(file=file_content, filename=filename)
-        
-        # Определяем метод отправки в зависимости от типа файла
-        if file_format in ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'ico']:
-            await message.answer_photo(
-                photo=file_input,
-                caption=f"✅ Готово! {filename}"
-            )
-        else:
-            # Все остальные файлы отправляем как документы
-            await message.answer_document(
-                document=file_input,
-                caption=f"✅ Готово! {filename}"
-            )
-    except Exception as e:
-        logger.error(f"Error sending file: {e}", exc_info=True)
-        raise
+    request = getattr(message, f"answer_{method}")(file_input, caption=caption(filename))
+    await (request if request_timeout is None else message.bot(request, request_timeout=request_timeout))
 
 async def handle_choice(message: Message, state: FSMContext):
     if not message.text:
@@ -0,0 +1,109 @@
+"""Реестр шрифтов для отрисовки изображений и PDF.
+
+Путь к шрифту определяется один раз на процесс: ``FONT_PATH`` из
+конфигурации, затем файлы из каталога ``fonts/`` проекта (в комплекте
+DejaVu Sans), затем системные шрифты. Предпочтение отдается шрифтам с
+кириллицей (проверяется наличие глифа). Загруженные ``FreeTypeFont``
+хранятся в LRU по размеру, шрифт для reportlab регистрируется один раз.
+Без подходящего TTF используется встроенный шрифт Pillow (без кириллицы)
+и Helvetica в PDF.
+"""
+import logging
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+from PIL import ImageFont
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+FONTS_DIR = Path(__file__).resolve().parent.parent / "fonts"
+FONT_EXTENSIONS = ('.ttf', '.otf', '.ttc')
+SYSTEM_FONTS = (
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/TTF/DejaVuSans.ttf',
+    '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
+    '/usr/share/fonts/liberation-sans/LiberationSans-Regular.ttf',
+    '/usr/share/fonts/truetype/noto/NotoSans-Regular.ttf',
+    '/usr/share/fonts/noto/NotoSans-Regular.ttf',
+    '/System/Library/Fonts/Supplemental/Arial.ttf',
+    '/Library/Fonts/Arial.ttf',
+    'C:/Windows/Fonts/arial.ttf',
+    'arial.ttf',
+)
+CYRILLIC_PROBE = 'Ж'
+NOTDEF_PROBE = '\U0010FFFF'     # символ, которого нет ни в одном шрифте
+PDF_FONT_NAME = 'CyrillicFont'
+PDF_FALLBACK_FONT = 'Helvetica'
+
+
+def _candidates():
+    if Config.FONT_PATH:
+        yield Config.FONT_PATH
+    if FONTS_DIR.is_dir():
+        for path in sorted(FONTS_DIR.iterdir()):
+            if path.suffix.lower() in FONT_EXTENSIONS:
+                yield str(path)
+    yield from SYSTEM_FONTS
+
+
+def _covers_cyrillic(font: ImageFont.FreeTypeFont) -> bool:
+    # Для отсутствующего символа рисуется глиф .notdef
+    return bytes(font.getmask(CYRILLIC_PROBE)) != bytes(font.getmask(NOTDEF_PROBE))
+
+
+@lru_cache(maxsize=1)
+def font_path() -> Optional[str]:
+    """Путь к шрифту (с кириллицей, если такой найден) или None"""
+    fallback = None
+    for path in _candidates():
+        try:
+            font = ImageFont.truetype(path, size=24)
+        except OSError:
+            continue
+        if _covers_cyrillic(font):
+            logger.info(f"Шрифт для генерации файлов: {path}")
+            return path
+        fallback = fallback or path
+    if fallback:
+        logger.warning(f"Шрифт с кириллицей не найден, используется {fallback} "
+                       f"(положи TTF в {FONTS_DIR} или укажи FONT_PATH)")
+    else:
+        logger.warning(f"TTF шрифты не найдены, используется встроенный шрифт Pillow "
+                       f"(положи TTF в {FONTS_DIR} или укажи FONT_PATH)")
+    return fallback
+
+
+@lru_cache(maxsize=Config.FONT_CACHE_SIZE)
+def _load_font(size: int, thread_id: int) -> ImageFont.FreeTypeFont:
+    path = font_path()
+    if path is None:
+        return ImageFont.load_default(size=size)
+    return ImageFont.truetype(path, size=size)
+
+
+def get_font(size: int) -> ImageFont.FreeTypeFont:
+    """Шрифт заданного размера из LRU.
+
+    FreeType-объект не рассчитан на одновременную отрисовку из нескольких
+    потоков, поэтому в пуле потоков у каждого потока свои экземпляры.
+    """
+    return _load_font(max(1, int(size)), threading.get_ident())
+
+
+@lru_cache(maxsize=1)
+def pdf_font_name() -> str:
+    """Имя шрифта reportlab (TTF регистрируется один раз на процесс)"""
+    path = font_path()
+    if path is None:
+        return PDF_FALLBACK_FONT
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    try:
+        pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, path))
+    except Exception as e:
+        logger.warning(f"Не удалось зарегистрировать шрифт {path} в reportlab: {e}")
+        return PDF_FALLBACK_FONT
+    return PDF_FONT_NAME
@@ -0,0 +1,194 @@
+"""Содержимое изображений: заливка, шум, градиент, шахматка, фото-подобный шум.
+
+Заливка (``Image.new``) сжимается почти до нуля и не годится для
+проверки скорости загрузки и сжатия. Остальные режимы строятся
+векторно в NumPy и оборачиваются в изображение без копирования
+(``Image.frombuffer``):
+
+* ``noise`` - случайные байты, не сжимаются (PNG сохраняется без сжатия);
+* ``gradient`` - диагональный переход от цвета к противоположному;
+* ``checker`` - шахматная доска из цвета и противоположного ему;
+* ``perlin`` - фрактальный шум в духе Перлина (октавы случайных решеток,
+  увеличенных бикубически, плюс зерно): плавные пятна, которые сжимаются
+  примерно как фотография.
+
+Цвет задает палитру (кроме шума). Генератор случайных чисел с
+фиксированным seed: одинаковые параметры дают одинаковые байты.
+
+Файл заданного размера кодируется один раз: число пикселей оценивается по
+сжатию образца 256x256 того же режима, а остаток добирается средствами
+формата (``sized_files``).
+"""
+import io
+import math
+from typing import Tuple
+import numpy as np
+from PIL import Image
+from plugins.sized_files import TargetTooSmall, WRITERS as SIZED_WRITERS, SIZE_TOLERANCE
+
+FLAT = 'flat'
+MODES = {
+    'flat': FLAT, 'заливка': FLAT,
+    'noise': 'noise', 'шум': 'noise',
+    'gradient': 'gradient', 'градиент': 'gradient',
+    'checker': 'checker', 'checkerboard': 'checker', 'шахматка': 'checker',
+    'perlin': 'perlin', 'photo': 'perlin', 'фото': 'perlin',
+}
+PATTERN_FORMATS = ('png', 'jpg', 'jpeg', 'gif', 'bmp')
+_SEED = 20240229
+# Октавы фото-подобного шума: клеток решетки по большей стороне и вес
+PERLIN_OCTAVES = ((4, 16), (8, 8), (16, 4), (32, 2), (64, 1))
+# Амплитуда зерна (степень двойки): без него PNG сжимается гораздо сильнее фотографии
+PERLIN_GRAIN = 32
+# Файл заданного размера: сторона образца для оценки сжатия, запас и предел стороны (память)
+SAMPLE_SIDE = 256
+TINY_SIDE = 16
+MIN_BYTES_PER_PIXEL = 0.001
+SIZE_MARGIN = 0.9
+MAX_SIDE = 8192
+
+
+def split_mode(text: str) -> Tuple[str, str]:
+    """(текст без названия режима, режим); без режима - заливка"""
+    mode = FLAT
+    rest = []
+    for token in (text or "").split():
+        if token.lower() in MODES:
+            mode = MODES[token.lower()]
+        else:
+            rest.append(token)
+    return " ".join(rest), mode
+
+
+def _inverse(color: Tuple[int, int, int]) -> Tuple[int, ...]:
+    return tuple(255 - channel for channel in color)
+
+
+def _palette(*stops) -> np.ndarray:
+    """Таблица 256x3: линейные переходы между цветами stops"""
+    positions = np.linspace(0, 255, len(stops))
+    levels = np.arange(256)
+    return np.stack([np.interp(levels, positions, [stop[c] for stop in stops]) for c in range(3)],
+                    axis=-1).astype(np.uint8)
+
+
+def _ramp(length: int, top: int) -> np.ndarray:
+    return (np.arange(length, dtype=np.uint32) * top // max(length - 1, 1)).astype(np.uint8)
+
+
+def _random_bytes(rng: np.random.Generator, size: int) -> np.ndarray:
+    """size псевдослучайных байт: сырые 64-битные слова генератора (в разы быстрее rng.bytes)"""
+    return rng.bit_generator.random_raw(size // 8 + 1).view(np.uint8)[:size]
+
+
+def _rgb(pixels: np.ndarray, width: int, height: int) -> Image.Image:
+    return Image.frombuffer('RGB', (width, height), pixels, 'raw', 'RGB', 0, 1)
+
+
+def _noise(rng: np.random.Generator, width: int, height: int) -> Image.Image:
+    return _rgb(_random_bytes(rng, width * height * 3), width, height)
+
+
+def _gradient(width: int, height: int, color) -> Image.Image:
+    # Индекс в палитре - сумма горизонтальной (0..127) и вертикальной (0..128) рамп.
+    # Строк всего 129 разных: они строятся один раз и копируются целиком
+    rows = _palette(color, _inverse(color))[_ramp(width, 127)[None, :] + np.arange(129, dtype=np.uint8)[:, None]]
+    return _rgb(rows[_ramp(height, 128)], width, height)
+
+
+def _checker(width: int, height: int, color) -> Image.Image:
+    cell = max(8, min(width, height) // 8)
+    columns = (np.arange(width) // cell) & 1
+    rows = np.array([color, _inverse(color)], dtype=np.uint8)[np.stack([columns, columns ^ 1])]
+    return _rgb(rows[(np.arange(height) // cell) & 1], width, height)
+
+
+def _perlin(rng: np.random.Generator, width: int, height: int, color) -> Image.Image:
+    # Октавы складываются в разрешении самой мелкой решетки, до размера
+    # изображения увеличивается только сумма
+    longest = max(width, height)
+    size = (max(2, math.ceil(PERLIN_OCTAVES[-1][0] * width / longest) + 1),
+            max(2, math.ceil(PERLIN_OCTAVES[-1][0] * height / longest) + 1))
+    accumulator = np.zeros((size[1], size[0]), dtype=np.float32)
+    for cells, weight in PERLIN_OCTAVES:
+        grid_w = max(2, math.ceil(cells * width / longest) + 1)
+        grid_h = max(2, math.ceil(cells * height / longest) + 1)
+        grid = Image.frombuffer('L', (grid_w, grid_h), rng.bytes(grid_w * grid_h), 'raw', 'L', 0, 1)
+        accumulator += np.asarray(grid.resize(size, Image.BICUBIC), dtype=np.float32) * weight
+    # Сумма октав концентрируется около середины - растягиваем контраст и оставляем место для зерна
+    total = sum(weight for _, weight in PERLIN_OCTAVES)
+    level = np.clip((accumulator / total - 128) * 3 + 128, 0, 255) * (255 - PERLIN_GRAIN) / 255
+    smooth = Image.fromarray(level.astype(np.uint8), 'L').resize((width, height), Image.BICUBIC)
+
+    pixels = np.array(smooth)
+    np.minimum(pixels, 255 - PERLIN_GRAIN, out=pixels)
+    grain = _random_bytes(rng, width * height).reshape(height, width)
+    pixels += grain & (PERLIN_GRAIN - 1)
+    image = Image.frombuffer('P', (width, height), pixels, 'raw', 'P', 0, 1)
+    image.putpalette(_palette(tuple(c // 5 for c in color), color, tuple((c + 255) // 2 for c in color)).tobytes())
+    return image.convert('RGB')
+
+
+def render_pattern(mode: str, width: int, height: int, color: Tuple[int, int, int]) -> Image.Image:
+    """Изображение RGB в режиме mode (кроме заливки, ее рисует вызывающий код)"""
+    rng = np.random.default_rng(_SEED)
+    if mode == 'noise':
+        return _noise(rng, width, height)
+    if mode == 'gradient':
+        return _gradient(width, height, color)
+    if mode == 'checker':
+        return _checker(width, height, color)
+    if mode == 'perlin':
+        return _perlin(rng, width, height, color)
+    raise ValueError(f"неизвестный режим изображения {mode}")
+
+
+def encode_image(image: Image.Image, format_type: str, mode: str = FLAT) -> bytes:
+    """Байты изображения в формате format_type (ICO сохраняется как PNG)"""
+    buffer = io.BytesIO()
+    if format_type in ('png', 'ico'):
+        # Шум не сжимается: без сжатия PNG сохраняется в разы быстрее
+        image.save(buffer, format='PNG', **({'compress_level': 0} if mode == 'noise' else {}))
+    elif format_type == 'gif':
+        # GIF требует режим 'P' для палитры
+        image.convert('P').save(buffer, format='GIF')
+    else:
+        image.save(buffer, format={'jpg': 'JPEG'}.get(format_type, format_type.upper()))
+    return buffer.getvalue()
+
+
+def _side_for(target: int, overhead: int, bytes_per_pixel: float) -> int:
+    pixels = max(0, int((target * SIZE_MARGIN - overhead) / bytes_per_pixel))
+    return max(1, min(MAX_SIDE, math.isqrt(pixels)))
+
+
+def write_pattern_file(format_type: str, mode: str, target: int, color: Tuple[int, int, int], path: str) -> int:
+    """Изображение режима mode размером target байт; возвращает фактический размер.
+
+    Синхронно, выполняется в пуле исполнителей. Изображение кодируется
+    один раз (повторно - только если оценка сжатия ошиблась в большую
+    сторону), остаток добирается так же, как у файлов заданного размера.
+    """
+    if format_type not in PATTERN_FORMATS:
+        raise ValueError(f"режим {mode} для файла заданного размера: {', '.join(PATTERN_FORMATS).upper()}")
+    # Заголовки формата - по крошечному образцу, сжатие на пиксель - по образцу SAMPLE_SIDE
+    overhead = len(encode_image(render_pattern(mode, TINY_SIDE, TINY_SIDE, color), format_type, mode))
+    sample = encode_image(render_pattern(mode, SAMPLE_SIDE, SAMPLE_SIDE, color), format_type, mode)
+    bytes_per_pixel = max(MIN_BYTES_PER_PIXEL, (len(sample) - overhead) / (SAMPLE_SIDE ** 2 - TINY_SIDE ** 2))
+
+    side = _side_for(target, overhead, bytes_per_pixel)
+    base = encode_image(render_pattern(mode, side, side, color), format_type, mode)
+    if len(base) > target:
+        # Оценка ошиблась (размер растет медленнее площади, как у шахматки в JPEG):
+        # сторона уменьшается пропорционально перебору, размер - не меньше чем так же
+        side = max(1, int(side * max(0, target * SIZE_MARGIN - overhead) / max(1, len(base) - overhead)))
+        base = encode_image(render_pattern(mode, side, side, color), format_type, mode)
+    if len(base) > target:
+        raise TargetTooSmall(len(base))
+
+    with open(path, 'wb') as f:
+        SIZED_WRITERS[format_type](f, target, base=base)
+        size = f.tell()
+    if abs(size - target) > SIZE_TOLERANCE:
+        raise ValueError(f"размер файла {size} байт вместо {target}")
+    return size
@@ -0,0 +1,559 @@
+"""Генератор комбинаторных наборов тестов (pairwise и t-wise) на основе IPOG.
+
+Алгоритм IPOG (In-Parameter-Order-General) строит покрывающий массив
+силы t: сначала полный перебор первых t параметров, затем параметры
+добавляются по одному. Для каждого нового параметра:
+
+* горизонтальный рост - существующим строкам подбирается значение нового
+  параметра, покрывающее больше всего еще не покрытых t-наборов;
+* вертикальный рост - оставшиеся t-наборы размещаются в строках со
+  свободными ("don't care") ячейками или в новых строках.
+
+Непокрытые t-наборы хранятся битовыми масками (по одной на сочетание
+параметров), поэтому проверка и отметка покрытия - это битовые операции.
+Вариант IPOG-F выбирает строку для горизонтального роста жадно
+(строка с наибольшим выигрышем первой) вместо порядка строк.
+
+Ограничения (запрещенные сочетания значений) учитываются при построении:
+запрещенные t-наборы сразу исключаются из масок покрытия, а значения,
+после которых строку уже нельзя дополнить до допустимой, не выбираются.
+Фильтровать готовый набор не нужно - это ломало бы покрытие.
+
+Результат детерминирован: при одинаковых входных данных и seed
+возвращается один и тот же набор.
+"""
+import heapq
+import random
+from itertools import combinations, product
+from typing import List, Optional, Sequence
+
+MIN_STRENGTH = 2
+MAX_STRENGTH = 4
+VARIANTS = ('ipog', 'ipog-f')
+# Предел кэша проверок дополнимости строк
+_MEMO_LIMIT = 200000
+
+
+class Constraints:
+    """Скомпилированные ограничения: список запрещенных сочетаний значений.
+
+    Каждое ограничение - набор литералов (параметр, допустимые номера значений);
+    строка запрещена, если выполняются все литералы одного ограничения.
+    При компиляции для каждого значения параметра строится таблица
+    "оставшихся литералов", поэтому проверка значения - несколько битовых
+    операций только по ограничениям с этим параметром.
+    """
+
+    def __init__(self, sizes: Sequence[int], clauses: Sequence[Sequence[tuple]]):
+        self.sizes = list(sizes)
+        self.clauses = []
+        for clause in clauses:
+            literals = {}
+            for param, values in clause:
+                mask = 0
+                for value in values:
+                    if not 0 <= value < self.sizes[param]:
+                        raise ValueError(f"Недопустимое значение {value} параметра {param}")
+                    mask |= 1 << value
+                # Повтор параметра в ограничении - пересечение значений
+                literals[param] = literals.get(param, mask) & mask
+            if literals:
+                self.clauses.append(tuple(sorted(literals.items())))
+
+        # Параметры, на которые влияют ограничения: остальные можно выбирать свободно
+        self.relevant = sorted({param for clause in self.clauses for param, _ in clause})
+        # by_literal[param][value] - остальные литералы ограничений, где участвует param=value
+        self.by_literal = [[[] for _ in range(size)] for size in self.sizes]
+        for clause in self.clauses:
+            for param, mask in clause:
+                rest = tuple(literal for literal in clause if literal[0] != param)
+                for value in range(self.sizes[param]):
+                    if (mask >> value) & 1:
+                        self.by_literal[param][value].append(rest)
+
+        # Связные группы параметров: дополнимость строки проверяется по каждой
+        # группе отдельно, и изменение одной ячейки затрагивает только ее группу
+        parent = {param: param for param in self.relevant}
+
+        def find(param):
+            while parent[param] != param:
+                parent[param] = parent[parent[param]]
+                param = parent[param]
+            return param
+
+        for clause in self.clauses:
+            first = find(clause[0][0])
+            for param, _ in clause[1:]:
+                parent[find(param)] = first
+        groups = {}
+        for param in self.relevant:
+            groups.setdefault(find(param), []).append(param)
+        self.components = list(groups.values())
+        self.component_of = [None] * len(self.sizes)
+        for index, component in enumerate(self.components):
+            for param in component:
+                self.component_of[param] = index
+        self._memo = {}
+        self._tuples = {}
+
+    def __bool__(self):
+        return bool(self.clauses)
+
+    def reordered(self, order: Sequence[int]) -> 'Constraints':
+        """Те же ограничения для параметров, переставленных в порядке order"""
+        position = {param: index for index, param in enumerate(order)}
+        clauses = [
+            [(position[param], [v for v in range(self.sizes[param]) if (mask >> v) & 1])
+             for param, mask in clause]
+            for clause in self.clauses
+        ]
+        return Constraints([self.sizes[param] for param in order], clauses)
+
+    def allows(self, row: Sequence, param: int, value: int) -> bool:
+        """Не нарушит ли значение value параметра param ни одно ограничение"""
+        for rest in self.by_literal[param][value]:
+            for other, mask in rest:
+                current = row[other]
+                if current is None or not (mask >> current) & 1:
+                    break
+            else:
+                return False
+        return True
+
+    def violates(self, row: Sequence) -> bool:
+        """Нарушает ли заполненная строка хотя бы одно ограничение"""
+        return any(not self.allows(row, param, row[param]) for param in self.relevant
+                   if row[param] is not None)
+
+    def extendable(self, row: Sequence, params: Optional[Sequence[int]] = None) -> bool:
+        """Можно ли дополнить частично заполненную строку до допустимой.
+
+        Если передан params, проверяются только группы этих параметров
+        (остальная часть строки считается уже проверенной).
+        """
+        if params is None:
+            indexes = range(len(self.components))
+        else:
+            indexes = {self.component_of[param] for param in params} - {None}
+        for index in indexes:
+            component = self.components[index]
+            key = (index, tuple(row[param] for param in component))
+            result = self._memo.get(key)
+            if result is None:
+                if any(row[param] is not None and not self.allows(row, param, row[param])
+                       for param in component):
+                    result = False
+                else:
+                    result = self._search(list(row), component, None) is not None
+                if len(self._memo) >= _MEMO_LIMIT:
+                    self._memo.clear()
+                self._memo[key] = result
+            if not result:
+                return False
+        return True
+
+    def tuple_allowed(self, values: Sequence[tuple]) -> bool:
+        """Входит ли набор [(параметр, значение)] хотя бы в одну допустимую строку"""
+        # Значение, не упомянутое в ограничениях, не мешает дополнить строку,
+        # поэтому набор сводится к значениям из ограничений
+        key = tuple((param, value) for param, value in values if self.by_literal[param][value])
+        if not key:
+            return True
+        result = self._tuples.get(key)
+        if result is None:
+            row = [None] * len(self.sizes)
+            for param, value in key:
+                row[param] = value
+            result = self._tuples[key] = self.extendable(row, [param for param, _ in key])
+        return result
+
+    def _search(self, row: list, params: Sequence[int], rng: Optional[random.Random]) -> Optional[list]:
+        """Перебор с возвратом по пустым ячейкам параметров params"""
+        free = [param for param in params if row[param] is None]
+
+        def assign(position: int) -> bool:
+            if position == len(free):
+                return True
+            param = free[position]
+            values = list(range(self.sizes[param]))
+            if rng is not None:
+                rng.shuffle(values)
+            for value in values:
+                if self.allows(row, param, value):
+                    row[param] = value
+                    if assign(position + 1):
+                        return True
+            row[param] = None
+            return False
+
+        return row if assign(0) else None
+
+    def complete(self, row: list, rng: random.Random) -> bool:
+        """Заполнить пустые ячейки ограниченных параметров допустимыми значениями"""
+        return all(self._search(row, component, rng) is not None for component in self.components)
+
+    def count_valid(self) -> int:
+        """Количество допустимых строк полного перебора"""
+        total = 1
+        for param, size in enumerate(self.sizes):
+            if self.component_of[param] is None:
+                total *= size
+        # Группы параметров независимы, поэтому количества перемножаются
+        for component in self.components:
+            total *= self._count_component(component)
+        return total
+
+    def _component_order(self, component: list) -> list:
+        """Порядок параметров группы, при котором открыто поменьше ограничений"""
+        clauses = [index for index, clause in enumerate(self.clauses) if clause[0][0] in component]
+        order, placed = [], set()
+        while len(order) < len(component):
+            def open_after(param):
+                done = placed | {param}
+                return sum(1 for index in clauses
+                           if any(p in done for p, _ in self.clauses[index])
+                           and not all(p in done for p, _ in self.clauses[index]))
+            param = min((p for p in component if p not in placed), key=lambda p: (open_after(p), p))
+            order.append(param)
+            placed.add(param)
+        return order
+
+    def _count_component(self, component: list) -> int:
+        """Количество допустимых наборов значений группы - динамика по параметрам.
+
+        Состояние - маска "открытых" ограничений: у них уже назначены не все
+        параметры, но все назначенные литералы выполняются. Строки с одним
+        состоянием дальше продолжаются одинаково, поэтому хранится только
+        их количество, а не сами строки (перебор с возвратом экспоненциален).
+        """
+        order = self._component_order(component)
+        position = {param: index for index, param in enumerate(order)}
+        first, last = {}, {}
+        for index, clause in enumerate(self.clauses):
+            if clause[0][0] in position:
+                positions = [position[param] for param, _ in clause]
+                first[index], last[index] = min(positions), max(positions)
+
+        states = {0: 1}
+        for step, param in enumerate(order):
+            literals = [(index, mask) for index, clause in enumerate(self.clauses)
+                        for p, mask in clause if p == param]
+            touched = sum(1 << index for index, _ in literals)
+            # Значения с одинаковым набором выполненных литералов переходят одинаково
+            classes = {}
+            for value in range(self.sizes[param]):
+                holds = tuple((mask >> value) & 1 for _, mask in literals)
+                classes[holds] = classes.get(holds, 0) + 1
+
+            def transitions(bits: int) -> list:
+                """(новые биты ограничений параметра, число значений) для их текущих битов"""
+                result = []
+                for holds, multiplicity in classes.items():
+                    added = 0
+                    for (index, _), held in zip(literals, holds):
+                        if not held or (first[index] != step and not (bits >> index) & 1):
+                            continue
+                        if last[index] == step:
+                            break  # все литералы ограничения выполнены - строка запрещена
+                        added |= 1 << index
+                    else:
+                        result.append((added, multiplicity))
+                return result
+
+            # Переход зависит только от битов ограничений с этим параметром
+            cache = {}
+            following = {}
+            for state, count in states.items():
+                bits = state & touched
+                moves = cache.get(bits)
+                if moves is None:
+                    moves = cache[bits] = transitions(bits)
+                rest = state ^ bits
+                for added, multiplicity in moves:
+                    new_state = rest | added
+                    following[new_state] = following.get(new_state, 0) + count * multiplicity
+            states = following
+        return sum(states.values())
+
+
+class _Coverage:
+    """Непокрытые t-наборы для нового столбца: битовая маска на сочетание столбцов"""
+
+    def __init__(self, sizes: List[int], column: int, strength: int,
+                 constraints: Optional[Constraints] = None):
+        self.column = column
+        self.width = sizes[column]
+        self.combos = []
+        self.masks = []
+        self.remaining = 0
+        for combo in combinations(range(column), strength - 1):
+            # Веса смешанной системы счисления для значений столбцов сочетания
+            weights = []
+            block = 1
+            for c in reversed(combo):
+                weights.append((c, block))
+                block *= sizes[c]
+            weights.reverse()
+            self.combos.append(weights)
+            bits = block * self.width
+            self.masks.append((1 << bits) - 1)
+            self.remaining += bits
+        self.block_mask = (1 << self.width) - 1
+        if constraints:
+            self._prune(constraints)
+
+    def _prune(self, constraints: Constraints):
+        """Исключить из покрытия t-наборы, которые не входят ни в одну допустимую строку"""
+        relevant = set(constraints.relevant)
+        for k, weights in enumerate(self.combos):
+            if self.column not in relevant and not any(c in relevant for c, _ in weights):
+                continue
+            mask = self.masks[k]
+            for index in range(mask.bit_length()):
+                values, value = self.decode(k, index)
+                values.append((self.column, value))
+                if not constraints.tuple_allowed(values):
+                    mask &= ~(1 << index)
+                    self.remaining -= 1
+            self.masks[k] = mask
+
+    def base(self, k: int, row: list) -> Optional[int]:
+        """Номер блока битов сочетания k для строки (None, если есть пустые ячейки)"""
+        index = 0
+        for c, weight in self.combos[k]:
+            value = row[c]
+            if value is None:
+                return None
+            index += value * weight
+        return index * self.width
+
+    def gains(self, row: list) -> List[int]:
+        """Сколько непокрытых t-наборов даст каждое значение нового столбца"""
+        gains = [0] * self.width
+        for k, mask in enumerate(self.masks):
+            if not mask:
+                continue
+            base = self.base(k, row)
+            if base is None:
+                continue
+            block = (mask >> base) & self.block_mask
+            while block:
+                low = block & -block
+                gains[low.bit_length() - 1] += 1
+                block ^= low
+        return gains
+
+    def cover(self, row: list):
+        """Отметить все t-наборы строки с заданным значением нового столбца"""
+        value = row[self.column]
+        if value is None:
+            return
+        for k, mask in enumerate(self.masks):
+            if not mask:
+                continue
+            base = self.base(k, row)
+            if base is None:
+                continue
+            bit = 1 << (base + value)
+            if mask & bit:
+                self.masks[k] = mask ^ bit
+                self.remaining -= 1
+
+    def uncovered(self):
+        """Перебор непокрытых t-наборов: (номер сочетания, номер бита)"""
+        for k, mask in enumerate(self.masks):
+            while mask:
+                low = mask & -mask
+                mask ^= low
+                yield k, low.bit_length() - 1
+
+    def is_uncovered(self, k: int, index: int) -> bool:
+        return bool((self.masks[k] >> index) & 1)
+
+    def decode(self, k: int, index: int):
+        """Значения t-набора по номеру бита: [(столбец, значение)], значение нового столбца"""
+        block, value = divmod(index, self.width)
+        values = []
+        for c, weight in self.combos[k]:
+            digit, block = divmod(block, weight)
+            values.append((c, digit))
+        return values, value
+
+
+def _fits(row: list, assignments, constraints: Optional[Constraints]) -> bool:
+    """Останется ли строка дополнимой до допустимой после присваиваний [(столбец, значение)]"""
+    if not constraints:
+        return True
+    saved = [(c, row[c]) for c, _ in assignments]
+    for c, v in assignments:
+        row[c] = v
+    try:
+        return constraints.extendable(row, [c for c, _ in assignments])
+    finally:
+        for c, v in saved:
+            row[c] = v
+
+
+def _best_values(row: list, coverage: _Coverage, constraints: Optional[Constraints]):
+    """Наибольший выигрыш и значения нового столбца, которые его дают"""
+    gains = coverage.gains(row)
+    column = coverage.column
+    if constraints and column in constraints.relevant:
+        for value, gain in enumerate(gains):
+            if gain and not _fits(row, [(column, value)], constraints):
+                gains[value] = 0
+    best = max(gains)
+    return best, [v for v, gain in enumerate(gains) if gain == best]
+
+
+def _horizontal_ipog(rows: list, coverage: _Coverage, rng: random.Random,
+                     constraints: Optional[Constraints] = None):
+    column = coverage.column
+    for row in rows:
+        best, candidates = _best_values(row, coverage, constraints)
+        if best == 0:
+            continue  # оставляем ячейку свободной для вертикального роста
+        row[column] = rng.choice(candidates)
+        coverage.cover(row)
+
+
+def _horizontal_ipog_f(rows: list, coverage: _Coverage, rng: random.Random,
+                       constraints: Optional[Constraints] = None):
+    """Жадный выбор строки с наибольшим выигрышем (ленивая переоценка)"""
+    column = coverage.column
+    heap = []
+    for index, row in enumerate(rows):
+        best, _ = _best_values(row, coverage, constraints)
+        if best:
+            heap.append((-best, index))
+    heapq.heapify(heap)
+
+    while heap:
+        _, index = heapq.heappop(heap)
+        row = rows[index]
+        best, candidates = _best_values(row, coverage, constraints)
+        if best == 0:
+            continue
+        # Выигрыш только убывает, поэтому актуальная оценка не ниже следующей в куче - берем
+        if heap and best < -heap[0][0]:
+            heapq.heappush(heap, (-best, index))
+            continue
+        row[column] = rng.choice(candidates)
+        coverage.cover(row)
+
+
+def _vertical(rows: list, coverage: _Coverage, size: int,
+              constraints: Optional[Constraints] = None):
+    column = coverage.column
+    for k, index in list(coverage.uncovered()):
+        # Набор мог покрыться при заполнении предыдущих строк
+        if not coverage.is_uncovered(k, index):
+            continue
+        values, value = coverage.decode(k, index)
+        target = None
+        for row in rows:
+            if row[column] not in (None, value):
+                continue
+            if all(row[c] is None or row[c] == v for c, v in values) \
+                    and _fits(row, values + [(column, value)], constraints):
+                target = row
+                break
+        if target is None:
+            target = [None] * size
+            rows.append(target)
+        for c, v in values:
+            target[c] = v
+        target[column] = value
+        coverage.cover(target)
+
+
+def generate_indices(sizes: Sequence[int], strength: int = 2, seed: int = 0,
+                     variant: str = 'ipog', constraints: Optional[Constraints] = None) -> List[List[int]]:
+    """Покрывающий массив силы strength для параметров с sizes[i] значениями.
+
+    Возвращает строки с номерами значений в исходном порядке параметров.
+    Если заданы ограничения, все строки допустимы, а покрываются все
+    допустимые t-наборы.
+    """
+    if variant not in VARIANTS:
+        raise ValueError(f"Неизвестный вариант алгоритма: {variant}")
+    if not MIN_STRENGTH <= strength <= MAX_STRENGTH:
+        raise ValueError(f"Сила покрытия должна быть от {MIN_STRENGTH} до {MAX_STRENGTH}")
+    if any(size < 1 for size in sizes):
+        raise ValueError("У каждого параметра должно быть хотя бы одно значение")
+    if not sizes:
+        return []
+    if constraints and not constraints.extendable([None] * len(sizes)):
+        raise ValueError("Ограничения исключают все комбинации")
+
+    rng = random.Random(seed)
+    count = len(sizes)
+    t = min(strength, count)
+
+    # Параметры с большим числом значений обрабатываем первыми - так набор меньше
+    order = sorted(range(count), key=lambda i: (-sizes[i], i))
+    ordered_sizes = [sizes[i] for i in order]
+    if constraints:
+        constraints = constraints.reordered(order)
+
+    rows = [list(combo) + [None] * (count - t) for combo in product(*(range(s) for s in ordered_sizes[:t]))]
+    if constraints:
+        rows = [row for row in rows if constraints.extendable(row)]
+    horizontal = _horizontal_ipog_f if variant == 'ipog-f' else _horizontal_ipog
+
+    for column in range(t, count):
+        coverage = _Coverage(ordered_sizes, column, t, constraints)
+        horizontal(rows, coverage, rng, constraints)
+        _vertical(rows, coverage, count, constraints)
+
+    # Свободные ячейки заполняем любыми значениями, с учетом ограничений
+    for row in rows:
+        if constraints:
+            constraints.complete(row, rng)
+        for column, value in enumerate(row):
+            if value is None:
+                row[column] = rng.randrange(ordered_sizes[column])
+
+    result = []
+    for row in rows:
+        original = [0] * count
+        for position, param in enumerate(order):
+            original[param] = row[position]
+        result.append(original)
+    return result
+
+
+def generate(values: Sequence[Sequence], strength: int = 2, seed: int = 0,
+             variant: str = 'ipog', constraints: Optional[Constraints] = None) -> List[list]:
+    """Набор тестов, покрывающий все сочетания значений любых strength параметров"""
+    rows = generate_indices([len(options) for options in values], strength, seed, variant, constraints)
+    return [[options[index] for options, index in zip(values, row)] for row in rows]
+
+
+def count_uncovered(rows: Sequence[Sequence[int]], sizes: Sequence[int], strength: int = 2,
+                    constraints: Optional[Constraints] = None) -> int:
+    """Проверка: сколько допустимых t-наборов не покрыто строками (0 - покрытие полное)"""
+    t = min(strength, len(sizes))
+    missing = 0
+    for columns in combinations(range(len(sizes)), t):
+        seen = {tuple(row[c] for c in columns) for row in rows}
+        if not constraints:
+            total = 1
+            for c in columns:
+                total *= sizes[c]
+            missing += total - len(seen)
+            continue
+        row = [None] * len(sizes)
+        for combo in product(*(range(sizes[c]) for c in columns)):
+            if combo in seen:
+                continue
+            for c, v in zip(columns, combo):
+                row[c] = v
+            if constraints.extendable(row):
+                missing += 1
+    return missing
+
+
+def count_invalid(rows: Sequence[Sequence[int]], constraints: Constraints) -> int:
+    """Проверка: сколько строк нарушают ограничения"""
+    return sum(1 for row in rows if constraints.violates(row))
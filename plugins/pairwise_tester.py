@@ -1,10 +1,12 @@
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton
-from allpairspy import AllPairs
 import logging
-from itertools import product
+import math
+import re
 from messages import MENU_MSG, get_main_menu, get_back_menu
+from executor import executor
+from plugins import pairwise_engine
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +14,142 @@ class PairwiseStates(StatesGroup):
     waiting_for_parameters = State()
     waiting_for_action = State()
 
+# Сколько комбинаций полного перебора показывать за один раз
+FULL_LIST_PAGE_SIZE = 100
+MAX_MESSAGE_LENGTH = 4000
+# Набор строится детерминированно: одинаковые параметры - одинаковые тесты
+PAIRWISE_SEED = 0
+STRENGTH_RE = re.compile(r'^t\s*=\s*(\d+)$', re.IGNORECASE)
+
+def count_combinations(values: list) -> int:
+    """Размер полного перебора без его построения"""
+    return math.prod(len(options) for options in values)
+
+def iter_digits(values: list, start: int):
+    """Номера значений последовательных комбинаций полного перебора, начиная с номера start.
+
+    Возвращается один и тот же изменяемый список - копируйте его, если нужно сохранить.
+    """
+    total = count_combinations(values)
+    if start >= total:
+        return
+    # Номер раскладывается в смешанной системе счисления (порядок как у itertools.product):
+    # основание каждого разряда - количество значений параметра
+    digits = []
+    index = start
+    for options in reversed(values):
+        index, digit = divmod(index, len(options))
+        digits.append(digit)
+    digits.reverse()
+
+    for _ in range(total - start):
+        yield digits
+        # Увеличиваем "одометр" на единицу, начиная с младшего разряда
+        for position in range(len(digits) - 1, -1, -1):
+            digits[position] += 1
+            if digits[position] < len(values[position]):
+                break
+            digits[position] = 0
+
+def collect_page(values: list, start: int, count: int, constraints=None):
+    """Страница допустимых комбинаций полного перебора.
+
+    Возвращает комбинации и номер в полном переборе, с которого продолжать.
+    """
+    page = []
+    position = start
+    for digits in iter_digits(values, start):
+        position += 1
+        if constraints and constraints.violates(digits):
+            continue
+        page.append([options[digit] for options, digit in zip(values, digits)])
+        if len(page) == count:
+            break
+    return page, position
+
+def parse_constraint(block: str, parameters: dict) -> list:
+    """Разбор ограничения вида '!os=mac & browser=edge|ie'.
+
+    Возвращает литералы [номер параметра, [номера значений]] - такие
+    значения не должны встречаться в одной комбинации.
+    """
+    names = list(parameters.keys())
+    clause = []
+    for literal in block.lstrip('!').split('&'):
+        if '=' not in literal:
+            raise ValueError(f"В ограничении '{block}' ожидается 'параметр=значение'")
+        name, values_str = (part.strip() for part in literal.split('=', 1))
+        if name not in parameters:
+            raise ValueError(f"Неизвестный параметр '{name}' в ограничении '{block}'")
+        options = parameters[name]
+        indexes = []
+        for value in (v.strip() for v in values_str.split('|') if v.strip()):
+            if value not in options:
+                raise ValueError(f"У параметра '{name}' нет значения '{value}'")
+            indexes.append(options.index(value))
+        if not indexes:
+            raise ValueError(f"Не указано значение параметра '{name}' в ограничении '{block}'")
+        clause.append([names.index(name), indexes])
+    return clause
+
+def build_constraints(parameters: dict, clauses: list):
+    """Скомпилированные ограничения или None, если их нет"""
+    if not clauses:
+        return None
+    sizes = [len(values) for values in parameters.values()]
+    return pairwise_engine.Constraints(sizes, clauses)
+
+def format_constraint(parameters: dict, clause: list) -> str:
+    names = list(parameters.keys())
+    return " и ".join(
+        f"{names[param]}={'|'.join(parameters[names[param]][v] for v in values)}"
+        for param, values in clause
+    )
+
+def format_combination(index: int, parameters: dict, combo) -> str:
+    return f"{index}. " + ", ".join(f"{param}: {value}" for param, value in zip(parameters.keys(), combo))
+
+async def send_chunked(message: Message, report: str):
+    """Отправка длинного отчета частями с учетом лимита Telegram (4096 символов)"""
+    if len(report) <= MAX_MESSAGE_LENGTH:
+        await message.answer(report, parse_mode="HTML")
+        return
+    # Разбиваем по строкам, чтобы не разрывать HTML
+    current_chunk = ""
+    for line in report.split('\n'):
+        if len(current_chunk) + len(line) + 1 > MAX_MESSAGE_LENGTH:
+            if current_chunk:
+                await message.answer(current_chunk, parse_mode="HTML")
+            current_chunk = line + '\n'
+        else:
+            current_chunk += line + '\n'
+    if current_chunk:
+        await message.answer(current_chunk, parse_mode="HTML")
+
+def get_action_keyboard(has_more: bool = False):
+    keyboard = [
+        [KeyboardButton(text="📋 Показать полный список"), KeyboardButton(text="🧩 Показать оптимальные тесты")],
+    ]
+    if has_more:
+        keyboard.append([KeyboardButton(text="➡️ Следующие комбинации")])
+    keyboard += [
+        [KeyboardButton(text="Проверить другие параметры")],
+        [KeyboardButton(text="Назад в меню")]
+    ]
+    return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
+
+def build_pairwise_combinations(values: list, strength: int = 2, clauses: list = None):
+    """Подбор комбинаций силы strength (синхронно, выполняется в пуле исполнителей).
+
+    Для пар используется IPOG-F (набор меньше), для t >= 3 - IPOG (заметно быстрее).
+    """
+    variant = 'ipog-f' if strength == 2 else 'ipog'
+    constraints = None
+    if clauses:
+        constraints = pairwise_engine.Constraints([len(options) for options in values], clauses)
+    return pairwise_engine.generate(values, strength, seed=PAIRWISE_SEED, variant=variant,
+                                    constraints=constraints)
+
 async def pairwise_command(message: Message, state: FSMContext):
     await state.set_state(PairwiseStates.waiting_for_parameters)
     await message.answer(
@@ -19,6 +157,11 @@ async def pairwise_command(message: Message, state: FSMContext):
         "<code>параметр1: значение1, значение2; параметр2: значение1, значение2</code>\n\n"
         "Пример:\n"
         "<code>os: mac, win; size: 1000, 1200; browser: chrome, firefox</code>\n\n"
+        f"По умолчанию покрываются все пары значений. Для покрытия троек и четверок "
+        f"добавь блок <code>t=3</code> (от {pairwise_engine.MIN_STRENGTH} до {pairwise_engine.MAX_STRENGTH}), например:\n"
+        "<code>t=3; os: mac, win; size: 1000, 1200; browser: chrome, firefox; lang: ru, en</code>\n\n"
+        "Недопустимые сочетания задаются блоком с <code>!</code> (значения через <code>|</code>):\n"
+        "<code>os: mac, win; browser: safari, edge; !os=win & browser=safari</code>\n\n"
         "Для возврата в меню нажми 'Назад в меню'",
         parse_mode="HTML",
         reply_markup=get_back_menu()
@@ -36,10 +179,29 @@ async def process_pairwise_parameters(message: Message, state: FSMContext):
     
     try:
         parameters = {}
+        strength = 2
+        constraint_blocks = []
         input_text = message.text.strip()
         param_blocks = [block.strip() for block in input_text.split(';') if block.strip()]
         
         for block in param_blocks:
+            strength_match = STRENGTH_RE.match(block)
+            if strength_match:
+                strength = int(strength_match.group(1))
+                if not pairwise_engine.MIN_STRENGTH <= strength <= pairwise_engine.MAX_STRENGTH:
+                    await message.answer(
+                        f"❌ Сила покрытия t должна быть от {pairwise_engine.MIN_STRENGTH} "
+                        f"до {pairwise_engine.MAX_STRENGTH}",
+                        reply_markup=get_back_menu()
+                    )
+                    return
+                continue
+            
+            if block.startswith('!'):
+                # Ограничения разбираем после всех параметров
+                constraint_blocks.append(block)
+                continue
+            
             if ':' not in block:
                 await message.answer(
                     "❌ Ошибка формата. Используй 'параметр: значение1, значение2'",
@@ -67,42 +229,62 @@ async def process_pairwise_parameters(message: Message, state: FSMContext):
             )
             return
         
-        pairwise_combinations = list(AllPairs(parameters.values()))
-        # Вычисляем все комбинации один раз и сохраняем для дальнейшего использования
-        all_combinations = list(product(*parameters.values()))
-        all_combinations_count = len(all_combinations)
+        try:
+            clauses = [parse_constraint(block, parameters) for block in constraint_blocks]
+            constraints = build_constraints(parameters, clauses)
+        except ValueError as e:
+            await message.answer(f"❌ Ошибка в ограничениях: {e}", reply_markup=get_back_menu())
+            return
+        
+        # Полный перебор не строим: храним только параметры, а количество считаем
+        all_combinations_count = count_combinations(list(parameters.values()))
+        if constraints:
+            # Плотные ограничения считаются заметное время - тоже в пуле
+            all_combinations_count = await executor.run("pairwise_tester", constraints.count_valid)
+            if all_combinations_count == 0:
+                await message.answer(
+                    "❌ Ограничения исключают все комбинации",
+                    reply_markup=get_back_menu()
+                )
+                return
+        
+        # Подбор комбинаций может занять заметное время, выполняем его в пуле
+        pairwise_combinations = await executor.run(
+            "pairwise_tester", build_pairwise_combinations, list(parameters.values()), strength, clauses
+        )
         
         await state.update_data(
             parameters=parameters,
             pairwise_combinations=pairwise_combinations,
-            all_combinations=all_combinations,
-            all_combinations_count=all_combinations_count
+            strength=strength,
+            constraints=clauses,
+            all_combinations_count=all_combinations_count,
+            full_list_offset=0,
+            full_list_shown=0
         )
         
+        coverage = "пары" if strength == 2 else f"сочетания из {strength} параметров"
         report = (
             f"🧪 <b>Pairwise тестирование</b>\n\n"
+            f"<b>Покрытие:</b> все {coverage} (t={strength})\n"
             f"<b>Параметры ({len(parameters)}):</b>\n" +
             "\n".join(f"• {param}: {', '.join(values)}" for param, values in parameters.items()) +
+            (
+                f"\n\n<b>Исключено ({len(clauses)}):</b>\n" +
+                "\n".join(f"• {format_constraint(parameters, clause)}" for clause in clauses)
+                if clauses else ""
+            ) +
             f"\n\n<b>Оптимальное количество тестов:</b> {len(pairwise_combinations)} из {all_combinations_count}\n\n"
             f"<b>🧩 Оптимальные тесты:</b>\n" +
             "\n".join(
-                f"{i}. " + ", ".join(f"{param}: {value}" for param, value in zip(parameters.keys(), combo))
+                format_combination(i, parameters, combo)
                 for i, combo in enumerate(pairwise_combinations, 1)
             )
         )
         
-        await message.answer(report, parse_mode="HTML")
+        await send_chunked(message, report)
         
-        action_keyboard = ReplyKeyboardMarkup(
-            keyboard=[
-                [KeyboardButton(text="📋 Показать полный список"), KeyboardButton(text="🧩 Показать оптимальные тесты")],
-                [KeyboardButton(text="Проверить другие параметры")],
-                [KeyboardButton(text="Назад в меню")]
-            ],
-            resize_keyboard=True
-        )
-        
-        await message.answer("Выбери действие:", reply_markup=action_keyboard)
+        await message.answer("Выбери действие:", reply_markup=get_action_keyboard())
         await state.set_state(PairwiseStates.waiting_for_action)
         
     except Exception as e:
@@ -126,83 +308,59 @@ async def process_pairwise_action(message: Message, state: FSMContext):
     data = await state.get_data()
     parameters = data['parameters']
     pairwise_combinations = data['pairwise_combinations']
-    all_combinations = data.get('all_combinations')
     all_combinations_count = data['all_combinations_count']
-    
-    # Если полные комбинации не сохранены, вычисляем их
-    if all_combinations is None:
-        all_combinations = list(product(*parameters.values()))
-        await state.update_data(all_combinations=all_combinations)
+    values = list(parameters.values())
     
     if message.text == "Проверить другие параметры":
         await pairwise_command(message, state)
         return
     
-    elif message.text == "📋 Показать полный список":
-        
-        report = (
-            f"📋 <b>Полный список комбинаций ({len(all_combinations)}):</b>\n\n" +
-            "\n".join(
-                f"{i}. " + ", ".join(f"{param}: {value}" for param, value in zip(parameters.keys(), combo))
-                for i, combo in enumerate(all_combinations, 1)
-            )
+    elif message.text in ["📋 Показать полный список", "➡️ Следующие комбинации"]:
+        # Комбинации восстанавливаются по номеру, в памяти только текущая страница;
+        # недопустимые по ограничениям пропускаются
+        if message.text == "📋 Показать полный список":
+            offset, shown = 0, 0
+        else:
+            offset, shown = data.get('full_list_offset', 0), data.get('full_list_shown', 0)
+        constraints = build_constraints(parameters, data.get('constraints'))
+        # С ограничениями до страницы может быть долгий пропуск - не блокируем цикл событий
+        page, next_offset = await executor.run(
+            "pairwise_tester", collect_page, values, offset, FULL_LIST_PAGE_SIZE, constraints
         )
         
-        # Разбиваем длинное сообщение на части, учитывая лимит Telegram (4096 символов)
-        max_length = 4000
-        if len(report) > max_length:
-            # Разбиваем по строкам, чтобы не разрывать HTML
-            lines = report.split('\n')
-            current_chunk = ""
-            for line in lines:
-                if len(current_chunk) + len(line) + 1 > max_length:
-                    if current_chunk:
-                        await message.answer(current_chunk, parse_mode="HTML")
-                    current_chunk = line + '\n'
-                else:
-                    current_chunk += line + '\n'
-            if current_chunk:
-                await message.answer(current_chunk, parse_mode="HTML")
+        if shown == 0:
+            header = f"📋 <b>Полный список комбинаций ({all_combinations_count}):</b>\n\n"
         else:
-            await message.answer(report, parse_mode="HTML")
+            header = f"📋 <b>Комбинации {shown + 1}–{shown + len(page)} из {all_combinations_count}:</b>\n\n"
+        report = header + "\n".join(
+            format_combination(i, parameters, combo)
+            for i, combo in enumerate(page, shown + 1)
+        )
+        await send_chunked(message, report)
+        
+        shown += len(page)
+        await state.update_data(full_list_offset=next_offset, full_list_shown=shown)
+        has_more = shown < all_combinations_count
+        if has_more:
+            await message.answer(
+                f"Показано {shown} из {all_combinations_count}",
+                reply_markup=get_action_keyboard(has_more=True)
+            )
+            return
         
     elif message.text == "🧩 Показать оптимальные тесты":
         report = (
             f"🧩 <b>Оптимальные тесты ({len(pairwise_combinations)} из {all_combinations_count}):</b>\n\n" +
             "\n".join(
-                f"{i}. " + ", ".join(f"{param}: {value}" for param, value in zip(parameters.keys(), combo))
+                format_combination(i, parameters, combo)
                 for i, combo in enumerate(pairwise_combinations, 1)
             )
         )
-        # Разбиваем длинное сообщение на части
-        max_length = 4000
-        if len(report) > max_length:
-            lines = report.split('\n')
-            current_chunk = ""
-            for line in lines:
-                if len(current_chunk) + len(line) + 1 > max_length:
-                    if current_chunk:
-                        await message.answer(current_chunk, parse_mode="HTML")
-                    current_chunk = line + '\n'
-                else:
-                    current_chunk += line + '\n'
-            if current_chunk:
-                await message.answer(current_chunk, parse_mode="HTML")
-        else:
-            await message.answer(report, parse_mode="HTML")
+        await send_chunked(message, report)
     
     else:
         await message.answer("Используй предложенные кнопки")
         return
     
     # Только если нужно продолжить, покажем меню
-    if message.text in ["📋 Показать полный список", "🧩 Показать оптимальные тесты"]:
-        action_keyboard = ReplyKeyboardMarkup(
-            keyboard=[
-                [KeyboardButton(text="📋 Показать полный список"), KeyboardButton(text="🧩 Показать оптимальные тесты")],
-                [KeyboardButton(text="Проверить другие параметры")],
-                [KeyboardButton(text="Назад в меню")]
-            ],
-            resize_keyboard=True
-        )
-        await message.answer("Выбери действие:", reply_markup=action_keyboard)
+    await message.answer("Выбери действие:", reply_markup=get_action_keyboard())
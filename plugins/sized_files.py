@@ -0,0 +1,584 @@
+"""Генерация файлов заданного размера ("PDF 50MB", "ZIP 2GB", "PNG 20MB").
+
+Файл пишется на диск потоком блоками по 1 МБ, поэтому память не зависит
+от размера. Для каждого формата строится валидная структура, а размер
+добирается средствами самого формата, не ломающими файл:
+
+* текстовые форматы, SVG, HTML - текст-заполнитель внутри комментария
+  или тела документа;
+* PNG/ICO - вспомогательные (ancillary) чанки, JPEG - сегменты COM,
+  GIF - блок комментария, BMP - промежуток перед пиксельными данными;
+* PDF - страницы с текстом, DOCX/XLSX - абзацы и строки листа;
+* ZIP - несжатая запись с псевдослучайными данными, остаток -
+  комментарий архива; RAR5 - такая же запись, остаток - длина имени;
+* MP4 - бокс ``free``, AVI - чанк ``JUNK``.
+
+Писатели изображений принимают готовый файл ``base`` (например, с
+содержимым из ``image_patterns``) и добирают размер тем же способом.
+
+Содержимое детерминировано: одинаковые формат и размер дают одинаковые
+байты. Размер совпадает с запрошенным до байта, кроме нескольких
+комбинаций (остаток в 1-11 байт для PNG, 1-3 для JPEG), где отклонение
+не превышает ``SIZE_TOLERANCE``.
+"""
+import io
+import math
+import random
+import re
+import struct
+import zipfile
+import zlib
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, Optional
+from plugins.archive_formats import RAR_OVERHEAD, ZIP_DATE, Rar5Writer, rar_header_size
+
+CHUNK = 1 << 20
+SIZE_TOLERANCE = 16
+UNITS = {
+    'b': 1, 'б': 1,
+    'kb': 1 << 10, 'кб': 1 << 10, 'k': 1 << 10,
+    'mb': 1 << 20, 'мб': 1 << 20, 'm': 1 << 20,
+    'gb': 1 << 30, 'гб': 1 << 30, 'g': 1 << 30,
+}
+SIZE_PATTERN = re.compile(r'^\s*(\d+(?:[.,]\d+)?)\s*([a-zа-я]+)\s*$', re.IGNORECASE)
+_SEED = 20240229
+_LOREM = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut "
+    "labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud exercitation ullamco "
+    "laboris nisi ut aliquip ex ea commodo consequat. Duis aute irure dolor in reprehenderit in "
+    "voluptate velit esse cillum dolore eu fugiat nulla pariatur. "
+)
+
+
+def parse_size(text: str) -> Optional[int]:
+    """Размер в байтах из строки вида "50MB", "1.5 GB", "300 КБ" (единицы двоичные); None - не размер"""
+    match = SIZE_PATTERN.match(text or "")
+    if not match or match.group(2).lower() not in UNITS:
+        return None
+    return int(float(match.group(1).replace(',', '.')) * UNITS[match.group(2).lower()])
+
+
+def format_size(size: int) -> str:
+    for unit, factor in (("GB", 1 << 30), ("MB", 1 << 20), ("KB", 1 << 10)):
+        if size >= factor:
+            value = size / factor
+            return f"{value:.0f}{unit}" if value == int(value) else f"{value:.1f}{unit}"
+    return f"{size}B"
+
+
+@lru_cache(maxsize=1)
+def _noise_block() -> bytes:
+    """Блок псевдослучайных байт (плохо сжимается, как реальные бинарные данные)"""
+    return random.Random(_SEED).randbytes(CHUNK)
+
+
+@lru_cache(maxsize=2)
+def _text_block(line_breaks: bool = True) -> bytes:
+    """Блок ASCII-текста без символов, требующих экранирования в XML/JSON/HTML"""
+    line = _LOREM.strip() + ("\n" if line_breaks else " ")
+    return (line * (CHUNK // len(line) + 1)).encode('ascii')[:CHUNK]
+
+
+def _fill(f, size: int, block: bytes):
+    """Записать size байт, повторяя block"""
+    view = memoryview(block)
+    while size > 0:
+        n = min(size, len(view))
+        f.write(view[:n])
+        size -= n
+
+
+def _blocks(size: int, block: bytes) -> Iterator[memoryview]:
+    """size байт фрагментами, повторяя block"""
+    view = memoryview(block)
+    while size > 0:
+        n = min(size, len(view))
+        yield view[:n]
+        size -= n
+
+
+class TargetTooSmall(ValueError):
+    """Запрошенный размер меньше минимального для формата"""
+
+    def __init__(self, minimum: int):
+        super().__init__(f"минимальный размер для этого формата - {minimum} байт")
+        self.minimum = minimum
+
+
+def _check(target: int, minimum: int):
+    if target < minimum:
+        raise TargetTooSmall(minimum)
+
+
+# ===== Текстовые форматы =====
+
+def _write_wrapped(f, target: int, head: bytes, tail: bytes, block: bytes):
+    _check(target, len(head) + len(tail))
+    f.write(head)
+    _fill(f, target - len(head) - len(tail), block)
+    f.write(tail)
+
+
+def write_txt(f, target: int):
+    _fill(f, target, _text_block())
+
+
+def write_css(f, target: int):
+    head = b"/* QA test file */\nbody {\n  margin: 0;\n  padding: 0;\n}\n/*\n"
+    _write_wrapped(f, target, head, b"\n*/\n", _text_block())
+
+
+def write_js(f, target: int):
+    head = b'// QA test file\nfunction hello() {\n  console.log("Hello World");\n}\n/*\n'
+    _write_wrapped(f, target, head, b"\n*/\n", _text_block())
+
+
+def write_html(f, target: int):
+    head = (b'<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="UTF-8">\n'
+            b'<title>Document</title>\n</head>\n<body>\n<p>')
+    _write_wrapped(f, target, head, b"</p>\n</body>\n</html>\n", _text_block())
+
+
+def write_json(f, target: int):
+    head = b'{\n  "name": "test",\n  "value": 123,\n  "padding": "'
+    _write_wrapped(f, target, head, b'"\n}\n', _text_block(line_breaks=False))
+
+
+def write_svg(f, target: int):
+    head = (b'<?xml version="1.0" encoding="UTF-8"?>\n'
+            b'<svg width="500" height="500" xmlns="http://www.w3.org/2000/svg">\n'
+            b'  <rect width="500" height="500" fill="#FFFFFF"/>\n<!--\n')
+    _write_wrapped(f, target, head, b"\n-->\n</svg>\n", _text_block())
+
+
+# ===== Изображения =====
+
+def _base_image(format_type: str, size: int = 100) -> bytes:
+    from PIL import Image
+    image = Image.new('RGB', (size, size), (255, 255, 255))
+    buffer = io.BytesIO()
+    image.save(buffer, format={'jpg': 'JPEG'}.get(format_type, format_type.upper()))
+    return buffer.getvalue()
+
+
+def _split(total: int, count: int):
+    """Разбиение total на count почти равных частей"""
+    base, extra = divmod(total, count)
+    return [base + (1 if i < extra else 0) for i in range(count)]
+
+
+def _png_padding(f, fill: int):
+    """Вспомогательные чанки PNG (тип paDd: необязательный, частный) общим размером fill"""
+    if fill < 12:
+        return
+    max_data = (1 << 31) - 1
+    count = math.ceil(fill / (max_data + 12))
+    for size in _split(fill, count):
+        data_size = size - 12
+        f.write(struct.pack('>I', data_size) + b'paDd')
+        crc = zlib.crc32(b'paDd')
+        view = memoryview(_noise_block())
+        left = data_size
+        while left > 0:
+            n = min(left, len(view))
+            f.write(view[:n])
+            crc = zlib.crc32(view[:n], crc)
+            left -= n
+        f.write(struct.pack('>I', crc & 0xFFFFFFFF))
+
+
+def write_png(f, target: int, base: Optional[bytes] = None):
+    base = base or _base_image('png')
+    _check(target, len(base))
+    iend = base.rindex(b'IEND') - 4
+    f.write(base[:iend])
+    _png_padding(f, target - len(base))
+    f.write(base[iend:])
+
+
+def write_jpg(f, target: int, base: Optional[bytes] = None):
+    base = base or _base_image('jpg')
+    _check(target, len(base))
+    fill = target - len(base)
+    f.write(base[:2])   # SOI
+    if fill >= 4:
+        for size in _split(fill, math.ceil(fill / (0xFFFF + 2))):
+            f.write(b'\xFF\xFE' + struct.pack('>H', size - 2))
+            _fill(f, size - 4, _text_block())
+    f.write(base[2:])
+
+
+def write_gif(f, target: int, base: Optional[bytes] = None):
+    base = base or _base_image('gif')
+    _check(target, len(base))
+    fill = target - len(base)
+    f.write(base[:-1])
+    if fill >= 3:
+        # Блок комментария: 21 FE, подблоки (длина + до 255 байт), завершающий 00
+        f.write(b'\x21\xFE')
+        body = fill - 3
+        if body == 1:
+            body = 0
+        block = _text_block()
+        while body > 0:
+            n = min(body - 1, 255)
+            if body - (n + 1) == 1:
+                n -= 1              # подблок не может занимать 1 байт
+            f.write(bytes([n]) + block[:n])
+            body -= n + 1
+        f.write(b'\x00')
+    f.write(base[-1:])
+
+
+def write_bmp(f, target: int, base: Optional[bytes] = None):
+    """BMP 24 бит близкой к квадрату формы; остаток - промежуток перед пикселями"""
+    header_size = 54
+    if base is not None:
+        # Готовый BMP (заголовки 14 + 40 байт): промежуток вставляется перед его пикселями
+        _check(target, len(base))
+        gap = target - len(base)
+        f.write(b'BM' + struct.pack('<IHHI', target, 0, 0, header_size + gap) + base[14:header_size])
+        _fill(f, gap, bytes(CHUNK))
+        f.write(base[header_size:])
+        return
+    _check(target, header_size + 12)
+    pixels = (target - header_size) // 3
+    width = max(4, int(math.isqrt(pixels)) // 4 * 4)   # ширина кратна 4 - строки без выравнивания
+    height = (target - header_size) // (width * 3)
+    if height == 0:
+        width, height = 4, 1
+    row = width * 3
+    gap = target - header_size - row * height
+    f.write(b'BM' + struct.pack('<IHHI', target, 0, 0, header_size + gap))
+    f.write(struct.pack('<IiiHHIIiiII', 40, width, height, 1, 24, 0, row * height, 2835, 2835, 0, 0))
+    _fill(f, gap, bytes(CHUNK))
+    _fill(f, row * height, b'\xFF' * CHUNK)
+
+
+def write_ico(f, target: int):
+    """ICO с одним изображением 64x64 в формате PNG"""
+    base = _base_image('png', 64)
+    _check(target, 22 + len(base))
+    png_size = target - 22
+    f.write(struct.pack('<HHH', 0, 1, 1))
+    f.write(struct.pack('<BBBBHHII', 64, 64, 0, 0, 1, 32, png_size, 22))
+    iend = base.rindex(b'IEND') - 4
+    f.write(base[:iend])
+    _png_padding(f, png_size - len(base))
+    f.write(base[iend:])
+
+
+# ===== PDF =====
+
+def _pdf_page_content(number: int, full: bool) -> bytes:
+    if not full:
+        return f"BT /F1 12 Tf 40 800 Td (Page {number}) Tj ET".encode('ascii')
+    lines = [f"BT /F1 9 Tf 11 TL 40 800 Td (Page {number}) Tj T*"]
+    text = _LOREM.strip()
+    for i in range(68):
+        lines.append(f"({i + 1:02d}. {text[(i * 7) % 60:][:88]}) '")
+    lines.append("ET")
+    return "\n".join(lines).encode('ascii')
+
+
+def _pdf_object(number: int, body: bytes) -> bytes:
+    return f"{number} 0 obj\n".encode('ascii') + body + b"\nendobj\n"
+
+
+def _pdf_page(number: int, pages_id: int, content: bytes):
+    page = _pdf_object(number, (
+        f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 595 842] "
+        f"/Resources << /Font << /F1 3 0 R >> >> /Contents {number + 1} 0 R >>"
+    ).encode('ascii'))
+    stream = _pdf_object(number + 1, f"<< /Length {len(content)} >>\nstream\n".encode('ascii')
+                         + content + b"\nendstream")
+    return page, stream
+
+
+def _pdf_tail(page_ids: list, offsets: list, xref_at: int) -> bytes:
+    """Объект Pages, таблица xref и трейлер"""
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    pages = _pdf_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode('ascii'))
+    count = len(offsets) + 1
+    xref = [f"xref\n0 {count}\n", "0000000000 65535 f \n"]
+    xref += [f"{offset:010d} 00000 n \n" for offset in offsets]
+    trailer = f"trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{xref_at + len(pages)}\n%%EOF\n"
+    return pages + "".join(xref).encode('ascii') + trailer.encode('ascii')
+
+
+def _pdf_tail_size(pages: int, kids_size: int, xref_at: int) -> int:
+    """Размер результата _pdf_tail без его построения (kids_size - длина списка /Kids)"""
+    pages_size = len(_pdf_object(2, f"<< /Type /Pages /Kids [] /Count {pages} >>".encode('ascii'))) + kids_size
+    count = 4 + 2 * pages
+    trailer = f"trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{xref_at + pages_size}\n%%EOF\n"
+    return pages_size + len(f"xref\n0 {count}\n") + 20 * count + len(trailer)
+
+
+def _kid_size(page_id: int) -> int:
+    """Длина ссылки "N 0 R" с пробелом-разделителем в списке /Kids"""
+    return len(str(page_id)) + 5
+
+
+def write_pdf(f, target: int):
+    """PDF со страницами текста (шрифт Helvetica без встраивания)"""
+    written = 0
+    offsets = {}
+
+    def put(number: Optional[int], data: bytes):
+        nonlocal written
+        if number is not None:
+            offsets[number] = written
+        f.write(data)
+        written += len(data)
+
+    def tail_size(pages: int, kids_size: int, xref_at: int) -> int:
+        # Размер хвоста зависит от числа страниц и разрядности смещения xref
+        return _pdf_tail_size(pages, max(0, kids_size - 1), xref_at)
+
+    head = b"%PDF-1.4\n%\xE2\xE3\xCF\xD3\n"
+    catalog = _pdf_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+    font = _pdf_object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    short_page = _pdf_page(4, 2, _pdf_page_content(1, full=False))
+    minimum = len(head) + len(catalog) + len(font) + sum(map(len, short_page))
+    minimum += tail_size(1, _kid_size(4), minimum) + 16
+    _check(target, minimum)
+
+    put(None, head)
+    put(1, catalog)
+    put(3, font)
+    page_ids = []
+    kids_size = 0
+    while True:
+        number = 4 + 2 * len(page_ids)
+        page, stream = _pdf_page(number, 2, _pdf_page_content(len(page_ids) + 1, full=True))
+        fits = written + len(page) + len(stream) + tail_size(
+            len(page_ids) + 1, kids_size + _kid_size(number), target) <= target
+        if not fits:
+            if page_ids:
+                break
+            page, stream = short_page
+        put(number, page)
+        put(number + 1, stream)
+        page_ids.append(number)
+        kids_size += _kid_size(number)
+
+    # Остаток - строка комментария перед хвостом (разрядность startxref от него зависит)
+    pad = target - written - tail_size(len(page_ids), kids_size, target)
+    for _ in range(3):
+        pad = target - written - tail_size(len(page_ids), kids_size, written + max(pad, 0))
+    if pad == 1:
+        put(None, b"\n")
+    elif pad > 1:
+        put(None, b"%")
+        _fill(f, pad - 2, _text_block(line_breaks=False))
+        written += pad - 2
+        put(None, b"\n")
+    order = [offsets[i] for i in range(1, max(offsets) + 1) if i != 2]
+    xref_at = written
+    # Объект 2 (Pages) пишется последним, но в xref стоит на своем месте
+    order.insert(1, xref_at)
+    put(None, _pdf_tail(page_ids, order, xref_at))
+
+
+# ===== ZIP и офисные форматы =====
+
+def _zip_to_size(f, target: int, entries: Dict[str, bytes], stream_name: str,
+                 write_stream: Callable[[object, int], None], stream_min: int):
+    """ZIP без сжатия: небольшие записи, затем потоковая запись stream_name.
+
+    Размер потоковой записи подбирается по пробному архиву с запасом, а
+    точный остаток добирается комментарием архива (до 65535 байт).
+    """
+    def build(fp, stream_size: int):
+        with zipfile.ZipFile(fp, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+            # Фиксированная дата - одинаковые архивы при одинаковом размере
+            for name, data in entries.items():
+                archive.writestr(zipfile.ZipInfo(name, date_time=ZIP_DATE), data)
+            with archive.open(zipfile.ZipInfo(stream_name, date_time=ZIP_DATE), 'w', force_zip64=True) as stream:
+                write_stream(stream, stream_size)
+
+    probe = io.BytesIO()
+    build(probe, stream_min)
+    overhead = len(probe.getvalue()) - stream_min
+    # Запас на поля zip64 в центральном каталоге при записи больше 4 ГБ
+    reserve = 256
+    _check(target, overhead + stream_min + reserve)
+
+    start = f.tell()
+    build(f, target - overhead - reserve)
+    size = f.tell() - start
+    comment = target - size
+    if not 0 <= comment <= 0xFFFF:
+        raise ValueError(f"не удалось подобрать размер архива ({size} из {target} байт)")
+    # Длина комментария - последние 2 байта записи End of Central Directory
+    f.seek(start + size - 2)
+    f.write(struct.pack('<H', comment))
+    _fill(f, comment, _text_block(line_breaks=False))
+
+
+def write_zip(f, target: int):
+    entries = {"readme.txt": b"QA test archive: data.bin contains pseudo-random bytes\n"}
+    _zip_to_size(f, target, entries, "data.bin", lambda stream, size: _fill(stream, size, _noise_block()), 0)
+
+
+def write_rar(f, target: int):
+    """RAR5 с одной записью без сжатия; размер заголовка подгоняется длиной имени"""
+    rest = target - RAR_OVERHEAD
+    header = rar_header_size("data.bin", max(rest, 0))
+    _check(target, RAR_OVERHEAD + header)
+    size = rest - header
+    # С уменьшением размера данных его поле в заголовке может стать короче
+    name = "data" + "_" * (header - rar_header_size("data.bin", size)) + ".bin"
+    writer = Rar5Writer(f)
+    writer.add_file(name, size, _blocks(size, _noise_block()))
+    writer.close()
+
+
+def _write_xml_records(stream, size: int, head: bytes, tail: bytes, record: Callable[[int], bytes]):
+    """XML с повторяющимися элементами; остаток до size - пробельные символы"""
+    stream.write(head)
+    left = size - len(head) - len(tail)
+    number = 1
+    while True:
+        data = record(number)
+        if len(data) > left:
+            break
+        stream.write(data)
+        left -= len(data)
+        number += 1
+    _fill(stream, left, b"\n" * CHUNK)
+    stream.write(tail)
+
+
+_DOCX_ENTRIES = {
+    "[Content_Types].xml": (
+        b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        b'<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        b'<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        b'<Default Extension="xml" ContentType="application/xml"/>'
+        b'<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.'
+        b'wordprocessingml.document.main+xml"/></Types>'
+    ),
+    "_rels/.rels": (
+        b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        b'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        b'<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+        b'officeDocument" Target="word/document.xml"/></Relationships>'
+    ),
+}
+
+_XLSX_ENTRIES = {
+    "[Content_Types].xml": (
+        b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        b'<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        b'<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        b'<Default Extension="xml" ContentType="application/xml"/>'
+        b'<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.'
+        b'spreadsheetml.sheet.main+xml"/>'
+        b'<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-'
+        b'officedocument.spreadsheetml.worksheet+xml"/></Types>'
+    ),
+    "_rels/.rels": (
+        b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        b'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        b'<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+        b'officeDocument" Target="xl/workbook.xml"/></Relationships>'
+    ),
+    "xl/workbook.xml": (
+        b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        b'<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        b'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        b'<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        b'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        b'<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+        b'worksheet" Target="worksheets/sheet1.xml"/></Relationships>'
+    ),
+}
+
+
+def write_docx(f, target: int):
+    head = (b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            b'<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>')
+    tail = b'<w:sectPr/></w:body></w:document>'
+    text = _LOREM.strip().encode('ascii') * 4
+
+    def paragraph(number: int) -> bytes:
+        return b'<w:p><w:r><w:t>' + str(number).encode('ascii') + b'. ' + text + b'</w:t></w:r></w:p>\n'
+
+    _zip_to_size(f, target, _DOCX_ENTRIES, "word/document.xml",
+                 lambda stream, size: _write_xml_records(stream, size, head, tail, paragraph), len(head) + len(tail))
+
+
+def write_xlsx(f, target: int):
+    head = (b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+    tail = b'</sheetData></worksheet>'
+    text = _LOREM.strip().encode('ascii')
+
+    def row(number: int) -> bytes:
+        n = str(number).encode('ascii')
+        return (b'<row r="' + n + b'"><c r="A' + n + b'"><v>' + n + b'</v></c><c r="B' + n
+                + b'" t="inlineStr"><is><t>' + text + b'</t></is></c></row>\n')
+
+    _zip_to_size(f, target, _XLSX_ENTRIES, "xl/worksheets/sheet1.xml",
+                 lambda stream, size: _write_xml_records(stream, size, head, tail, row), len(head) + len(tail))
+
+
+# ===== Видео (контейнер без кадров) =====
+
+_FTYP = b'\x00\x00\x00\x20ftypisom\x00\x00\x02\x00isomiso2mp41'
+
+
+def write_mp4(f, target: int):
+    _check(target, len(_FTYP) + 8)
+    f.write(_FTYP)
+    fill = target - len(_FTYP)
+    if fill <= 0xFFFFFFFF:
+        f.write(struct.pack('>I', fill) + b'free')
+        _fill(f, fill - 8, bytes(CHUNK))
+    else:
+        # largesize: 64-битный размер бокса
+        f.write(struct.pack('>I', 1) + b'free' + struct.pack('>Q', fill))
+        _fill(f, fill - 16, bytes(CHUNK))
+
+
+def write_avi(f, target: int):
+    avih = b'avih' + struct.pack('<I', 56) + bytes(56)
+    hdrl = b'LIST' + struct.pack('<I', 4 + len(avih)) + b'hdrl' + avih
+    base = 12 + len(hdrl)
+    _check(target, base + 8)
+    if target > 0xFFFFFFFF:
+        raise ValueError("размер AVI (RIFF) не может превышать 4 ГБ")
+    f.write(b'RIFF' + struct.pack('<I', target - 8) + b'AVI ' + hdrl)
+    fill = target - base - 8
+    # Данные чанка RIFF выравниваются до четной длины байтом-заполнителем
+    data = fill if fill % 2 == 0 else fill - 1
+    f.write(b'JUNK' + struct.pack('<I', data))
+    _fill(f, fill, bytes(CHUNK))
+
+
+WRITERS: Dict[str, Callable] = {
+    'txt': write_txt, 'css': write_css, 'html': write_html, 'js': write_js, 'json': write_json,
+    'svg': write_svg, 'png': write_png, 'jpg': write_jpg, 'jpeg': write_jpg, 'gif': write_gif,
+    'bmp': write_bmp, 'ico': write_ico, 'pdf': write_pdf, 'docx': write_docx, 'xlsx': write_xlsx,
+    'zip': write_zip, 'rar': write_rar, 'mp4': write_mp4, 'avi': write_avi,
+}
+
+
+def write_sized_file(format_type: str, target: int, path: str) -> int:
+    """Записать файл формата format_type размером target байт; возвращает фактический размер.
+
+    Синхронно, выполняется в пуле исполнителей.
+    """
+    writer = WRITERS.get(format_type)
+    if writer is None:
+        raise ValueError(f"формат {format_type} не поддерживает заданный размер")
+    with open(path, 'wb') as f:
+        writer(f, target)
+        size = f.tell()
+    if abs(size - target) > SIZE_TOLERANCE:
+        raise ValueError(f"размер файла {size} байт вместо {target}")
+    return size
@@ -7,6 +7,7 @@ import json
 import random
 from datetime import datetime, timedelta
 from messages import MENU_MSG, get_main_menu, get_back_menu
+from executor import executor
 
 logger = logging.getLogger(__name__)
 
@@ -186,14 +187,14 @@ def generate_user_data():
         'sex': sex
     }
 
+def generate_users(count: int):
+    """Генерация списка пользователей (синхронно, выполняется в пуле исполнителей)"""
+    return [generate_user_data() for _ in range(count)]
+
 async def generate_and_show_users_text(message: Message, state: FSMContext, count: int):
     """Генерация и отображение тестовых данных пользователей в текстовом формате"""
     try:
-        users_data = []
-        
-        for i in range(count):
-            user = generate_user_data()
-            users_data.append(user)
+        users_data = await executor.run("test_data_generator", generate_users, count)
         
         # Формирование сообщения
         result_text = f"👥 <b>Сгенерировано пользователей: {count}</b>\n\n"
@@ -255,11 +256,7 @@ async def generate_and_show_users_text(message: Message, state: FSMContext, coun
 async def generate_and_show_users_json(message: Message, state: FSMContext, count: int):
     """Генерация и отображение тестовых данных пользователей в JSON формате"""
     try:
-        users_data = []
-        
-        for i in range(count):
-            user = generate_user_data()
-            users_data.append(user)
+        users_data = await executor.run("test_data_generator", generate_users, count)
         
         # Формируем JSON
         json_data = json.dumps(users_data, ensure_ascii=False, indent=2)
@@ -0,0 +1,298 @@
+"""Генерация видео MJPEG в контейнерах AVI и MP4.
+
+Кадры рисуются Pillow и сжимаются в JPEG, контейнер собирается без
+внешних библиотек:
+
+* AVI - классический AVI 1.0 (``hdrl``, ``movi``, индекс ``idx1``),
+  кодек ``MJPG``;
+* MP4 - ``ftyp``, ``mdat`` и ``moov`` с таблицами сэмплов, кодек
+  ``jpeg`` (воспроизводят ffmpeg/VLC/QuickTime, но не браузеры - им
+  нужен H.264).
+
+Изображение меняется раз в секунду (таймер и полоса прогресса), поэтому
+рисуется только один кадр на секунду. Остальные кадры ссылаются на уже
+записанные данные: в MP4 несколько сэмплов указывают на одно смещение
+в ``mdat``, в AVI пишутся пустые чанки (кадр повторяет предыдущий).
+Кадры пишутся на диск сразу, в памяти остаются только таблицы индекса.
+"""
+import io
+import re
+import struct
+from typing import List
+from PIL import Image, ImageDraw
+from config import Config
+from plugins.font_registry import get_font
+
+DEFAULT_DURATION = 5
+DEFAULT_FPS = 25
+DEFAULT_SIZE = (640, 360)
+MIN_SIDE = 16
+JPEG_QUALITY = 80
+PRESETS = {'360p': (640, 360), '480p': (854, 480), '720p': (1280, 720), '1080p': (1920, 1080)}
+# Цвет фона меняется по кругу, чтобы смена секунд была заметна
+PALETTE = [(52, 101, 164), (78, 154, 6), (196, 160, 0), (204, 0, 0), (117, 80, 123), (6, 152, 154)]
+TEXT_COLOR = (255, 255, 255)
+PARAMS_PATTERN = re.compile(
+    r'(?P<preset>\b(?:360|480|720|1080)p\b)'
+    r'|(?P<width>\d+)\s*[xх×*]\s*(?P<height>\d+)'
+    r'|(?P<fps>\d+)\s*(?:fps|к/с|кадр\w*)'
+    r'|(?P<minutes>\d+):(?P<seconds>\d{1,2})\b'
+    r'|(?P<duration>\d+(?:[.,]\d+)?)\s*(?P<unit>min|мин\w*|sec|s|сек\w*|с)\b',
+    re.IGNORECASE
+)
+
+
+class VideoParams:
+    """Длительность, частота кадров и разрешение видео"""
+
+    def __init__(self, duration: float = DEFAULT_DURATION, fps: int = DEFAULT_FPS,
+                 width: int = DEFAULT_SIZE[0], height: int = DEFAULT_SIZE[1]):
+        self.duration = duration
+        self.fps = fps
+        self.width = width
+        self.height = height
+
+    @property
+    def frames(self) -> int:
+        return max(1, round(self.duration * self.fps))
+
+    def key(self) -> tuple:
+        return (self.duration, self.fps, self.width, self.height)
+
+    def estimate(self) -> int:
+        """Оценка размера файла сверху: JPEG около 1 байта на 8 пикселей плюс индекс"""
+        unique = int(self.duration) + 1
+        return unique * (self.width * self.height // 4 + 1024) + self.frames * 32 + 4096
+
+    def describe(self) -> str:
+        return f"{format_duration(self.duration)}, {self.fps} fps, {self.width}x{self.height}"
+
+
+def format_duration(seconds: float) -> str:
+    minutes, rest = divmod(int(seconds), 60)
+    return f"{minutes:02d}:{rest:02d}"
+
+
+def parse_video_params(text: str) -> VideoParams:
+    """Параметры из текста вида "10s 30fps 1280x720", "1:30 720p", "2 мин 15 fps".
+
+    Текст без параметров - видео по умолчанию.
+    """
+    params = VideoParams()
+    text = text or ""
+    matches = list(PARAMS_PATTERN.finditer(text))
+    if not matches:
+        return params
+    rest = PARAMS_PATTERN.sub(' ', text).strip(' ,;')
+    if rest:
+        raise ValueError(f"непонятные параметры видео: «{rest}». Пример: 10s 30fps 1280x720")
+
+    for match in matches:
+        if match.group('preset'):
+            params.width, params.height = PRESETS[match.group('preset').lower()]
+        elif match.group('width'):
+            params.width, params.height = int(match.group('width')), int(match.group('height'))
+        elif match.group('fps'):
+            params.fps = int(match.group('fps'))
+        elif match.group('minutes'):
+            params.duration = int(match.group('minutes')) * 60 + int(match.group('seconds'))
+        else:
+            value = float(match.group('duration').replace(',', '.'))
+            params.duration = value * 60 if match.group('unit').lower().startswith(('min', 'мин')) else value
+
+    if not 0 < params.duration <= Config.VIDEO_MAX_DURATION:
+        raise ValueError(f"длительность должна быть от 1 секунды до {format_duration(Config.VIDEO_MAX_DURATION)}")
+    if not 1 <= params.fps <= Config.VIDEO_MAX_FPS:
+        raise ValueError(f"частота кадров должна быть от 1 до {Config.VIDEO_MAX_FPS} fps")
+    if not (MIN_SIDE <= params.width <= Config.VIDEO_MAX_SIDE and MIN_SIDE <= params.height <= Config.VIDEO_MAX_SIDE):
+        raise ValueError(f"разрешение должно быть от {MIN_SIDE} до {Config.VIDEO_MAX_SIDE} пикселей по стороне")
+    return params
+
+
+def render_frame(params: VideoParams, second: int) -> bytes:
+    """Кадр для секунды second: таймер, параметры видео и полоса прогресса (JPEG)"""
+    width, height = params.width, params.height
+    img = Image.new('RGB', (width, height), PALETTE[second % len(PALETTE)])
+    draw = ImageDraw.Draw(img)
+
+    timer = f"{format_duration(second)} / {format_duration(params.duration)}"
+    font = get_font(max(8, min(width // 8, height // 4)))
+    box = draw.textbbox((0, 0), timer, font=font)
+    draw.text(((width - (box[2] - box[0])) / 2, (height - (box[3] - box[1])) / 2 - box[1]),
+              timer, font=font, fill=TEXT_COLOR)
+
+    info = f"{width}x{height} · {params.fps} fps"
+    small = get_font(max(6, height // 16))
+    draw.text((max(2, width // 40), max(2, height // 40)), info, font=small, fill=TEXT_COLOR)
+
+    bar_height = max(2, height // 30)
+    progress = min(1.0, (second + 1) / params.duration)
+    draw.rectangle((0, height - bar_height, int(width * progress), height), fill=TEXT_COLOR)
+
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=JPEG_QUALITY)
+    return buffer.getvalue()
+
+
+class AviMjpegWriter:
+    """AVI 1.0 с потоком MJPEG; повтор кадра - пустой чанк"""
+
+    def __init__(self, f, width: int, height: int, fps: int):
+        self.f = f
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.frames = 0
+        self.max_frame = 0
+        self.index = bytearray()
+        self._write_headers()
+        self.f.write(b'LIST' + struct.pack('<I', 0) + b'movi')
+        self.movi = self.f.tell() - 4
+
+    def _headers(self) -> bytes:
+        avih = struct.pack(
+            '<IIIIIIIIII4I', 1000000 // self.fps, self.max_frame * self.fps, 0, 0x10, self.frames, 0, 1,
+            self.max_frame, self.width, self.height, 0, 0, 0, 0
+        )
+        strh = b'vidsMJPG' + struct.pack(
+            '<IHHIIIIIIIIhhhh', 0, 0, 0, 0, 1, self.fps, 0, self.frames, self.max_frame, 0xFFFFFFFF, 0,
+            0, 0, self.width, self.height
+        )
+        strf = struct.pack('<IiiHH4sIiiII', 40, self.width, self.height, 1, 24, b'MJPG',
+                           self.width * self.height * 3, 0, 0, 0, 0)
+        strl = b'strl' + _chunk(b'strh', strh) + _chunk(b'strf', strf)
+        hdrl = b'hdrl' + _chunk(b'avih', avih) + _chunk(b'LIST', strl)
+        return _chunk(b'LIST', hdrl)
+
+    def _write_headers(self):
+        self.f.write(b'RIFF' + struct.pack('<I', 0) + b'AVI ')
+        self.f.write(self._headers())
+
+    def add_frame(self, data: bytes):
+        offset = self.f.tell() - self.movi
+        self.f.write(b'00dc' + struct.pack('<I', len(data)) + data)
+        if len(data) % 2:
+            self.f.write(b'\0')
+        # AVIIF_KEYFRAME: каждый кадр MJPEG независим
+        self.index += b'00dc' + struct.pack('<III', 0x10, offset, len(data))
+        self.frames += 1
+        self.max_frame = max(self.max_frame, len(data))
+
+    def repeat_frame(self):
+        offset = self.f.tell() - self.movi
+        self.f.write(b'00dc' + struct.pack('<I', 0))
+        self.index += b'00dc' + struct.pack('<III', 0, offset, 0)
+        self.frames += 1
+
+    def close(self):
+        movi_end = self.f.tell()
+        self.f.write(b'idx1' + struct.pack('<I', len(self.index)))
+        self.f.write(self.index)
+        end = self.f.tell()
+        if end > 0xFFFFFFFF:
+            raise ValueError("AVI больше 4 ГБ не поддерживается")
+        self.f.seek(4)
+        self.f.write(struct.pack('<I', end - 8))
+        self.f.seek(12)
+        self.f.write(self._headers())
+        self.f.seek(self.movi - 4)
+        self.f.write(struct.pack('<I', movi_end - self.movi))
+        self.f.seek(end)
+
+
+class Mp4MjpegWriter:
+    """MP4 (ftyp, mdat, moov) с дорожкой MJPEG; повтор кадра - ссылка на те же байты"""
+
+    def __init__(self, f, width: int, height: int, fps: int):
+        self.f = f
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.sizes: List[int] = []
+        self.offsets: List[int] = []
+        self.f.write(_box(b'ftyp', b'isom' + struct.pack('>I', 0x200) + b'isomiso2mp41'))
+        # Размер mdat заранее неизвестен: 64-битный largesize, исправляется в close
+        self.mdat = self.f.tell()
+        self.f.write(struct.pack('>I', 1) + b'mdat' + struct.pack('>Q', 0))
+
+    def add_frame(self, data: bytes):
+        self.offsets.append(self.f.tell())
+        self.sizes.append(len(data))
+        self.f.write(data)
+
+    def repeat_frame(self):
+        self.offsets.append(self.offsets[-1])
+        self.sizes.append(self.sizes[-1])
+
+    def _moov(self) -> bytes:
+        frames = len(self.sizes)
+        duration = frames * 1000 // self.fps
+        matrix = struct.pack('>9I', 0x10000, 0, 0, 0, 0x10000, 0, 0, 0, 0x40000000)
+        mvhd = _full_box(b'mvhd', 0, 0, struct.pack('>IIII', 0, 0, 1000, duration) + struct.pack('>IH', 0x10000, 0x100)
+                         + bytes(10) + matrix + bytes(24) + struct.pack('>I', 2))
+        tkhd = _full_box(b'tkhd', 0, 3, struct.pack('>IIIII', 0, 0, 1, 0, duration) + bytes(8)
+                         + struct.pack('>hhhH', 0, 0, 0, 0) + matrix
+                         + struct.pack('>II', self.width << 16, self.height << 16))
+        mdhd = _full_box(b'mdhd', 0, 0, struct.pack('>IIIIHH', 0, 0, self.fps, frames, 0x55C4, 0))
+        hdlr = _full_box(b'hdlr', 0, 0, struct.pack('>I', 0) + b'vide' + bytes(12) + b'VideoHandler\0')
+        vmhd = _full_box(b'vmhd', 0, 1, bytes(8))
+        dinf = _box(b'dinf', _full_box(b'dref', 0, 0, struct.pack('>I', 1) + _full_box(b'url ', 0, 1, b'')))
+
+        name = b'Photo - JPEG'
+        sample_entry = _box(b'jpeg', bytes(6) + struct.pack('>H', 1) + bytes(16)
+                            + struct.pack('>HHIIIH', self.width, self.height, 0x480000, 0x480000, 0, 1)
+                            + bytes([len(name)]) + name.ljust(31, b'\0') + struct.pack('>Hh', 24, -1))
+        stsd = _full_box(b'stsd', 0, 0, struct.pack('>I', 1) + sample_entry)
+        stts = _full_box(b'stts', 0, 0, struct.pack('>III', 1, frames, 1))
+        # Каждый сэмпл - отдельный чанк: повторы указывают на одно смещение
+        stsc = _full_box(b'stsc', 0, 0, struct.pack('>IIII', 1, 1, 1, 1))
+        stsz = _full_box(b'stsz', 0, 0, struct.pack(f'>II{frames}I', 0, frames, *self.sizes))
+        if self.offsets[-1] > 0xFFFFFFFF:
+            stco = _full_box(b'co64', 0, 0, struct.pack(f'>I{frames}Q', frames, *self.offsets))
+        else:
+            stco = _full_box(b'stco', 0, 0, struct.pack(f'>I{frames}I', frames, *self.offsets))
+        stbl = _box(b'stbl', stsd + stts + stsc + stsz + stco)
+        minf = _box(b'minf', vmhd + dinf + stbl)
+        trak = _box(b'trak', tkhd + _box(b'mdia', mdhd + hdlr + minf))
+        return _box(b'moov', mvhd + trak)
+
+    def close(self):
+        end = self.f.tell()
+        self.f.seek(self.mdat + 8)
+        self.f.write(struct.pack('>Q', end - self.mdat))
+        self.f.seek(end)
+        self.f.write(self._moov())
+
+
+def _chunk(fourcc: bytes, data: bytes) -> bytes:
+    return fourcc + struct.pack('<I', len(data)) + data + (b'\0' if len(data) % 2 else b'')
+
+
+def _box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack('>I', 8 + len(payload)) + box_type + payload
+
+
+def _full_box(box_type: bytes, version: int, flags: int, payload: bytes) -> bytes:
+    return _box(box_type, struct.pack('>I', (version << 24) | flags) + payload)
+
+
+WRITERS = {'avi': AviMjpegWriter, 'mp4': Mp4MjpegWriter}
+
+
+def write_video(format_type: str, params: VideoParams, path: str) -> int:
+    """Записать видео в path; возвращает размер файла.
+
+    Синхронно, выполняется в пуле исполнителей.
+    """
+    with open(path, 'wb') as f:
+        writer = WRITERS[format_type](f, params.width, params.height, params.fps)
+        shown = None
+        for frame in range(params.frames):
+            second = frame // params.fps
+            if second == shown:
+                writer.repeat_frame()
+                continue
+            writer.add_frame(render_frame(params, second))
+            shown = second
+        writer.close()
+        return f.tell()
@@ -0,0 +1,221 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey, StateType
+from aiogram.fsm.storage.memory import MemoryStorage
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def build_key(key: StorageKey) -> str:
+    """Строковый ключ записи FSM"""
+    parts = [str(key.bot_id), str(key.chat_id), str(key.user_id)]
+    if key.thread_id:
+        parts.append(f"t{key.thread_id}")
+    business_connection_id = getattr(key, 'business_connection_id', None)
+    if business_connection_id:
+        parts.append(f"b{business_connection_id}")
+    parts.append(key.destiny)
+    return ":".join(parts)
+
+
+class _Entry:
+    __slots__ = ('state', 'data', 'touched', 'saved')
+
+    def __init__(self, state: Optional[str], data: dict, touched: float, saved: float):
+        self.state = state
+        self.data = data
+        self.touched = touched
+        # Время обращения, записанное в базу (updated_at)
+        self.saved = saved
+
+
+class SQLiteStorage(BaseStorage):
+    """FSM-хранилище в SQLite (WAL) с отложенной записью.
+
+    Чтение и запись идут через кэш в памяти, а измененные записи сбрасываются
+    на диск одной транзакцией раз в ``flush_interval`` секунд и при закрытии.
+    Записи, к которым не обращались дольше ``state_ttl`` секунд, удаляются
+    из кэша и базы. Время обращения при чтении сохраняется не чаще раза в
+    ``state_ttl / 10`` секунд, и на столько же дольше строка живет в базе:
+    запись, активная в кэше, из базы не удаляется. Кэш принадлежит одному процессу: для нескольких процессов
+    бота используйте Redis.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0, state_ttl: int = 86400):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+        self.state_ttl = state_ttl
+        self._touch_interval = state_ttl / 10
+        self._cache: Dict[str, _Entry] = {}
+        self._dirty: set = set()
+        self._lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._last_eviction = time.time()
+        # Соединение используется только из одного потока
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fsm-sqlite")
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS fsm ("
+            "key TEXT PRIMARY KEY, state TEXT, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS fsm_updated_at ON fsm(updated_at)")
+        self._conn.commit()
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._io, func, *args)
+
+    def _load(self, key: str):
+        return self._conn.execute(
+            "SELECT state, data, updated_at FROM fsm WHERE key = ?", (key,)
+        ).fetchone()
+
+    async def _get_entry(self, key: StorageKey) -> _Entry:
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+        storage_key = build_key(key)
+        entry = self._cache.get(storage_key)
+        now = time.time()
+        if entry is None:
+            row = await self._run(self._load, storage_key)
+            entry = self._cache.get(storage_key)
+            if entry is None:
+                if row and now - row[2] < self.state_ttl + self._touch_interval:
+                    entry = _Entry(row[0], json.loads(row[1]), now, row[2])
+                else:
+                    entry = _Entry(None, {}, now, now)
+                self._cache[storage_key] = entry
+        entry.touched = now
+        # Диалог, из которого только читают, тоже продлевает строку в базе
+        if now - entry.saved >= self._touch_interval and (entry.state is not None or entry.data):
+            self._dirty.add(storage_key)
+        return entry
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        entry = await self._get_entry(key)
+        entry.state = state.state if isinstance(state, State) else state
+        self._dirty.add(build_key(key))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        entry = await self._get_entry(key)
+        return entry.state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        entry = await self._get_entry(key)
+        entry.data = dict(data)
+        self._dirty.add(build_key(key))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        entry = await self._get_entry(key)
+        return entry.data.copy()
+
+    def _write(self, rows: list, deleted: list, expire_before: Optional[float]):
+        with self._conn:
+            if rows:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO fsm (key, state, data, updated_at) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+            if deleted:
+                self._conn.executemany("DELETE FROM fsm WHERE key = ?", [(key,) for key in deleted])
+            if expire_before is not None:
+                self._conn.execute("DELETE FROM fsm WHERE updated_at < ?", (expire_before,))
+
+    async def flush(self):
+        """Сброс измененных записей на диск и удаление устаревших"""
+        async with self._lock:
+            now = time.time()
+            rows, deleted = [], []
+            for storage_key in self._dirty:
+                entry = self._cache.get(storage_key)
+                if entry is None:
+                    continue
+                if entry.state is None and not entry.data:
+                    deleted.append(storage_key)
+                    continue
+                try:
+                    data = json.dumps(entry.data, ensure_ascii=False)
+                except (TypeError, ValueError) as e:
+                    # Запись остается в памяти, но не сохраняется: остальные сбрасываются как обычно
+                    logger.error(f"Данные FSM {storage_key} не сериализуются в JSON и не сохранены: {e}")
+                    continue
+                rows.append((storage_key, entry.state, data, entry.touched))
+                entry.saved = entry.touched
+            self._dirty.clear()
+
+            expire_before = None
+            if now - self._last_eviction >= min(self.state_ttl, 60):
+                stale_before = now - self.state_ttl
+                self._last_eviction = now
+                for storage_key, entry in list(self._cache.items()):
+                    if entry.touched < stale_before:
+                        del self._cache[storage_key]
+                # updated_at отстает от времени обращения не больше чем на _touch_interval
+                expire_before = stale_before - self._touch_interval
+
+            if rows or deleted or expire_before is not None:
+                try:
+                    await self._run(self._write, rows, deleted, expire_before)
+                except Exception as e:
+                    logger.error(f"Ошибка записи FSM в SQLite: {e}", exc_info=True)
+                    # Повторим запись при следующем сбросе
+                    self._dirty.update(row[0] for row in rows)
+                    self._dirty.update(deleted)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка сброса FSM в SQLite: {e}", exc_info=True)
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
+        await self._run(self._conn.close)
+        self._io.shutdown(wait=True)
+
+
+def create_storage() -> BaseStorage:
+    """Создание FSM-хранилища по настройке FSM_STORAGE (memory, sqlite, redis)"""
+    storage_type = Config.FSM_STORAGE.lower()
+
+    if storage_type == 'sqlite':
+        logger.info(f"FSM-хранилище: SQLite ({Config.FSM_SQLITE_PATH})")
+        return SQLiteStorage(
+            Config.FSM_SQLITE_PATH,
+            flush_interval=Config.FSM_FLUSH_INTERVAL,
+            state_ttl=Config.FSM_STATE_TTL
+        )
+
+    if storage_type == 'redis':
+        try:
+            from aiogram.fsm.storage.redis import RedisStorage
+        except ImportError:
+            raise RuntimeError("Для FSM_STORAGE=redis установите пакет redis: pip install redis")
+        logger.info("FSM-хранилище: Redis")
+        # TTL обновляется при каждой записи, поэтому удаляются только неактивные диалоги
+        return RedisStorage.from_url(
+            Config.FSM_REDIS_URL,
+            state_ttl=Config.FSM_STATE_TTL,
+            data_ttl=Config.FSM_STATE_TTL
+        )
+
+    if storage_type != 'memory':
+        logger.warning(f"Неизвестный тип FSM-хранилища '{storage_type}', используется memory")
+    return MemoryStorage()
@@ -0,0 +1,194 @@
+import asyncio
+import html
+import logging
+import time
+from typing import AsyncIterator, List, Optional
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import Message
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_LIMIT = 4096        # лимит Telegram на текст сообщения (в UTF-16 единицах)
+CURSOR = " ▌"               # признак того, что ответ еще генерируется
+PLACEHOLDER = "⏳ Генерирую ответ..."
+MAX_EDIT_INTERVAL = 10.0
+
+
+def utf16_len(text: str) -> int:
+    """Длина строки так, как ее считает Telegram"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _cut_index(text: str, limit: int) -> int:
+    """Наибольший индекс, до которого текст укладывается в limit UTF-16 единиц"""
+    if utf16_len(text) <= limit:
+        return len(text)
+    units = 0
+    for index, char in enumerate(text):
+        units += 2 if ord(char) > 0xFFFF else 1
+        if units > limit:
+            return index
+    return len(text)
+
+
+def split_text(text: str, limit: int = MESSAGE_LIMIT) -> List[str]:
+    """Разбиение текста на части не длиннее limit.
+
+    Граница ищется по абзацу, строке или пробелу во второй половине окна.
+    Разбиение устойчиво к дописыванию: уже заполненные части при росте
+    текста не меняются, поэтому отправленные сообщения не переписываются.
+    """
+    parts = []
+    while text:
+        cut = _cut_index(text, limit)
+        if cut < len(text):
+            window = text[:cut]
+            for separator in ("\n\n", "\n", " "):
+                position = window.rfind(separator)
+                if position >= cut // 2:
+                    cut = position + len(separator)
+                    break
+        parts.append(text[:cut])
+        text = text[cut:]
+    return parts
+
+
+class TelegramStreamRenderer:
+    """Постепенный вывод потокового ответа LLM в сообщения Telegram.
+
+    Сразу отправляет сообщение-заглушку, а приходящие фрагменты текста
+    копит в буфере и показывает правками ``edit_message_text`` не чаще
+    ``edit_interval``: чтение потока и правки сообщений идут независимо,
+    так что ожидание лимитов Telegram не тормозит получение токенов.
+    Текст длиннее 4096 символов продолжается в новых сообщениях,
+    HTML экранируется. При ``TelegramRetryAfter`` промежуточные правки
+    пропускаются до конца паузы, а интервал увеличивается; итоговая правка
+    повторяется, пока не пройдет.
+    """
+
+    def __init__(self, message: Message, edit_interval: float = None, placeholder: str = PLACEHOLDER):
+        self.message = message
+        if edit_interval is None:
+            # В группах лимит на сообщения бота жестче, чем в личном чате
+            edit_interval = Config.AI_STREAM_EDIT_INTERVAL if message.chat.type == 'private' \
+                else Config.AI_STREAM_GROUP_EDIT_INTERVAL
+        self.edit_interval = edit_interval
+        self.placeholder = placeholder
+        self.text = ""
+        self.messages: List[Message] = []
+        self.shown: List[str] = []
+        self.edits = 0
+        self.throttled = 0
+        self.first_token_at: Optional[float] = None
+        self._blocked_until = 0.0
+
+    async def render(self, deltas: AsyncIterator[str]) -> str:
+        """Показать поток фрагментов; возвращает полный текст ответа"""
+        loop = asyncio.get_running_loop()
+        started_at = time.perf_counter()
+        await self._request(lambda: self.message.answer(self.placeholder), final=True, on_done=self._append)
+
+        changed = asyncio.Event()
+
+        async def read():
+            async for delta in deltas:
+                if self.first_token_at is None:
+                    self.first_token_at = time.perf_counter() - started_at
+                self.text += delta
+                changed.set()
+
+        reader = asyncio.create_task(read())
+        try:
+            next_edit = 0.0
+            while not reader.done():
+                waiter = asyncio.ensure_future(changed.wait())
+                await asyncio.wait({reader, waiter}, return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                if reader.done():
+                    break
+                # Копим фрагменты до момента, когда правка разрешена
+                delay = max(next_edit, self._blocked_until) - loop.time()
+                if delay > 0:
+                    await asyncio.wait({reader}, timeout=delay)
+                    if reader.done():
+                        break
+                changed.clear()
+                await self._sync(final=False)
+                next_edit = loop.time() + self.edit_interval
+            await reader
+        except asyncio.CancelledError:
+            reader.cancel()
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка при чтении потокового ответа: {e}", exc_info=True)
+            self.text += f"\n\n❌ {e}"
+
+        await self._sync(final=True)
+        logger.info(
+            f"Потоковый ответ: первый фрагмент через "
+            f"{self.first_token_at if self.first_token_at is not None else 0:.2f} с, "
+            f"всего {time.perf_counter() - started_at:.2f} с, правок {self.edits}, "
+            f"сообщений {len(self.messages)}, пауз по лимиту {self.throttled}"
+        )
+        return self.text
+
+    def _append(self, message: Message):
+        self.messages.append(message)
+        self.shown.append(self.placeholder)
+
+    async def _sync(self, final: bool):
+        """Привести отправленные сообщения в соответствие с буфером"""
+        parts = split_text(self.text, MESSAGE_LIMIT - len(CURSOR)) or [""]
+        for index, part in enumerate(parts):
+            if not part.strip():
+                shown = "❌ Пустой ответ" if final else self.placeholder
+            else:
+                shown = html.escape(part, quote=False)
+                if not final and index == len(parts) - 1:
+                    shown += CURSOR
+            if index < len(self.messages):
+                if self.shown[index] == shown:
+                    continue
+                target = self.messages[index]
+                if await self._request(lambda: target.edit_text(shown, parse_mode="HTML"), final):
+                    self.edits += 1
+                    self.shown[index] = shown
+            else:
+                sent = []
+                await self._request(lambda: self.message.answer(shown, parse_mode="HTML"), final,
+                                    on_done=sent.append)
+                if not sent:
+                    return  # следующая синхронизация отправит продолжение
+                self.messages.append(sent[0])
+                self.shown.append(shown)
+
+    async def _request(self, factory, final: bool, on_done=None) -> bool:
+        """Вызов Bot API с учетом TelegramRetryAfter"""
+        while True:
+            if final:
+                delay = self._blocked_until - asyncio.get_running_loop().time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            try:
+                result = await factory()
+            except TelegramRetryAfter as e:
+                self.throttled += 1
+                self.edit_interval = min(self.edit_interval * 2, MAX_EDIT_INTERVAL)
+                self._blocked_until = asyncio.get_running_loop().time() + e.retry_after
+                logger.warning(f"Лимит Telegram на правки, пауза {e.retry_after} с")
+                if final:
+                    continue
+                return False
+            except TelegramBadRequest as e:
+                if "message is not modified" in str(e):
+                    return True
+                logger.warning(f"Не удалось обновить сообщение: {e}")
+                return False
+            except TelegramAPIError as e:
+                logger.warning(f"Ошибка Bot API при выводе ответа: {e}")
+                return False
+            if on_done is not None:
+                on_done(result)
+            return True
+
@@ -0,0 +1,51 @@
+import asyncio
+import pytest
+from ai_router import AIRouter, CLOSED, is_retryable
+
+
+class StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def test_key_errors_fail_over_but_bad_requests_do_not():
+    assert is_retryable(StatusError(401))
+    assert is_retryable(StatusError(403))
+    assert not is_retryable(StatusError(400))
+
+
+@pytest.mark.parametrize("status", [401, 400])
+def test_hedge_error_does_not_abort_primary(status):
+    async def scenario():
+        router = AIRouter(['openai', 'deepseek'], hedge=True, hedge_min_delay=0.01, hedge_max_delay=0.01)
+        calls = []
+
+        async def call(provider: str) -> str:
+            calls.append(provider)
+            if provider == 'deepseek':
+                raise StatusError(status)
+            await asyncio.sleep(0.2)
+            return "ответ openai"
+
+        assert await router.route('openai', ['openai', 'deepseek'], call) == "ответ openai"
+        assert calls == ['openai', 'deepseek']
+        assert router.hedges == 1
+        assert router.health['openai'].state == CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_last_request_error_is_raised():
+    async def scenario():
+        router = AIRouter(['openai', 'deepseek'], hedge=True, hedge_min_delay=0.01, hedge_max_delay=0.01)
+
+        async def call(provider: str) -> str:
+            if provider == 'openai':
+                await asyncio.sleep(0.1)
+            raise StatusError(400)
+
+        with pytest.raises(StatusError):
+            await router.route('openai', ['openai', 'deepseek'], call)
+
+    asyncio.run(scenario())
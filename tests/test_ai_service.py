@@ -0,0 +1,63 @@
+import asyncio
+import pytest
+from ai_cache import AICache
+from ai_router import AIRouter, HALF_OPEN
+from ai_service import AsyncAIService
+
+
+def make_service(tmp_path, router: AIRouter, providers=('openai',)) -> AsyncAIService:
+    service = AsyncAIService(cache=AICache(str(tmp_path / "ai_cache.sqlite3")), router=router)
+    service._init_clients = lambda: None
+    service._client = lambda provider: object() if provider in providers else None
+    service._available = lambda: list(router.providers)
+    return service
+
+
+def half_open_router() -> AIRouter:
+    router = AIRouter(['openai'], failure_threshold=1, cooldown=0)
+    router.record('openai', ConnectionError("down"))
+    return router
+
+
+async def endless_stream(*args):
+    yield "первый"
+    await asyncio.sleep(3600)
+    yield "второй"
+
+
+@pytest.mark.parametrize("stop", ["close", "cancel"])
+def test_interrupted_half_open_stream_releases_trial(tmp_path, stop):
+    async def scenario():
+        router = half_open_router()
+        service = make_service(tmp_path, router)
+        service._chat_completion_stream = endless_stream
+        stream = service.stream_text("prompt", "openai", temperature=0)
+
+        if stop == "close":
+            assert await stream.__anext__() == "первый"
+            await stream.aclose()
+        else:
+            async def consume():
+                async for _ in stream:
+                    pass
+            task = asyncio.ensure_future(consume())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        assert router.health['openai'].state == HALF_OPEN
+        assert router.pick('openai', ['openai']) == 'openai'
+
+    asyncio.run(scenario())
+
+
+def test_stream_without_client_releases_trial(tmp_path):
+    async def scenario():
+        router = half_open_router()
+        service = make_service(tmp_path, router, providers=())
+        chunks = [chunk async for chunk in service.stream_text("prompt", "openai", temperature=0)]
+        assert chunks[-1].startswith("❌")
+        assert router.pick('openai', ['openai']) == 'openai'
+
+    asyncio.run(scenario())
@@ -0,0 +1,44 @@
+import random
+import time
+from itertools import product
+from plugins.pairwise_engine import Constraints
+
+
+def random_pairs(sizes, count, seed):
+    """Случайные запрещенные пары значений (как в tools/pairwise_bench.py)"""
+    rng = random.Random(seed)
+    clauses = []
+    for _ in range(count):
+        first, second = rng.sample(range(len(sizes)), 2)
+        clauses.append([(first, [rng.randrange(sizes[first])]), (second, [rng.randrange(sizes[second])])])
+    return clauses
+
+
+def test_count_valid_matches_full_product():
+    rng = random.Random(1)
+    for _ in range(200):
+        sizes = [rng.randint(1, 4) for _ in range(rng.randint(2, 6))]
+        clauses = []
+        for _ in range(rng.randint(1, 6)):
+            params = rng.sample(range(len(sizes)), rng.randint(1, min(3, len(sizes))))
+            clauses.append([(param, rng.sample(range(sizes[param]), rng.randint(1, sizes[param])))
+                            for param in params])
+        constraints = Constraints(sizes, clauses)
+        expected = sum(1 for row in product(*map(range, sizes)) if not constraints.violates(row))
+        assert constraints.count_valid() == expected
+
+
+def test_count_valid_chain_is_fast():
+    constraints = Constraints([6] * 14, [[(i, [0, 1, 2]), (i + 1, [3, 4])] for i in range(13)])
+    started_at = time.perf_counter()
+    assert constraints.count_valid() == 3856118400
+    assert time.perf_counter() - started_at < 1
+
+
+def test_count_valid_constrained_20x10_in_bounded_time():
+    sizes = [10] * 20
+    constraints = Constraints(sizes, random_pairs(sizes, 20, seed=0))
+    started_at = time.perf_counter()
+    count = constraints.count_valid()
+    assert time.perf_counter() - started_at < 1
+    assert 0 < count < 10 ** 20
@@ -0,0 +1,166 @@
+"""Бенчмарк AIService на локальной заглушке LLM (сеть и ключи не нужны).
+
+Сравнивает асинхронный сервис (параллельные запросы через общий пул
+соединений) с последовательными вызовами синхронного фасада и измеряет
+задержку event loop, пока запросы в работе. Для потокового режима выводит
+время до первого фрагмента ответа.
+
+    python tools/ai_bench.py --requests 40 --concurrency 8 --ttft-ms 300 --token-ms 5
+    python tools/ai_bench.py --providers claude deepseek
+    # openai деградировал: 30% ошибок 5xx и 10% ответов дольше на 5 с
+    python tools/ai_bench.py --providers openai --skip-sync --degrade openai \
+        --degraded-error-rate 0.3 --degraded-slow-rate 0.1 --hedge
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config  # noqa: E402
+from fake_llm_server import FakeLLM, serve  # noqa: E402
+
+
+def configure(port: int, degraded: str = None, degraded_port: int = None):
+    """Направить все провайдеры на заглушку (деградировавший - на отдельную)"""
+    base = f"http://127.0.0.1:{port}"
+    Config.OPENAI_API_KEY = Config.ANTHROPIC_API_KEY = Config.DEEPSEEK_API_KEY = "fake"
+    Config.OPENAI_BASE_URL = Config.DEEPSEEK_BASE_URL = f"{base}/v1"
+    Config.ANTHROPIC_BASE_URL = base
+    if degraded:
+        degraded_base = f"http://127.0.0.1:{degraded_port}"
+        if degraded == "claude":
+            Config.ANTHROPIC_BASE_URL = degraded_base
+        else:
+            setattr(Config, f"{degraded.upper()}_BASE_URL", f"{degraded_base}/v1")
+    Config.AI_MAX_RETRIES = 0
+    # Бенчмарк повторяет одни и те же запросы - кэш исказил бы замеры
+    Config.AI_CACHE_ENABLED = False
+
+
+async def loop_lag_monitor(samples: list, stop: asyncio.Event, interval: float = 0.01):
+    """Насколько позже запланированного просыпается event loop"""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - expected))
+
+
+async def bench_async(provider: str, requests: int, concurrency: int):
+    from ai_service import AsyncAIService
+    service = AsyncAIService(provider_limit=concurrency)
+    # Прогрев: создание клиентов и SSL-контекста не входит в замер
+    await service.generate_text("warm-up", provider, max_tokens=1)
+    lag, stop = [], asyncio.Event()
+    monitor = asyncio.create_task(loop_lag_monitor(lag, stop))
+
+    # Не больше concurrency запросов одновременно: задержка - это время ответа, а не очередь
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with slots:
+            call_started = time.perf_counter()
+            text = await service.generate_text(f"Фича {i}: вход по email", provider, max_tokens=200)
+            return text, time.perf_counter() - call_started
+
+    started_at = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started_at
+    stop.set()
+    await monitor
+    await service.close()
+
+    errors = sum(1 for text, _ in results if text.startswith("❌"))
+    latencies = sorted(latency for _, latency in results)
+    print(f"{provider:>9} async  x{concurrency:<3}: {elapsed:6.2f} с, {requests / elapsed:6.1f} запросов/с, "
+          f"ошибок {errors}, задержка p50/p95/max {latencies[len(latencies) // 2] * 1000:.0f}/"
+          f"{latencies[int(len(latencies) * 0.95)] * 1000:.0f}/{latencies[-1] * 1000:.0f} мс, "
+          f"макс. задержка loop {max(lag) * 1000:.1f} мс, метрики {service.get_metrics()[provider]}")
+    if service.router is not None:
+        print(f"{'':>9} маршрутизация: {service.router.get_metrics()}")
+
+
+async def bench_stream(provider: str, requests: int, concurrency: int):
+    """Время до первого фрагмента при потоковой генерации против полного ответа"""
+    from ai_service import AsyncAIService
+    service = AsyncAIService(provider_limit=concurrency)
+    await service.generate_text("warm-up", provider, max_tokens=1)
+
+    async def one(i: int):
+        started_at = time.perf_counter()
+        first = None
+        async for _ in service.stream_text(f"Фича {i}: вход по email", provider, max_tokens=200):
+            if first is None:
+                first = time.perf_counter() - started_at
+        return first, time.perf_counter() - started_at
+
+    timings = await asyncio.gather(*(one(i) for i in range(requests)))
+    await service.close()
+    ttft = sorted(first for first, _ in timings)
+    total = sorted(full for _, full in timings)
+    print(f"{provider:>9} stream x{concurrency:<3}: первый фрагмент p50 {ttft[len(ttft) // 2] * 1000:.0f} мс, "
+          f"полный ответ p50 {total[len(total) // 2] * 1000:.0f} мс")
+
+
+def bench_sync(provider: str, requests: int):
+    from ai_service import AIService
+    service = AIService()
+    started_at = time.perf_counter()
+    for i in range(requests):
+        service.generate_text(f"Фича {i}: вход по email", provider, max_tokens=200)
+    elapsed = time.perf_counter() - started_at
+    service.close()
+    print(f"{provider:>9} sync   x1  : {elapsed:6.2f} с, {requests / elapsed:6.1f} запросов/с")
+
+
+async def main_async(args):
+    runner = await serve("127.0.0.1", args.port, FakeLLM(args.ttft_ms, args.token_ms, args.tokens))
+    degraded_runner = None
+    if args.degrade:
+        degraded_runner = await serve("127.0.0.1", args.port + 1, FakeLLM(
+            args.ttft_ms, args.token_ms, args.tokens, args.degraded_error_rate,
+            slow_rate=args.degraded_slow_rate, slow_ms=args.degraded_slow_ms
+        ))
+    try:
+        for provider in args.providers:
+            await bench_async(provider, args.requests, args.concurrency)
+            await bench_stream(provider, args.requests, args.concurrency)
+            if not args.skip_sync:
+                # Синхронный фасад блокирует вызывающий поток - запускаем его вне event loop
+                await asyncio.to_thread(bench_sync, provider, min(args.requests, args.sync_requests))
+    finally:
+        await runner.cleanup()
+        if degraded_runner is not None:
+            await degraded_runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк AIService на заглушке LLM")
+    parser.add_argument("--port", type=int, default=8092)
+    parser.add_argument("--providers", nargs="+", default=["openai", "claude", "deepseek"])
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--sync-requests", type=int, default=10, help="Сколько запросов в синхронном прогоне")
+    parser.add_argument("--skip-sync", action="store_true")
+    parser.add_argument("--ttft-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=2)
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--degrade", choices=["openai", "claude", "deepseek"],
+                        help="Провайдер на отдельной заглушке с ошибками и медленными ответами")
+    parser.add_argument("--degraded-error-rate", type=float, default=0.3)
+    parser.add_argument("--degraded-slow-rate", type=float, default=0.1)
+    parser.add_argument("--degraded-slow-ms", type=float, default=5000)
+    parser.add_argument("--no-failover", action="store_true", help="Без переключения на другого провайдера")
+    parser.add_argument("--hedge", action="store_true", help="Хеджирование вторым провайдером после p95")
+    args = parser.parse_args()
+    configure(args.port, args.degrade, args.port + 1)
+    Config.AI_FAILOVER = not args.no_failover
+    Config.AI_HEDGE = args.hedge
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
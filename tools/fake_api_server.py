@@ -0,0 +1,108 @@
+"""Локальный HTTP-сервер для проверки валидатора API и нагрузочного режима.
+
+Эндпоинты:
+    /json                   - небольшой JSON
+    /delay?ms=50&jitter=20  - ответ с задержкой (jitter - случайная добавка, мс)
+    /flaky?rate=0.1         - с вероятностью rate отвечает 500, иначе 200
+    /status/<code>          - ответ с заданным статусом
+    /big?mb=10              - большой ответ с Content-Length
+    /stream?mb=100          - большой потоковый ответ без Content-Length
+    /drop                   - обрыв соединения без ответа
+
+    python tools/fake_api_server.py --port 8090
+    # в боте: LOAD 500x20 GET http://127.0.0.1:8090/delay?ms=30&jitter=30
+"""
+import argparse
+import asyncio
+import random
+
+from aiohttp import web
+
+CHUNK = b'x' * 65536
+
+
+async def json_handler(request: web.Request):
+    return web.json_response({"id": 1, "title": "fake", "items": list(range(10))})
+
+
+async def delay_handler(request: web.Request):
+    delay = float(request.query.get('ms', 50)) + random.uniform(0, float(request.query.get('jitter', 0)))
+    await asyncio.sleep(delay / 1000)
+    return web.json_response({"delay_ms": round(delay, 2)})
+
+
+async def flaky_handler(request: web.Request):
+    if random.random() < float(request.query.get('rate', 0.1)):
+        return web.json_response({"error": "random failure"}, status=500)
+    return web.json_response({"ok": True})
+
+
+async def status_handler(request: web.Request):
+    return web.json_response({"status": int(request.match_info['code'])},
+                             status=int(request.match_info['code']))
+
+
+async def big_handler(request: web.Request):
+    size = int(float(request.query.get('mb', 10)) * 1024 * 1024)
+    response = web.StreamResponse(headers={'Content-Type': 'application/octet-stream'})
+    response.content_length = size
+    await response.prepare(request)
+    return await _write(request, response, size)
+
+
+async def stream_handler(request: web.Request):
+    size = int(float(request.query.get('mb', 100)) * 1024 * 1024)
+    response = web.StreamResponse(headers={'Content-Type': 'text/plain'})
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+    return await _write(request, response, size)
+
+
+async def _write(request: web.Request, response: web.StreamResponse, size: int):
+    sent = 0
+    try:
+        while sent < size:
+            chunk = CHUNK[:size - sent]
+            await response.write(chunk)
+            sent += len(chunk)
+        await response.write_eof()
+    except (ConnectionResetError, asyncio.CancelledError):
+        pass  # клиент прервал чтение - это ожидаемо
+    return response
+
+
+async def drop_handler(request: web.Request):
+    request.transport.close()
+    return web.Response()
+
+
+def create_app() -> web.Application:
+    app = web.Application()
+    app.router.add_get('/json', json_handler)
+    app.router.add_route('*', '/delay', delay_handler)
+    app.router.add_route('*', '/flaky', flaky_handler)
+    app.router.add_route('*', '/status/{code:\\d+}', status_handler)
+    app.router.add_get('/big', big_handler)
+    app.router.add_get('/stream', stream_handler)
+    app.router.add_route('*', '/drop', drop_handler)
+    return app
+
+
+async def serve(host: str, port: int) -> web.AppRunner:
+    """Запуск сервера; возвращает AppRunner (удобно для тестов)"""
+    runner = web.AppRunner(create_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заглушка API для локальных проверок")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    args = parser.parse_args()
+    web.run_app(create_app(), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""Локальная заглушка LLM-провайдеров для проверки AIService без сети.
+
+Совместима по формату с OpenAI/DeepSeek (POST /v1/chat/completions) и
+Anthropic (POST /v1/messages), включая потоковые ответы (stream=true, SSE).
+Ответ детерминирован по тексту запроса, задержки настраиваются.
+
+    python tools/fake_llm_server.py --port 8091 --ttft-ms 300 --token-ms 20
+    # .env:
+    OPENAI_API_KEY=fake
+    OPENAI_BASE_URL=http://127.0.0.1:8091/v1
+    ANTHROPIC_API_KEY=fake
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8091
+    DEEPSEEK_API_KEY=fake
+    DEEPSEEK_BASE_URL=http://127.0.0.1:8091/v1
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+
+from aiohttp import web
+
+WORDS = (
+    "тест проверка шаг результат ожидаемый пользователь система кнопка поле форма "
+    "ввод данные сообщение ошибка статус запрос ответ страница экран приоритет "
+    "предусловие сценарий валидация авторизация"
+).split()
+
+
+class FakeLLM:
+    def __init__(self, ttft_ms: float = 200, token_ms: float = 10, tokens: int = 120,
+                 error_rate: float = 0.0, jitter: float = 0.2, slow_rate: float = 0.0, slow_ms: float = 0):
+        self.ttft = ttft_ms / 1000
+        self.slow_rate = slow_rate
+        self.slow = slow_ms / 1000
+        self.token_delay = token_ms / 1000
+        self.tokens = tokens
+        self.error_rate = error_rate
+        self.jitter = jitter
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def completion_tokens(self, prompt: str, max_tokens: int) -> list:
+        """Детерминированный ответ: одинаковый запрос - одинаковый текст"""
+        rng = random.Random(hashlib.sha256(prompt.encode()).digest())
+        count = min(self.tokens, max_tokens or self.tokens)
+        tokens = [f"Ответ на: {prompt[:40].strip()}\n"]
+        tokens += [rng.choice(WORDS) + ("\n" if i % 12 == 11 else " ") for i in range(count - 1)]
+        return tokens
+
+    def delay(self, base: float) -> float:
+        return base * random.uniform(1 - self.jitter, 1 + self.jitter) if base else 0
+
+    def first_token_delay(self) -> float:
+        """Задержка до первого токена; с вероятностью slow_rate - аномально долгая"""
+        return self.delay(self.ttft) + (self.slow if random.random() < self.slow_rate else 0)
+
+    def should_fail(self) -> bool:
+        return random.random() < self.error_rate
+
+
+def prompt_of(messages: list) -> str:
+    parts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            content = " ".join(block.get("text", "") for block in content if isinstance(block, dict))
+        if message.get("role") == "user":
+            parts.append(content or "")
+    return "\n".join(parts)
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+async def sse(response: web.StreamResponse, data: dict, event: str = None):
+    prefix = f"event: {event}\n" if event else ""
+    await response.write(f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n".encode())
+
+
+def error_response(kind: str) -> web.Response:
+    body = {"error": {"message": "fake provider overloaded", "type": kind}}
+    if kind == "overloaded_error":
+        body = {"type": "error", "error": {"type": kind, "message": "fake provider overloaded"}}
+    return web.json_response(body, status=529 if kind == "overloaded_error" else 503)
+
+
+async def chat_completions(request: web.Request):
+    fake: FakeLLM = request.app["fake"]
+    body = await request.json()
+    fake.requests += 1
+    if fake.should_fail():
+        return error_response("server_error")
+
+    prompt = prompt_of(body.get("messages", []))
+    tokens = fake.completion_tokens(prompt, body.get("max_tokens"))
+    usage = {
+        "prompt_tokens": estimate_tokens(prompt),
+        "completion_tokens": len(tokens),
+        "total_tokens": estimate_tokens(prompt) + len(tokens),
+    }
+    base = {"id": f"chatcmpl-{fake.requests}", "created": int(time.time()), "model": body.get("model", "fake")}
+
+    fake.in_flight += 1
+    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+    try:
+        await asyncio.sleep(fake.first_token_delay())
+        if not body.get("stream"):
+            await asyncio.sleep(fake.delay(fake.token_delay) * len(tokens))
+            return web.json_response({
+                **base, "object": "chat.completion",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(tokens)}}],
+                "usage": usage,
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        chunk = {**base, "object": "chat.completion.chunk"}
+        await sse(response, {**chunk, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}}]})
+        for token in tokens:
+            await sse(response, {**chunk, "choices": [{"index": 0, "delta": {"content": token}}]})
+            await asyncio.sleep(fake.delay(fake.token_delay))
+        await sse(response, {**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if body.get("stream_options", {}).get("include_usage"):
+            await sse(response, {**chunk, "choices": [], "usage": usage})
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+    finally:
+        fake.in_flight -= 1
+
+
+async def messages(request: web.Request):
+    fake: FakeLLM = request.app["fake"]
+    body = await request.json()
+    fake.requests += 1
+    if fake.should_fail():
+        return error_response("overloaded_error")
+
+    prompt = prompt_of(body.get("messages", []))
+    tokens = fake.completion_tokens(prompt, body.get("max_tokens"))
+    message = {
+        "id": f"msg_{fake.requests}", "type": "message", "role": "assistant",
+        "model": body.get("model", "fake"), "stop_sequence": None,
+    }
+    input_tokens = estimate_tokens(prompt)
+
+    fake.in_flight += 1
+    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+    try:
+        await asyncio.sleep(fake.first_token_delay())
+        if not body.get("stream"):
+            await asyncio.sleep(fake.delay(fake.token_delay) * len(tokens))
+            return web.json_response({
+                **message, "stop_reason": "end_turn",
+                "content": [{"type": "text", "text": "".join(tokens)}],
+                "usage": {"input_tokens": input_tokens, "output_tokens": len(tokens)},
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await sse(response, {"type": "message_start", "message": {
+            **message, "content": [], "stop_reason": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": 0}}}, "message_start")
+        await sse(response, {"type": "content_block_start", "index": 0,
+                             "content_block": {"type": "text", "text": ""}}, "content_block_start")
+        for token in tokens:
+            await sse(response, {"type": "content_block_delta", "index": 0,
+                                 "delta": {"type": "text_delta", "text": token}}, "content_block_delta")
+            await asyncio.sleep(fake.delay(fake.token_delay))
+        await sse(response, {"type": "content_block_stop", "index": 0}, "content_block_stop")
+        await sse(response, {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                             "usage": {"output_tokens": len(tokens)}}, "message_delta")
+        await sse(response, {"type": "message_stop"}, "message_stop")
+        await response.write_eof()
+        return response
+    finally:
+        fake.in_flight -= 1
+
+
+async def stats(request: web.Request):
+    fake: FakeLLM = request.app["fake"]
+    return web.json_response({"requests": fake.requests, "in_flight": fake.in_flight,
+                              "max_in_flight": fake.max_in_flight})
+
+
+def create_app(fake: FakeLLM = None) -> web.Application:
+    app = web.Application()
+    app["fake"] = fake or FakeLLM()
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_post("/v1/messages", messages)
+    app.router.add_get("/stats", stats)
+    return app
+
+
+async def serve(host: str, port: int, fake: FakeLLM = None) -> web.AppRunner:
+    """Запуск сервера; возвращает AppRunner (удобно для тестов и бенчмарков)"""
+    runner = web.AppRunner(create_app(fake), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заглушка LLM-провайдеров (OpenAI/Anthropic API)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--ttft-ms", type=float, default=200, help="Задержка до первого токена")
+    parser.add_argument("--token-ms", type=float, default=10, help="Задержка на токен")
+    parser.add_argument("--tokens", type=int, default=120, help="Длина ответа в токенах")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов с ошибкой 5xx")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Доля аномально медленных ответов")
+    parser.add_argument("--slow-ms", type=float, default=0, help="Дополнительная задержка медленного ответа")
+    args = parser.parse_args()
+    fake = FakeLLM(args.ttft_ms, args.token_ms, args.tokens, args.error_rate,
+                   slow_rate=args.slow_rate, slow_ms=args.slow_ms)
+    web.run_app(create_app(fake), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
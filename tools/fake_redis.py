@@ -0,0 +1,155 @@
+"""Минимальный сервер с протоколом Redis (RESP2/RESP3) для локальных проверок.
+
+Поддерживает команды, которые использует FSM-хранилище aiogram:
+GET, SET (EX/PX/NX/XX), DEL, EXISTS, EXPIRE, TTL, PING, SELECT, FLUSHDB,
+а также HELLO/CLIENT при подключении redis-py.
+Данные хранятся в памяти процесса.
+
+    python tools/fake_redis.py --port 6380
+    FSM_STORAGE=redis FSM_REDIS_URL=redis://127.0.0.1:6380/0 python main.py
+"""
+import argparse
+import asyncio
+import time
+
+
+NULL = {2: b'$-1\r\n', 3: b'_\r\n'}
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+
+    def _alive(self, key: bytes) -> bool:
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def execute(self, args: list, protocol: int = 2):
+        command = args[0].upper()
+        if command == b'PING':
+            return b'+PONG\r\n'
+        if command in (b'SELECT', b'CLIENT'):
+            return b'+OK\r\n'
+        if command == b'HELLO':
+            return hello(int(args[1]) if len(args) > 1 else 2)
+        if command == b'GET':
+            key = args[1]
+            return bulk(self.data[key]) if self._alive(key) else NULL[protocol]
+        if command == b'SET':
+            result = self._set(args[1], args[2], [arg.upper() for arg in args[3:]], args[3:])
+            return result if result is not None else NULL[protocol]
+        if command == b'DEL':
+            removed = 0
+            for key in args[1:]:
+                if self._alive(key):
+                    del self.data[key]
+                    self.expires.pop(key, None)
+                    removed += 1
+            return integer(removed)
+        if command == b'EXISTS':
+            return integer(sum(1 for key in args[1:] if self._alive(key)))
+        if command == b'EXPIRE':
+            key = args[1]
+            if not self._alive(key):
+                return integer(0)
+            self.expires[key] = time.monotonic() + int(args[2])
+            return integer(1)
+        if command == b'TTL':
+            key = args[1]
+            if not self._alive(key):
+                return integer(-2)
+            expires_at = self.expires.get(key)
+            return integer(-1 if expires_at is None else int(expires_at - time.monotonic()))
+        if command == b'FLUSHDB':
+            self.data.clear()
+            self.expires.clear()
+            return b'+OK\r\n'
+        return f"-ERR unknown command '{command.decode(errors='replace')}'\r\n".encode()
+
+    def _set(self, key: bytes, value: bytes, options: list, raw_options: list):
+        ttl = None
+        if b'NX' in options and self._alive(key):
+            return None
+        if b'XX' in options and not self._alive(key):
+            return None
+        if b'EX' in options:
+            ttl = int(raw_options[options.index(b'EX') + 1])
+        elif b'PX' in options:
+            ttl = int(raw_options[options.index(b'PX') + 1]) / 1000
+        self.data[key] = value
+        if ttl is None:
+            self.expires.pop(key, None)
+        else:
+            self.expires[key] = time.monotonic() + ttl
+        return b'+OK\r\n'
+
+
+def bulk(value: bytes) -> bytes:
+    return b'$%d\r\n%s\r\n' % (len(value), value)
+
+
+def hello(protocol: int) -> bytes:
+    """Ответ на HELLO: карта для RESP3, плоский массив для RESP2"""
+    fields = [bulk(b'server'), bulk(b'redis'), bulk(b'version'), bulk(b'7.0.0'),
+              bulk(b'proto'), integer(protocol)]
+    header = b'%%%d\r\n' % (len(fields) // 2) if protocol == 3 else b'*%d\r\n' % len(fields)
+    return header + b''.join(fields)
+
+
+def integer(value: int) -> bytes:
+    return b':%d\r\n' % value
+
+
+async def read_command(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b'*'):
+        return line.strip().split()
+    args = []
+    for _ in range(int(line[1:])):
+        size = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(size + 2))[:-2])
+    return args
+
+
+async def serve(host: str, port: int, fake: FakeRedis = None):
+    """Запуск сервера; возвращает asyncio.Server (удобно для тестов)"""
+    fake = fake or FakeRedis()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        protocol = 2
+        try:
+            while True:
+                args = await read_command(reader)
+                if not args:
+                    break
+                if args[0].upper() == b'HELLO' and len(args) > 1:
+                    protocol = int(args[1])
+                writer.write(fake.execute(args, protocol))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Заглушка Redis для локальных проверок")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6380)
+    args = parser.parse_args()
+    server = await serve(args.host, args.port)
+    print(f"Fake Redis слушает {args.host}:{args.port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
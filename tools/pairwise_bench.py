@@ -0,0 +1,110 @@
+"""Сравнение генератора IPOG/IPOG-F с AllPairs по размеру набора и времени.
+
+AllPairs (пакет allpairspy) больше не зависимость бота: если он установлен,
+его результаты выводятся рядом, иначе сравниваются только варианты IPOG.
+
+    python tools/pairwise_bench.py
+    python tools/pairwise_bench.py --models 10x3 20x4 50x2 30x5 --strength 2
+    python tools/pairwise_bench.py --models 10x3 --strength 3 --no-allpairs
+    python tools/pairwise_bench.py --models 50x5 20x10 --constraints 20 --no-allpairs
+
+С --constraints в модель добавляются случайные запрещенные пары значений;
+AllPairs сравнивается с фильтрацией готового набора (так ограничения
+учитывались бы без поддержки в генераторе) - видно, сколько покрытия теряется.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plugins.pairwise_engine import (  # noqa: E402
+    VARIANTS, Constraints, generate_indices, count_uncovered, count_invalid
+)
+
+DEFAULT_MODELS = ["10x3", "10x5", "20x3", "20x4", "30x3", "40x3", "50x2", "50x4", "10x10"]
+# Полная проверка покрытия перебирает все сочетания столбцов - на больших t дорого
+VERIFY_LIMIT = 200000
+
+
+def parse_model(spec: str) -> list:
+    """'20x4' - 20 параметров по 4 значения; '3,3,5,2' - явные размеры"""
+    if 'x' in spec:
+        count, size = spec.lower().split('x', 1)
+        return [int(size)] * int(count)
+    return [int(size) for size in spec.split(',')]
+
+
+def run_allpairs(sizes: list, strength: int):
+    try:
+        from allpairspy import AllPairs
+    except ImportError:
+        return None
+    values = [list(range(size)) for size in sizes]
+    return [list(row) for row in AllPairs(values, n=strength)]
+
+
+def timed(func, *args):
+    started_at = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started_at
+
+
+def random_constraints(sizes: list, count: int, seed: int):
+    """Случайные запрещенные пары значений"""
+    if not count or len(sizes) < 2:
+        return None
+    rng = random.Random(seed)
+    clauses = []
+    for _ in range(count):
+        first, second = rng.sample(range(len(sizes)), 2)
+        clauses.append([(first, [rng.randrange(sizes[first])]), (second, [rng.randrange(sizes[second])])])
+    return Constraints(sizes, clauses)
+
+
+def column_combinations(count: int, strength: int) -> int:
+    from math import comb
+    return comb(count, min(strength, count))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк генератора pairwise/t-wise наборов")
+    parser.add_argument("--models", nargs="+", default=DEFAULT_MODELS,
+                        help="Модели вида NxM (N параметров по M значений) или 3,3,5,2")
+    parser.add_argument("--strength", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--constraints", type=int, default=0, help="Число случайных запрещенных пар")
+    parser.add_argument("--no-allpairs", action="store_true", help="Не запускать AllPairs")
+    args = parser.parse_args()
+
+    print(f"{'модель':>10} {'алгоритм':>9} {'тестов':>7} {'время, с':>9} {'покрытие':>9}")
+    for spec in args.models:
+        sizes = parse_model(spec)
+        verify = column_combinations(len(sizes), args.strength) <= VERIFY_LIMIT
+        constraints = random_constraints(sizes, args.constraints, args.seed)
+
+        def coverage_status(rows):
+            if not verify:
+                return "-"
+            if constraints and count_invalid(rows, constraints):
+                return "ЗАПРЕТЫ"
+            return "полное" if count_uncovered(rows, sizes, args.strength, constraints) == 0 else "НЕПОЛНОЕ"
+
+        for variant in VARIANTS:
+            rows, elapsed = timed(generate_indices, sizes, args.strength, args.seed, variant, constraints)
+            print(f"{spec:>10} {variant:>9} {len(rows):>7} {elapsed:>9.3f} {coverage_status(rows):>9}")
+
+        if not args.no_allpairs:
+            result, elapsed = timed(run_allpairs, sizes, args.strength)
+            if result is None:
+                print(f"{spec:>10} {'allpairs':>9} {'не установлен (pip install allpairspy)':>27}")
+            else:
+                if constraints:
+                    result = [row for row in result if not constraints.violates(row)]
+                print(f"{spec:>10} {'allpairs':>9} {len(result):>7} {elapsed:>9.3f} {coverage_status(result):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Нагрузочный тест webhook-режима на фейковых обновлениях Telegram.
+
+Примеры:
+    # Локальный самотест: поднимает WebhookDispatcher с пустыми обработчиками
+    python tools/webhook_bench.py --self-test --count 20000 --concurrency 200
+
+    # Нагрузка на запущенного бота (RUN_MODE=webhook)
+    python tools/webhook_bench.py --url http://127.0.0.1:8000/webhook --secret change_me
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import sys
+import time
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from webhook import WebhookDispatcher, SECRET_HEADER  # noqa: E402
+
+FAKE_TEXTS = [
+    "/start", "/help", "/file", "/pairwise", "/api", "/sql",
+    "PNG", "500", "os: mac, win; browser: chrome, firefox", "Назад в меню",
+]
+
+
+def fake_update(update_id: int, chat_id: int, text: str = None) -> dict:
+    """Сообщение пользователя в формате Bot API"""
+    user = {"id": chat_id, "is_bot": False, "first_name": f"User{chat_id}"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private", "first_name": user["first_name"]},
+            "from": user,
+            "text": text or random.choice(FAKE_TEXTS),
+        },
+    }
+
+
+def fake_updates(count: int, chats: int, seed: int = 0):
+    rng = random.Random(seed)
+    for update_id in range(1, count + 1):
+        yield fake_update(update_id, 100000 + rng.randrange(chats), rng.choice(FAKE_TEXTS))
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def send_updates(url: str, secret: str, count: int, concurrency: int, chats: int):
+    updates = fake_updates(count, chats)
+    headers = {SECRET_HEADER: secret} if secret else {}
+    latencies = []
+    statuses = {}
+
+    async def worker(session: aiohttp.ClientSession):
+        for update in updates:
+            started_at = time.perf_counter()
+            async with session.post(url, json=update, headers=headers) as response:
+                await response.read()
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+            latencies.append((time.perf_counter() - started_at) * 1000)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started_at = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started_at
+
+    latencies.sort()
+    print(f"Отправлено: {count} за {elapsed:.2f} с ({count / elapsed:.0f} обновлений/с)")
+    print(f"Статусы: {statuses}")
+    print(
+        f"Задержка подтверждения, мс: p50={percentile(latencies, 50):.2f} "
+        f"p90={percentile(latencies, 90):.2f} p99={percentile(latencies, 99):.2f} "
+        f"max={latencies[-1]:.2f}"
+    )
+
+
+async def self_test(args):
+    """WebhookDispatcher с обработчиком-заглушкой: сеть Telegram не нужна"""
+    from aiogram import Bot, Dispatcher
+    from aiogram.fsm.context import FSMContext
+    from aiogram.fsm.storage.memory import MemoryStorage
+    from aiogram.types import Message
+    from aiohttp import web
+
+    bot = Bot(token="123456:BENCHMARK")
+    dp = Dispatcher(storage=MemoryStorage())
+    counter = itertools.count()
+
+    @dp.message()
+    async def handle(message: Message, state: FSMContext):
+        await state.update_data(last=message.text, seen=next(counter))
+        if args.handler_delay:
+            await asyncio.sleep(args.handler_delay / 1000)
+
+    webhook = WebhookDispatcher(dp, bot, secret_token=args.secret,
+                                workers=args.workers, queue_size=args.queue_size)
+    app = web.Application()
+    webhook.register(app, "/webhook")
+    await webhook.start()
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", args.port)
+    await site.start()
+    try:
+        await send_updates(f"http://127.0.0.1:{args.port}/webhook", args.secret,
+                           args.count, args.concurrency, args.chats)
+        drain_started = time.perf_counter()
+        await webhook.stop(timeout=60)
+        print(f"Дообработка очереди: {time.perf_counter() - drain_started:.2f} с")
+        print(f"Метрики: {webhook.get_metrics()}")
+    finally:
+        await runner.cleanup()
+        await bot.session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк webhook-режима")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/webhook")
+    parser.add_argument("--secret", default="bench-secret")
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--chats", type=int, default=500)
+    parser.add_argument("--self-test", action="store_true")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--queue-size", type=int, default=1000)
+    parser.add_argument("--handler-delay", type=float, default=0, help="Имитация работы обработчика, мс")
+    args = parser.parse_args()
+
+    if args.self_test:
+        asyncio.run(self_test(args))
+    else:
+        asyncio.run(send_updates(args.url, args.secret, args.count, args.concurrency, args.chats))
+
+
+if __name__ == "__main__":
+    main()
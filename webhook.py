@@ -0,0 +1,125 @@
+import asyncio
+import hmac
+import logging
+import time
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def get_update_chat_id(data: dict):
+    """Определение чата обновления по «сырому» JSON (без полного разбора Update)"""
+    for field in ('message', 'edited_message', 'callback_query', 'channel_post', 'my_chat_member'):
+        payload = data.get(field)
+        if not isinstance(payload, dict):
+            continue
+        if field == 'callback_query':
+            payload = payload.get('message') or {'chat': payload.get('from') or {}}
+        chat = payload.get('chat') or {}
+        if 'id' in chat:
+            return chat['id']
+    return data.get('update_id', 0)
+
+
+class WebhookDispatcher:
+    """Прием обновлений Telegram через webhook.
+
+    Запрос от Telegram подтверждается сразу после проверки секрета и
+    постановки обновления в ограниченную очередь, а обработку выполняют
+    N воркеров. Обновления одного чата всегда попадают к одному и тому же
+    воркеру, поэтому шаги FSM выполняются в исходном порядке.
+    """
+
+    def __init__(self, dp: Dispatcher, bot: Bot, secret_token: str = None,
+                 workers: int = 4, queue_size: int = 1000):
+        self.dp = dp
+        self.bot = bot
+        self.secret_token = secret_token
+        self.queues = [asyncio.Queue(maxsize=max(1, queue_size // workers)) for _ in range(workers)]
+        self._tasks = []
+        self.received = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.unauthorized = 0
+        self.process_time = 0.0
+
+    def register(self, app: web.Application, path: str):
+        """Регистрация обработчика webhook в существующем приложении aiohttp"""
+        app.router.add_post(path, self.handle)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.secret_token:
+            token = request.headers.get(SECRET_HEADER, '')
+            if not hmac.compare_digest(token, self.secret_token):
+                self.unauthorized += 1
+                return web.Response(status=401)
+
+        try:
+            data = await request.json()
+        except Exception:
+            return web.Response(status=400)
+        if not isinstance(data, dict):
+            return web.Response(status=400)
+
+        queue = self.queues[hash(get_update_chat_id(data)) % len(self.queues)]
+        try:
+            queue.put_nowait(data)
+        except asyncio.QueueFull:
+            # Telegram повторит доставку позже, обновление не потеряется
+            self.rejected += 1
+            return web.Response(status=503)
+
+        self.received += 1
+        return web.Response(text="OK")
+
+    async def start(self):
+        for index, queue in enumerate(self.queues):
+            self._tasks.append(asyncio.create_task(self._worker(queue), name=f"webhook-worker-{index}"))
+        logger.info(f"Webhook: запущено воркеров {len(self.queues)}")
+
+    async def stop(self, timeout: float = 10):
+        """Остановка воркеров с попыткой дообработать очередь"""
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self.queues)),
+                timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Webhook: очередь не успела обработаться до остановки")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            data = await queue.get()
+            started_at = time.perf_counter()
+            try:
+                update = Update.model_validate(data, context={"bot": self.bot})
+                await self.dp.feed_update(self.bot, update)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Webhook: ошибка обработки обновления: {e}", exc_info=True)
+            finally:
+                self.process_time += time.perf_counter() - started_at
+                queue.task_done()
+
+    def get_metrics(self) -> dict:
+        done = self.processed + self.failed
+        return {
+            'workers': len(self.queues),
+            'queued': sum(queue.qsize() for queue in self.queues),
+            'received': self.received,
+            'processed': self.processed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'unauthorized': self.unauthorized,
+            'avg_process_ms': round(self.process_time / done * 1000, 2) if done else 0.0,
+        }